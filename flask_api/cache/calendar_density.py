@@ -0,0 +1,169 @@
+# flask_api/cache/calendar_density.py
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from repository.room_repo import RoomRepo
+from repository.task_repo import TaskRepo
+from repository.finance_repo import FinanceRepo
+from utils import local_date
+import recurrence
+
+
+class CalendarDensity:
+    """Per-room ``day -> (task count, bill total)`` rollup for the next ``horizon_days``.
+
+    The entry holds the counts per UTC instant (a deadline or bill date)
+    over the horizon plus a day either side, so a read can bucket them by
+    the local day of any timezone, DST changes included. Each read compares
+    the room's ``calendar_version`` (one primary-key read) with the cached
+    entry and rebuilds it, expanding task and bill series over the window,
+    when they differ, when the UTC day has rolled over, or after the entry
+    was evicted.
+    Writers in this process call ``apply`` with the deltas of what they just
+    committed; the deltas are folded in only if the version moved by exactly
+    the writer's own bumps, otherwise the entry is dropped and rebuilt on the
+    next read.
+    """
+
+    def __init__(self, max_size: int = 1024, horizon_days: int = 60):
+        self.max_size = max_size
+        self.horizon_days = horizon_days
+        self.hits = 0
+        self.rebuilds = 0
+        self.applied = 0
+        # room_id -> (calendar version, UTC day built on, naive UTC instant -> [task count, bill total])
+        self._entries: "OrderedDict[int, Tuple[int, date, Dict[datetime, List[float]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.max_size = int(app.config.get("CALENDAR_DENSITY_CACHE_SIZE", self.max_size))
+        self.horizon_days = int(app.config.get("CALENDAR_DENSITY_DAYS", self.horizon_days))
+        self.clear()
+
+    def get(self, room_id: int, tz=timezone.utc) -> dict:
+        """The rollup for the next ``horizon_days`` days in ``tz``, starting with today there."""
+        today = datetime.utcnow().date()
+        version = RoomRepo.get_calendar_version(room_id)
+        with self._lock:
+            entry = self._entries.get(room_id)
+            if entry is not None and entry[0] == version and entry[1] == today:
+                self._entries.move_to_end(room_id)
+                self.hits += 1
+                return self._payload(entry, tz)
+
+        entry = (version, today, self._build(room_id, today))
+        with self._lock:
+            self.rebuilds += 1
+            self._entries[room_id] = entry
+            self._entries.move_to_end(room_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return self._payload(entry, tz)
+
+    def apply(self, room_id: int, bumps: int, tasks: Iterable[Tuple[Optional[datetime], int]] = (),
+              bills: Iterable[Tuple[Optional[datetime], float]] = ()) -> None:
+        """Fold committed ``(when, delta)`` changes into the room's entry.
+
+        ``bumps`` is how many times the writer bumped ``calendar_version``.
+        """
+        with self._lock:
+            if room_id not in self._entries:
+                return
+        version = RoomRepo.get_calendar_version(room_id)
+        with self._lock:
+            entry = self._entries.get(room_id)
+            if entry is None:
+                return
+            cached_version, built_on, instants = entry
+            if cached_version + bumps != version:
+                del self._entries[room_id]
+                return
+            start, end = self._window(built_on)
+            for index, changes in ((0, tasks), (1, bills)):
+                for when, delta in changes:
+                    if when is None or not start <= when < end:
+                        continue
+                    counts = instants.setdefault(when, [0, 0.0])
+                    counts[index] += delta
+                    if not counts[0] and not round(counts[1], 2):
+                        del instants[when]
+            self._entries[room_id] = (version, built_on, instants)
+            self.applied += 1
+
+    def window(self) -> Tuple[datetime, datetime]:
+        """Naive UTC ``[start, end)`` the rollup currently covers."""
+        return self._window(datetime.utcnow().date())
+
+    def _window(self, today: date) -> Tuple[datetime, datetime]:
+        # A day either side of the UTC days, so every timezone's days are covered in full
+        start = datetime.combine(today - timedelta(days=1), datetime.min.time())
+        return start, start + timedelta(days=self.horizon_days + 2)
+
+    def invalidate(self, room_id: int) -> None:
+        with self._lock:
+            self._entries.pop(room_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.rebuilds = 0
+            self.applied = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "horizon_days": self.horizon_days,
+                "hits": self.hits,
+                "rebuilds": self.rebuilds,
+                "applied": self.applied,
+            }
+
+    def _build(self, room_id: int, today: date) -> Dict[datetime, List[float]]:
+        start, end = self._window(today)
+        instants: Dict[datetime, List[float]] = {}
+
+        tasks = TaskRepo.get_task_series_between(room_id, start, end)
+        cancelled, _, _ = TaskRepo.get_occurrence_state(task.id for task in tasks if task.occurrences)
+        for task in tasks:
+            step, count = recurrence.series(task)
+            for k in recurrence.occurrence_indexes(task.deadline, step, count, start, end):
+                if (task.id, k) not in cancelled:
+                    instants.setdefault(recurrence.shift(task.deadline, step, k), [0, 0.0])[0] += 1
+
+        bills = FinanceRepo.get_bill_series_between(room_id, start, end)
+        cancelled = FinanceRepo.get_cancelled_occurrences(bill.id for bill in bills if bill.occurrences)
+        for bill in bills:
+            step, count = recurrence.series(bill)
+            for k in recurrence.occurrence_indexes(bill.scheduled_date, step, count, start, end):
+                if (bill.id, k) not in cancelled:
+                    when = recurrence.shift(bill.scheduled_date, step, k)
+                    instants.setdefault(when, [0, 0.0])[1] += float(bill.amount or 0)
+        return instants
+
+    def _payload(self, entry, tz) -> dict:
+        _, _, instants = entry
+        start = local_date(datetime.utcnow(), tz)
+        end = start + timedelta(days=self.horizon_days)
+        days: Dict[date, List[float]] = {}
+        for when, (count, total) in instants.items():
+            day = local_date(when, tz)
+            if start <= day < end:
+                totals = days.setdefault(day, [0, 0.0])
+                totals[0] += count
+                totals[1] += total
+        return {
+            "start": start.isoformat(),
+            "days": {
+                day.isoformat(): {"tasks": int(count), "bill_total": round(total, 2)}
+                for day, (count, total) in sorted(days.items())
+                if count or round(total, 2)
+            },
+        }
+
+
+calendar_density = CalendarDensity()
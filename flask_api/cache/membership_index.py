@@ -0,0 +1,86 @@
+# flask_api/cache/membership_index.py
+import threading
+import time
+from collections import OrderedDict
+from typing import FrozenSet, Tuple
+
+from repository.room_repo import RoomRepo
+
+
+class MembershipIndex:
+    """In-memory ``user_id -> room ids`` index guarded by ``membership_versions``.
+
+    Lookups are answered from memory while an entry is fresher than
+    ``recheck_interval`` seconds. After that the stored version is compared
+    against the database (one primary-key read) and the room ids are only
+    reloaded when it has changed. Writers in this process call
+    ``invalidate`` so their own changes are visible immediately; changes made
+    by other workers are picked up within ``recheck_interval``.
+    """
+
+    def __init__(self, max_size: int = 4096, recheck_interval: float = 5.0):
+        self.max_size = max_size
+        self.recheck_interval = recheck_interval
+        self.hits = 0
+        self.version_checks = 0
+        self.reloads = 0
+        # user_id -> (checked_until, version, room ids)
+        self._entries: "OrderedDict[int, Tuple[float, int, FrozenSet[int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.max_size = int(app.config.get("MEMBERSHIP_INDEX_SIZE", self.max_size))
+        self.recheck_interval = float(app.config.get("MEMBERSHIP_RECHECK_INTERVAL", self.recheck_interval))
+        self.clear()
+
+    def is_member(self, user_id: int, room_id: int) -> bool:
+        return room_id in self.rooms_for(user_id)
+
+    def rooms_for(self, user_id: int) -> FrozenSet[int]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[2]
+
+        version = RoomRepo.get_membership_version(user_id)
+        if entry is not None and entry[1] == version:
+            rooms = entry[2]
+            self.version_checks += 1
+        else:
+            rooms = frozenset(RoomRepo.list_room_ids_for_user(user_id))
+            self.reloads += 1
+
+        with self._lock:
+            self._entries[user_id] = (now + self.recheck_interval, version, rooms)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return rooms
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.version_checks = 0
+            self.reloads = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "recheck_interval": self.recheck_interval,
+                "hits": self.hits,
+                "version_checks": self.version_checks,
+                "reloads": self.reloads,
+            }
+
+
+membership_index = MembershipIndex()
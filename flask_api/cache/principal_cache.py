@@ -0,0 +1,99 @@
+# flask_api/cache/principal_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from entities.user import User
+
+
+class PrincipalCache:
+    """Bounded TTL/LRU cache of verified tokens.
+
+    Keyed on the SHA-256 digest of the raw token, each entry holds the decoded
+    claims and a detached ``User`` snapshot so ``token_required`` can skip both
+    ``jwt.decode`` and the ``users`` lookup on a hit.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, dict, User]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.max_size = int(app.config.get("PRINCIPAL_CACHE_SIZE", self.max_size))
+        self.ttl = float(app.config.get("PRINCIPAL_CACHE_TTL", self.ttl))
+        self.clear()
+
+    def get(self, digest: str) -> Optional[Tuple[dict, User]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, digest: str, claims: dict, user: User) -> None:
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            # Never serve a token from cache past its own expiry.
+            expires_at = min(expires_at, time.monotonic() + (exp - time.time()))
+
+        snapshot = self._snapshot(user)
+        with self._lock:
+            self._entries[digest] = (expires_at, claims, snapshot)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            stale = [digest for digest, (_, _, user) in self._entries.items() if user.id == user_id]
+            for digest in stale:
+                del self._entries[digest]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    @staticmethod
+    def _snapshot(user: User) -> User:
+        # Column values only; relationships lazy-load once the snapshot is
+        # merged back into a request session.
+        snapshot = User(**{
+            attr.key: getattr(user, attr.key)
+            for attr in inspect(User).column_attrs
+        })
+        make_transient_to_detached(snapshot)
+        return snapshot
+
+
+principal_cache = PrincipalCache()
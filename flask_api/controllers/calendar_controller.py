@@ -1,16 +1,30 @@
 import jwt
-from flask import Blueprint, jsonify, abort, g, request
+from flask import Blueprint, jsonify, abort, g, request, current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 from repository.user_repo import UserRepo
 from services.room_service import RoomService
 from services.user_service import UserService
 from entities.user import User
-from utils import token_required
+from utils import token_required, request_timezone
 from datetime import date, timedelta, datetime
 from services.calendar_service import CalendarService
+from cache.calendar_density import calendar_density
 
 calendar_bp = Blueprint('calendar', __name__, url_prefix='/calendar')
 
+@calendar_bp.route('/<int:room_id>/density', methods=['GET'])
+@token_required
+def fetch_calendar_density(room_id):
+    """Task count and bill total per day in the request timezone (X-Timezone) for the next CALENDAR_DENSITY_DAYS days"""
+    user: User = g.current_user
+    if not user:
+        abort(404, description="User not found")
+
+    if not RoomService.validate_room_user(user.id, room_id):
+        abort(404, description="User does not belong to the room")
+
+    return jsonify(calendar_density.get(room_id, request_timezone())), 200
+
 @calendar_bp.route('/<room_id>', methods=['POST'])
 @token_required
 def fetch_calendar(room_id):
@@ -23,6 +37,9 @@ def fetch_calendar(room_id):
 
 
     data = request.get_json(silent=True) or {}
+    if data.get("start") or data.get("end"):
+        return fetch_calendar_range(int(room_id), data)
+
     date_str = data.get("date")
 
     if not date_str:
@@ -32,5 +49,25 @@ def fetch_calendar(room_id):
     except ValueError:
         return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
 
-    result = CalendarService.get_schedule_for_date(room_id, target_date)
-    return jsonify(result), 200
\ No newline at end of file
+    result = CalendarService.get_schedule_for_date(room_id, target_date, request_timezone())
+    return jsonify(result), 200
+
+
+def fetch_calendar_range(room_id: int, data: dict):
+    start_str, end_str = data.get("start"), data.get("end")
+    if not start_str or not end_str:
+        return jsonify({"error": "Range mode needs both 'start' and 'end'"}), 400
+    try:
+        start_date = datetime.strptime(start_str, "%Y-%m-%d").date()
+        end_date = datetime.strptime(end_str, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
+
+    if end_date < start_date:
+        return jsonify({"error": "'end' must not be before 'start'"}), 400
+    max_days = current_app.config.get("CALENDAR_MAX_RANGE_DAYS", 62)
+    if (end_date - start_date).days + 1 > max_days:
+        return jsonify({"error": f"Range may span at most {max_days} days"}), 400
+
+    result = CalendarService.get_schedule_for_range(room_id, start_date, end_date, request_timezone())
+    return jsonify(result), 200
@@ -1,6 +1,8 @@
 # pylint: disable=all
 from flask import Blueprint, jsonify, abort, g, request
-from utils import token_required
+from datetime import datetime
+from utils import token_required, room_etag, request_page, encode_cursor, decode_cursor, paged, streamed_list
+from repository.finance_repo import FinanceRepo
 from entities.user import User
 from services.finance_service import FinanceService, RoomService
 
@@ -9,9 +11,15 @@ finance_bp = Blueprint('finance', __name__, url_prefix='/finance')
 # =============================================================================
 # DUMMY API ENDPOINTS FOR BASIC SETUP
 @finance_bp.route('/transaction_list/<room_id>', methods=['GET'])
+@room_etag("transactions", freshness=FinanceRepo.get_latest_visible_bill_date)
 def get_room_financial_activity(room_id):
-    items = FinanceService.get_room_financial_activity(room_id)
-    return jsonify(items), 200
+    limit, cursor = request_page()
+    if limit is None:
+        return streamed_list(FinanceService.get_room_financial_activity(room_id))
+
+    before = decode_cursor(cursor, datetime, int, int, int) if cursor else None
+    items, next_key = FinanceService.get_financial_activity_page(room_id, limit, before)
+    return paged(items, encode_cursor(*next_key) if next_key else None)
 
 
 @finance_bp.route('/create_bill/<room_id>', methods=['POST'])
@@ -62,7 +70,7 @@ def pay_user(room_id):
         abort(404, description="User not found")
 
     # Check if the user belongs to the room
-    if not any(room.room_id == int(room_id) for room in user.rooms):
+    if not RoomService.validate_room_user(user.id, int(room_id)):
         abort(404, description="User does not belong to the room")
 
     # Get the input data from the request
@@ -100,7 +108,8 @@ def delete_bill(bill_id):
     if not user:
         abort(404, description="User not found")
 
-    FinanceService.delete_bill(user.id, int(bill_id))
+    occurrence = request.args.get("occurrence", type=int)
+    FinanceService.delete_bill(user.id, int(bill_id), occurrence)
 
     return {"message": "Bill deleted successfully"}, 200
 
@@ -128,6 +137,7 @@ def clear_room_transactions(room_id):
     # Import the necessary models
     from entities.finance import Bill, Payment, FinanceSummary
     from entities import db
+    from repository.room_repo import RoomRepo
     
     # Delete all bills for this room
     bills_deleted = Bill.query.filter_by(room_id=room_id_int).delete()
@@ -139,6 +149,8 @@ def clear_room_transactions(room_id):
     summaries_deleted = FinanceSummary.query.filter_by(room_id=room_id_int).delete()
     
     # Commit the deletions
+    RoomRepo.reset_change_log(room_id_int)
+    RoomRepo.bump_calendar_version(room_id_int)
     db.session.commit()
     
     return {
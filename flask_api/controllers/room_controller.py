@@ -7,21 +7,28 @@ from flask import Blueprint, abort, g, jsonify, request
 from repository.user_repo import UserRepo
 from schemas.user_schemas import UserPublicSchema
 from services.room_service import RoomService
-from utils import token_required
+from services.sync_service import SyncService
+from utils import token_required, room_etag, request_page, encode_cursor, decode_cursor, paged
 from repository.room_repo import RoomRepo
 from schemas.room_schemas import (
     RoomSchema,
     RoomInvitationSchema,
 )
+from schemas.fast_serializers import (
+    BlueprintSchema,
+    FastRoomSchema,
+    FastRoomInvitationSchema,
+    FastUserPublicSchema,
+)
 from entities.user import User
 
 rooms_bp = Blueprint("room", __name__, url_prefix="/rooms")
 
-room_schema = RoomSchema()
-rooms_schema = RoomSchema(many=True)
-inv_schema = RoomInvitationSchema()
-invs_schema = RoomInvitationSchema(many=True)
-user_public_schema = UserPublicSchema(many=True)
+room_schema = BlueprintSchema(RoomSchema(), FastRoomSchema())
+rooms_schema = BlueprintSchema(RoomSchema(many=True), FastRoomSchema(many=True))
+inv_schema = BlueprintSchema(RoomInvitationSchema(), FastRoomInvitationSchema())
+invs_schema = BlueprintSchema(RoomInvitationSchema(many=True), FastRoomInvitationSchema(many=True))
+user_public_schema = BlueprintSchema(UserPublicSchema(many=True), FastUserPublicSchema(many=True))
 
 
 @rooms_bp.route("", methods=["GET"])
@@ -36,42 +43,31 @@ def get_rooms():
 @token_required
 def room_invites():
     user: User = g.current_user
-    joined = RoomService.get_invites_for_user(user.id)
-    return jsonify({"invitedRooms": rooms_schema.dump(joined)}), 200
+    limit, cursor = request_page()
+    if limit is None:
+        joined = RoomService.get_invites_for_user(user.id)
+        return jsonify({"invitedRooms": rooms_schema.dump(joined)}), 200
+
+    before = decode_cursor(cursor, datetime, int) if cursor else None
+    invited = RoomService.get_invites_for_user(user.id, limit + 1, before)
+    next_cursor = encode_cursor(invited[limit - 1].created_at, invited[limit - 1].id) if len(invited) > limit else None
+    return paged({"invitedRooms": rooms_schema.dump(invited[:limit])}, next_cursor)
 
 
 @rooms_bp.route("/rooms-and-invitations", methods=["GET"])
 @token_required
 def get_user_rooms_and_invitations():
     user: User = g.current_user
-    joined_rooms = [member.room for member in user.rooms]
-
-    pending_invitations = [
-        invitation for invitation in user.invitations_received
-        if invitation.status == "waiting"
-    ]
-
+    joined_rooms = RoomService.get_rooms_for_user(user.id)
     joined_rooms_data = room_schema.dump(joined_rooms, many=True)
     invites = RoomService.get_invites_for_user(user.id)
     invitations_data = room_schema.dump(invites, many=True)
-    alert_window = datetime.utcnow() + timedelta(days=1)
-
-    for i, room_data in enumerate(joined_rooms_data):
-        room = joined_rooms[i]
-        user_task_count = sum(
-            1 for task in room.tasks
-            for task_user in task.users
-            if (task_user.user_id == user.id and
-                task.deadline is not None and
-                task.deadline <= alert_window and
-                task_user.status != "complete")
-        )
-        room_data['alerts'] = user_task_count
-
-        # TO-DO: Implement owing logic
-        # ⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️
-        room_data['balance_due'] = 0
-        # ⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️
+
+    room_summaries = RoomService.get_room_alerts_and_balances(user.id)
+    for room_data in joined_rooms_data:
+        room_summary = room_summaries.get(room_data["id"], {})
+        room_data['alerts'] = room_summary.get("alerts", 0)
+        room_data['balance_due'] = room_summary.get("balance_due", 0)
 
     return jsonify({
         "joined_rooms": joined_rooms_data,
@@ -81,12 +77,30 @@ def get_user_rooms_and_invitations():
 
 @rooms_bp.route("/<int:room_id>/members", methods=["GET"])
 @token_required
+@room_etag("members", authorize=lambda room_id: RoomService.require_room_member(room_id, g.current_user))
 def get_roommates(room_id: int):
     user: User = g.current_user
     room = RoomService.get_room_with_members_if_user_is_member(room_id, user)
     mates = user_public_schema.dump([m.user for m in room.members])
     return jsonify({"roommates": mates}), 200
 
+@rooms_bp.route("/<int:room_id>/changes", methods=["GET"])
+@token_required
+def get_room_changes(room_id: int):
+    user: User = g.current_user
+    if not RoomService.validate_room_user(user.id, room_id):
+        abort(403, "You are not a member of this room")
+
+    since = request.args.get("since")
+    cursor = None
+    if since:
+        try:
+            cursor = int(since)
+        except ValueError:
+            abort(400, "since must be a cursor returned by this endpoint")
+
+    return jsonify(SyncService.get_room_changes(room_id, cursor)), 200
+
 @rooms_bp.route("/leave/<int:room_id>", methods=["POST"])
 @token_required
 def leave_room(room_id: int):
@@ -98,6 +112,7 @@ def leave_room(room_id: int):
 
 @rooms_bp.route("/<int:room_id>", methods=["GET"])
 @token_required
+@room_etag("room")
 def get_room(room_id: int):
     room = RoomService.get_room_by_id_with_members(room_id)
     if room is None:
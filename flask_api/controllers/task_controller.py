@@ -1,17 +1,58 @@
-from flask import Blueprint, jsonify, abort, g, request
+from flask import Blueprint, jsonify, abort, g, request, current_app
 from entities.user import User
 from services.task_service import TaskService, RoomService
-from utils import token_required
+from datetime import datetime
+from utils import token_required, room_etag, request_timezone, to_utc, request_page, encode_cursor, decode_cursor, paged
 from repository.task_repo import TaskRepo
+from entities.task import TASK_USER_STATUS
 
 tasks_bp = Blueprint('tasks', __name__, url_prefix='/tasks')
 
 # =============================================================================
 # DUMMY API ENDPOINTS FOR BASIC SETUP
 @tasks_bp.route('/list/<room_id>', methods=['GET'])
+@room_etag("tasks", freshness=lambda room_id: TaskRepo.get_latest_visible_scheduled_date(room_id, datetime.utcnow()))
 def tasks_list(room_id):
-    enriched_tasks = TaskService.get_enriched_tasks_for_room(room_id)
-    return jsonify(enriched_tasks), 200
+    limit, cursor = request_page()
+    if limit is None:
+        enriched_tasks = TaskService.get_enriched_tasks_for_room(room_id)
+        return jsonify(enriched_tasks), 200
+
+    after = decode_cursor(cursor, datetime, int, int) if cursor else None
+    items, next_key = TaskService.get_task_page(room_id, limit, after)
+    return paged(items, encode_cursor(*next_key) if next_key else None)
+
+@tasks_bp.route('/mine', methods=['GET'])
+@token_required
+def my_tasks():
+    """The current user's task occurrences across all their rooms, ordered by deadline.
+
+    ``status`` is a comma-separated list (default ``todo,in-progress``);
+    ``start``/``end`` (ISO 8601, in the request timezone) bound the deadline
+    to ``[start, end)``. Room names are returned once under ``rooms``.
+    """
+    user: User = g.current_user
+    if not user:
+        abort(404, description="User not found")
+
+    statuses = [s.strip() for s in request.args.get("status", "todo,in-progress").split(",") if s.strip()]
+    invalid = [s for s in statuses if s not in TASK_USER_STATUS.enums]
+    if not statuses or invalid:
+        abort(400, description=f"status must be a comma-separated list of {', '.join(TASK_USER_STATUS.enums)}")
+
+    tz = request_timezone()
+    bounds = []
+    for name in ("start", "end"):
+        value = request.args.get(name)
+        try:
+            bounds.append(to_utc(datetime.fromisoformat(value), tz) if value else None)
+        except ValueError:
+            abort(400, description=f"Invalid {name}. Use ISO 8601 (e.g., '2024-12-10T08:24:00').")
+    start, end = bounds
+    if start and end and end < start:
+        abort(400, description="'end' must not be before 'start'")
+
+    return jsonify(TaskService.get_tasks_for_user(user.id, statuses, start, end)), 200
 
 @tasks_bp.route('/create_task/<room_id>', methods=['POST'])
 @token_required
@@ -38,7 +79,7 @@ def task_details(room_id):
         abort(400, "Repeat must be an integer.")
 
     TaskService.create_task_service(
-        int(room_id), title, description, frequency, repeat, deadline, assignees
+        int(room_id), title, description, frequency, repeat, deadline, assignees, request_timezone()
     )
 
     return {
@@ -66,17 +107,71 @@ def update_task_details(task_id):
 
     date_str = data.get("date")
     try:
-        deadline = datetime.fromisoformat(date_str) if date_str else None
+        deadline = to_utc(datetime.fromisoformat(date_str), request_timezone()) if date_str else None
     except ValueError:
         abort(400, description="Invalid date format. Use ISO 8601 (e.g., '2024-12-10T08:24:00').")
     assignees = data.get("assignees", [])
+    occurrence = data.get("occurrence", 0)
+    if not isinstance(occurrence, int):
+        abort(400, description="occurrence must be an integer")
 
-    TaskService.update_task(task_id, title, description, deadline, assignees)
+    TaskService.update_task(task_id, title, description, deadline, assignees, occurrence)
 
     return {
         "message": "Task updated successfully"
     }, 200
 
+@tasks_bp.route('/update_tasks/<room_id>', methods=['PATCH'])
+@token_required
+def update_tasks(room_id):
+    """Edit many tasks of the room at once, e.g. mark all of today's chores complete.
+
+    Body: ``{"tasks": [{"task_id", "title"?, "description"?, "date"?, "assignees"?, "occurrence"?}]}``.
+    """
+    user: User = g.current_user
+    if not user:
+        abort(404, description="User not found")
+
+    if not RoomService.validate_room_user(user.id, int(room_id)):
+        abort(404, description="User does not belong to the room")
+
+    data = request.get_json(silent=True) or {}
+    items = data.get("tasks")
+    if not isinstance(items, list) or not items:
+        abort(400, description="tasks must be a non-empty list")
+    max_batch = current_app.config.get("TASK_BATCH_MAX", 500)
+    if len(items) > max_batch:
+        abort(400, description=f"At most {max_batch} tasks can be updated at once")
+
+    tz = request_timezone()
+    edits = []
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("task_id"), int):
+            abort(400, description="Each task must include an integer task_id")
+        occurrence = item.get("occurrence", 0)
+        if not isinstance(occurrence, int):
+            abort(400, description="occurrence must be an integer")
+        date_str = item.get("date")
+        try:
+            deadline = to_utc(datetime.fromisoformat(date_str), tz) if date_str else None
+        except ValueError:
+            abort(400, description="Invalid date format. Use ISO 8601 (e.g., '2024-12-10T08:24:00').")
+        edits.append({
+            "task_id": item["task_id"],
+            "title": item.get("title"),
+            "description": item.get("description"),
+            "deadline": deadline,
+            "assignees": item.get("assignees"),
+            "occurrence": occurrence,
+        })
+
+    updated = TaskService.update_tasks(int(room_id), edits)
+
+    return {
+        "message": "Tasks updated successfully",
+        "updated": updated
+    }, 200
+
 @tasks_bp.route('/delete/<task_id>', methods=['DELETE'])
 @token_required
 def delete_task(task_id):
@@ -84,7 +179,8 @@ def delete_task(task_id):
     if not user:
         abort(404, description="User not found")
 
-    TaskService.delete_task(user.id, int(task_id))
+    occurrence = request.args.get("occurrence", type=int)
+    TaskService.delete_task(user.id, int(task_id), occurrence)
 
     return {
         "message": "Task deleted successfully"
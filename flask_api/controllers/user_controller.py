@@ -4,14 +4,19 @@ from flask import Blueprint, jsonify, abort, g, request
 
 from repository.user_repo import UserRepo
 from schemas.user_schemas import UserPublicSchema
+from schemas.fast_serializers import BlueprintSchema, FastUserPublicSchema
 from services.user_service import UserService
 from services.room_service import RoomService
 from services.finance_service import FinanceService
-from utils import token_required
+from utils import token_required, debug_endpoint
+from cache.principal_cache import principal_cache
+from cache.membership_index import membership_index
+from cache.calendar_density import calendar_density
+from services.outbox_dispatcher import outbox_dispatcher
 from entities.user import User
 
 users_bp = Blueprint('users', __name__, url_prefix='/users')
-user_schema = UserPublicSchema(many=False)
+user_schema = BlueprintSchema(UserPublicSchema(many=False), FastUserPublicSchema(many=False))
 
 # =============================================================================
 # DUMMY API ENDPOINTS FOR BASIC SETUP
@@ -109,4 +114,35 @@ def cleanup_room_debts(room_id):
 
     FinanceService.cleanup_debt_data(room_id_int)
     
-    return {"message": f"Cleaned up debt data for room {room_id_int}"}, 200
\ No newline at end of file
+    return {"message": f"Cleaned up debt data for room {room_id_int}"}, 200
+
+@users_bp.route('/debug/principal_cache', methods=['GET'])
+@debug_endpoint
+@token_required
+def principal_cache_stats():
+    """Hit/miss counters for the token principal cache"""
+    return jsonify(principal_cache.stats()), 200
+
+
+@users_bp.route('/debug/membership_index', methods=['GET'])
+@debug_endpoint
+@token_required
+def membership_index_stats():
+    """Hit/version-check/reload counters for the room membership index"""
+    return jsonify(membership_index.stats()), 200
+
+
+@users_bp.route('/debug/calendar_density', methods=['GET'])
+@debug_endpoint
+@token_required
+def calendar_density_stats():
+    """Hit/rebuild/applied-delta counters for the calendar density cache"""
+    return jsonify(calendar_density.stats()), 200
+
+
+@users_bp.route('/debug/notification_outbox', methods=['GET'])
+@debug_endpoint
+@token_required
+def notification_outbox_stats():
+    """Dispatch counters, enqueue-to-send latency and backlog depth of the notification outbox"""
+    return jsonify(outbox_dispatcher.stats()), 200
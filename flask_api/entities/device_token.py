@@ -4,7 +4,7 @@ class DeviceToken(db.Model):
     __tablename__ = "device_tokens"
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     token = db.Column(db.String(255), nullable=False)
 
     user = db.relationship("User", back_populates="device_tokens")
@@ -21,10 +21,26 @@ class Bill(db.Model, TimestampMixin):
         db.Enum("waiting", "created", name="bill_status"), default="waiting"
     )
     scheduled_date: Mapped[Optional[datetime]] = mapped_column(db.DateTime)
+    # Recurring series (see recurrence.py): occurrence count and the last
+    # occurrence's scheduled date. NULL for single bills.
+    occurrences: Mapped[Optional[int]] = mapped_column(db.Integer)
+    series_end: Mapped[Optional[datetime]] = mapped_column(db.DateTime)
 
     room  = relationship("Room", back_populates="bills")
     payer = relationship("User", back_populates="bills_paid")
 
+    __table_args__ = (
+        db.Index("ix_bills_room_scheduled", "room_id", "scheduled_date"),
+    )
+
+class BillOccurrence(db.Model):
+    """A cancelled occurrence of a recurring bill."""
+    __tablename__ = "bill_occurrences"
+
+    bill_id: Mapped[int] = mapped_column(db.ForeignKey("bills.id", ondelete="CASCADE"), primary_key=True)
+    occurrence: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    cancelled: Mapped[bool] = mapped_column(db.Boolean, default=False, nullable=False)
+
 class Payment(db.Model, TimestampMixin):
     __tablename__ = "payments"
 
@@ -42,6 +58,10 @@ class Payment(db.Model, TimestampMixin):
     payee = relationship("User", back_populates="payments_recv",
                          foreign_keys=[payee_user_id])
 
+    __table_args__ = (
+        db.Index("ix_payments_room_created", "room_id", "created_at"),
+    )
+
 class FinanceSummary(db.Model):
 
     __tablename__ = "finance_summary"
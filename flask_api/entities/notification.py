@@ -0,0 +1,41 @@
+# flask_api/entities/notification.py
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from . import db
+from typing import Optional
+
+OUTBOX_STATUS = db.Enum("pending", "dead", name="outbox_status")
+
+class NotificationOutbox(db.Model):
+    """A push message waiting to be sent.
+
+    Producers insert rows in the same transaction as the state change that
+    calls for them; OutboxDispatcher leases ready rows, sends them and
+    deletes the ones that went out. Failures are retried with backoff until
+    they run out of attempts and are kept as "dead".
+    """
+    __tablename__ = "notification_outbox"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # What produced the message and for which object, e.g. ("task_deadline", "12:0")
+    kind: Mapped[str] = mapped_column(db.String(50))
+    ref: Mapped[Optional[str]] = mapped_column(db.String(100))
+    user_id: Mapped[int] = mapped_column(db.ForeignKey("users.id"))
+    token: Mapped[str] = mapped_column(db.String(255))
+    title: Mapped[str] = mapped_column(db.String(200))
+    body: Mapped[str] = mapped_column(db.Text)
+
+    status: Mapped[str] = mapped_column(OUTBOX_STATUS, default="pending", nullable=False)
+    attempts: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False)
+    # Not sent before this time; pushed back after each failed attempt
+    available_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Set while a dispatcher holds the row; an expired lease makes it ready again
+    lease_owner: Mapped[Optional[str]] = mapped_column(db.String(64))
+    leased_until: Mapped[Optional[datetime]] = mapped_column(db.DateTime)
+    last_error: Mapped[Optional[str]] = mapped_column(db.Text)
+    created_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_notification_outbox_ready", "status", "available_at", "leased_until"),
+        db.Index("ix_notification_outbox_lease_owner", "lease_owner"),
+    )
@@ -2,6 +2,7 @@
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from . import db, TimestampMixin
 from typing import Optional, List, Dict
+from datetime import datetime
 
 class Room(db.Model, TimestampMixin):
     __tablename__ = "rooms"
@@ -27,6 +28,10 @@ class RoomMember(db.Model, TimestampMixin):
     room = relationship("Room", back_populates="members")
     user = relationship("User", back_populates="rooms")
 
+    __table_args__ = (
+        db.Index("ix_room_members_room_user", "room_id", "user_id"),
+    )
+
 class RoomInvitation(db.Model, TimestampMixin):
     __tablename__ = "room_invitations"
 
@@ -50,4 +55,46 @@ class RoomInvitation(db.Model, TimestampMixin):
         "User",
         back_populates="invitations_received",
         foreign_keys=[invitee_user_id],
-    )
\ No newline at end of file
+    )
+
+    __table_args__ = (
+        db.Index("ix_room_invitations_invitee_status", "invitee_user_id", "status", "created_at"),
+        db.Index("ix_room_invitations_invitee_room", "invitee_user_id", "room_id"),
+        db.Index("ix_room_invitations_room", "room_id"),
+    )
+
+class MembershipVersion(db.Model):
+    """Per-user counter bumped whenever a room_members row for the user changes."""
+    __tablename__ = "membership_versions"
+
+    user_id: Mapped[int] = mapped_column(db.ForeignKey("users.id"), primary_key=True)
+    version: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False)
+
+
+class RoomVersion(db.Model):
+    """Per-room counter bumped by every write that changes what the room's read endpoints return."""
+    __tablename__ = "room_versions"
+
+    room_id: Mapped[int] = mapped_column(db.ForeignKey("rooms.id"), primary_key=True)
+    version: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False)
+    # Change-log entries with id <= compacted_through have been pruned
+    compacted_through: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False)
+    # Bumped only by writes that move task deadlines or bill dates/amounts
+    calendar_version: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False)
+
+
+class RoomChange(db.Model):
+    """Append-only log of room writes, consumed by the delta-sync endpoint."""
+    __tablename__ = "room_changes"
+
+    id:        Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    room_id:   Mapped[int] = mapped_column(db.ForeignKey("rooms.id"))
+    entity:    Mapped[str] = mapped_column(db.String(20))  # room, member, invitation, task, bill, payment
+    entity_id: Mapped[int] = mapped_column(db.Integer)
+    op:        Mapped[str] = mapped_column(db.String(10))  # upsert, delete
+    created_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_room_changes_room_id_id", "room_id", "id"),
+        db.Index("ix_room_changes_created_at", "created_at"),
+    )
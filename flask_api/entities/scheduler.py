@@ -0,0 +1,18 @@
+# flask_api/entities/scheduler.py
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from . import db
+
+
+class SchedulerLease(db.Model):
+    """Which process runs a scheduled job, and until when.
+
+    Every web process starts the same scheduler; before a tick runs a job
+    it takes or renews the job's lease (see SchedulerRepo.acquire), so one
+    process runs each tick. An expired lease can be taken by any process.
+    """
+    __tablename__ = "scheduler_leases"
+
+    name: Mapped[str] = mapped_column(db.String(100), primary_key=True)
+    owner: Mapped[str] = mapped_column(db.String(100), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(db.DateTime, nullable=False)
@@ -0,0 +1,42 @@
+# flask_api/entities/schema.py
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+
+from . import db
+
+
+def upgrade_schema() -> None:
+    """Bring tables created by an older version up to the current models.
+
+    ``db.create_all()`` creates missing tables but never alters existing
+    ones, so a database from before the series columns (tasks.occurrences,
+    tasks.series_end, bills.occurrences, bills.series_end) or the newer
+    indexes would fail on the first query that reads them. For every
+    table that already exists this adds the columns it lacks with
+    ``ALTER TABLE ... ADD COLUMN`` and creates the indexes it lacks.
+    Safe to run on every start: a current database is left untouched.
+    Call it after ``create_all()`` with all entity modules imported.
+    """
+    with db.engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue  # create_all made it with every column and index
+
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(
+                        f"Cannot add NOT NULL column {table.name}.{column.name} without a server default"
+                    )
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                table_name = conn.dialect.identifier_preparer.format_table(table)
+                conn.execute(db.text(f"ALTER TABLE {table_name} ADD COLUMN {ddl}"))
+
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
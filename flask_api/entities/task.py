@@ -3,7 +3,9 @@ from datetime import datetime
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from . import db, TimestampMixin
 from typing import Optional, List, Dict
-from sqlalchemy import Boolean
+from sqlalchemy import Boolean, text
+
+TASK_USER_STATUS = db.Enum("todo", "in-progress", "complete", name="taskuser_status")
 
 class Task(db.Model, TimestampMixin):
     __tablename__ = "tasks"
@@ -18,6 +20,10 @@ class Task(db.Model, TimestampMixin):
 
     scheduled_date: Mapped[Optional[datetime]] = mapped_column(db.DateTime)
     notified: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Recurring series (see recurrence.py): occurrence count and the last
+    # occurrence's deadline. NULL for single tasks.
+    occurrences: Mapped[Optional[int]] = mapped_column(db.Integer)
+    series_end: Mapped[Optional[datetime]] = mapped_column(db.DateTime)
 
     room  = relationship("Room", back_populates="tasks")
     users = relationship(
@@ -27,6 +33,20 @@ class Task(db.Model, TimestampMixin):
         passive_deletes=True
     )
 
+    __table_args__ = (
+        db.Index("ix_tasks_room_scheduled_deadline", "room_id", "scheduled_date", "deadline"),
+        db.Index("ix_tasks_room_deadline", "room_id", "deadline"),
+        db.Index("ix_tasks_deadline_notified", "deadline", "notified"),
+        # Only un-notified rows are ever scanned by the reminder job
+        db.Index(
+            "ix_tasks_pending_deadline",
+            "deadline",
+            postgresql_where=text("notified = false"),
+            sqlite_where=text("notified = 0"),
+        ),
+        db.Index("ix_tasks_series_end", "series_end"),
+    )
+
 
 class TaskUser(db.Model, TimestampMixin):
     __tablename__ = "task_users"
@@ -34,10 +54,54 @@ class TaskUser(db.Model, TimestampMixin):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     task_id: Mapped[int] = mapped_column(db.ForeignKey("tasks.id", ondelete="CASCADE"))
     user_id: Mapped[int] = mapped_column(db.ForeignKey("users.id"))
-    status: Mapped[str] = mapped_column(
-        db.Enum("todo", "in-progress", "complete", name="taskuser_status"),
-        default="todo",
-    )
+    status: Mapped[str] = mapped_column(TASK_USER_STATUS, default="todo")
 
     task = relationship("Task", back_populates="users")
     user = relationship("User", back_populates="tasks")
+
+    __table_args__ = (
+        db.Index("ix_task_users_task_user", "task_id", "user_id"),
+        # Drives /tasks/mine: a user's assignments by status, then tasks by primary key
+        db.Index("ix_task_users_user_status", "user_id", "status", "task_id"),
+    )
+
+
+class TaskOccurrence(db.Model):
+    """Per-occurrence flags of a recurring task (k >= 1; occurrence 0 uses the task row)."""
+    __tablename__ = "task_occurrences"
+
+    task_id: Mapped[int] = mapped_column(db.ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    occurrence: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    cancelled: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    notified: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+
+
+class TaskUserOccurrence(db.Model):
+    """An assignee's status on one occurrence of a recurring task (k >= 1; occurrence 0 uses TaskUser)."""
+    __tablename__ = "task_user_occurrences"
+
+    task_id: Mapped[int] = mapped_column(db.ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    occurrence: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(db.ForeignKey("users.id"), primary_key=True)
+    status: Mapped[str] = mapped_column(TASK_USER_STATUS, nullable=False)
+
+
+class TaskAlertCount(db.Model):
+    """Open task occurrences of a user in a room with a deadline at or before the alert horizon.
+
+    Maintained by AlertRepo inside every task write; the horizon itself is
+    moved forward by the scheduler (see jobs/scheduled_tasks.py).
+    """
+    __tablename__ = "task_alert_counts"
+
+    user_id: Mapped[int] = mapped_column(db.ForeignKey("users.id"), primary_key=True)
+    room_id: Mapped[int] = mapped_column(db.ForeignKey("rooms.id"), primary_key=True)
+    alerts: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False)
+
+
+class AlertHorizon(db.Model):
+    """The deadline task_alert_counts is counted through; a single row."""
+    __tablename__ = "alert_horizon"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    counted_through: Mapped[datetime] = mapped_column(db.DateTime, nullable=False)
@@ -14,6 +14,7 @@ from selenium.webdriver.support import expected_conditions as EC
 from flask import Flask
 from dotenv import dotenv_values
 from entities import db  # Use the shared db instance
+from entities.schema import upgrade_schema
 from importlib import import_module
 from sqlalchemy.orm import configure_mappers
 import sqlite3
@@ -268,10 +269,11 @@ def create_db():
 
         with app.app_context():
             # Load models and create schema
-            for m in ("user", "room", "task", "finance"):
+            for m in ("user", "room", "task", "finance", "notification", "scheduler"):
                 import_module(f"entities.{m}")
             configure_mappers()
             db.create_all()
+            upgrade_schema()
         return app
 
     def run_sql_script(db_path="instance/local_shareSpace.db", script_path="sql_data/seed_db.sql"):
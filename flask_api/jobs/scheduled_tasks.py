@@ -1,41 +1,138 @@
+import os
+import socket
+import uuid
 from datetime import datetime, timedelta
-from firebase_admin import messaging
+from typing import Dict, List, Tuple
 from entities import db
 from entities.task import Task
-from entities.user import User
-from entities.device_token import DeviceToken
-from repository.task_repo import TaskRepo
+from repository.task_repo import TaskRepo, STREAM_BATCH_SIZE
 from repository.user_repo import UserRepo
+from repository.room_repo import RoomRepo
+from repository.alert_repo import AlertRepo, ALERT_WINDOW
+from repository.notification_repo import NotificationRepo
+from repository.scheduler_repo import SchedulerRepo
+from services.task_service import TaskService
+from services.outbox_dispatcher import outbox_dispatcher
 
-def send_upcoming_deadline_notifications(app):
+# How long a job's lease outlives its interval: the holder's next tick renews
+# it in time, and a holder that died is replaced within interval + margin.
+LEASE_MARGIN = timedelta(seconds=30)
+
+_owner = None
+
+
+def scheduler_owner() -> str:
+    """This process's lease owner id; a forked worker gets its own."""
+    global _owner
+    if _owner is None or _owner[0] != os.getpid():
+        _owner = (os.getpid(), f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}")
+    return _owner[1]
+
+
+def run_as_leader(app, job, interval: timedelta) -> bool:
+    """Run ``job(app)`` for this tick if this process holds or can take the job's lease.
+
+    Every worker schedules every job; the lease (named after the job) makes
+    one of them run each tick and keeps the same one running it while it
+    is alive. Returns whether the job ran here.
+    """
+    with app.app_context():
+        if not SchedulerRepo.acquire(job.__name__, scheduler_owner(), datetime.utcnow(), interval + LEASE_MARGIN):
+            return False
+    job(app)
+    return True
+
+
+def release_scheduler_leases(app):
+    with app.app_context():
+        SchedulerRepo.release(scheduler_owner())
+
+
+# Task titles named in a digest before it switches to "and N more"
+DIGEST_TITLES = 3
+
+
+def deadline_digest(name: str, titles: List[str]) -> Tuple[str, str]:
+    """(title, body) of one user's reminder covering ``titles``, soonest first."""
+    if len(titles) == 1:
+        return "⏰ Task Reminder", f"Dear '{name}', '{titles[0]}' is due soon!"
+    named = ", ".join(f"'{title}'" for title in titles[:DIGEST_TITLES])
+    more = len(titles) - DIGEST_TITLES
+    listed = f"{named} and {more} more" if more > 0 else named
+    return f"⏰ {len(titles)} tasks due soon", f"Dear '{name}', {listed} are due soon!"
+
+
+def queue_upcoming_deadline_notifications(app):
     with app.app_context():
-        print("send_upcoming_deadline_notifications started...")
+        print("queue_upcoming_deadline_notifications started...")
         now = datetime.utcnow()
         print(f"Current time: {now}")
         upcoming = now + timedelta(days=2)
 
-        tasks = TaskRepo.get_upcoming_tasks(upcoming)
-        print(f"Found {len(tasks)} tasks with upcoming deadlines.")
-        for task in tasks:
-            print(f"Processing task: {task.title} with deadline {task.deadline}")
-            task_users = TaskRepo.get_uncompleted_task_users(task.id)
-            for task_user in task_users:
-                user = User.query.get(task_user.user_id)
-                token = DeviceToken.query.filter_by(user_id=user.id).first()
-                if not token:
-                    continue
-
-                try:
-                    msg = messaging.Message(
-                        notification=messaging.Notification(
-                            title="⏰ Task Reminder",
-                            body=f"Dear '{user.name}', '{task.title}' is due in less than 1 hour!"
-                        ),
-                        token=token.token
-                    )
-                    messaging.send(msg)
-                    TaskRepo.set_task_notified(task.id)
-
-                    print(f"Notified user {user.username} for task {task.title}")
-                except Exception as e:
-                    print(f"Failed to notify user {user.username}: {e}")
+        # One digest per user per tick, covering every occurrence due to them
+        # in the window, sent to each of their devices.
+        keys = []
+        digests: Dict[int, dict] = {}
+        for task, occurrence, deadline, recipients in TaskService.iter_due_notifications(now, upcoming):
+            print(f"Processing task: {task.title} with deadline {deadline}")
+            keys.append((task.id, occurrence))
+            for recipient in recipients:
+                digest = digests.setdefault(recipient.user_id, {"name": recipient.name, "tokens": set(), "due": {}})
+                digest["tokens"].add(recipient.token)
+                digest["due"][(task.id, occurrence)] = (deadline, task.title)
+
+        # The outbox rows are committed together with the notified flags
+        # (set_occurrences_notified commits), so a crash either queues and
+        # marks the occurrences or neither.
+        messages, queued = [], 0
+        for user_id, digest in digests.items():
+            title, body = deadline_digest(digest["name"], [title for _, title in sorted(digest["due"].values())])
+            messages.extend(
+                {"kind": "task_deadline_digest", "ref": f"{user_id}:{now:%Y-%m-%dT%H:%M}", "user_id": user_id,
+                 "token": token, "title": title, "body": body}
+                for token in sorted(digest["tokens"])
+            )
+            if len(messages) >= STREAM_BATCH_SIZE:
+                queued += NotificationRepo.enqueue(messages)
+                messages = []
+        queued += NotificationRepo.enqueue(messages)
+        TaskRepo.set_occurrences_notified(keys)
+        print(f"Queued {queued} reminders to {len(digests)} users for {len(keys)} task occurrences "
+              f"with upcoming deadlines.")
+
+
+def drain_notification_outbox(app):
+    with app.app_context():
+        delivered = outbox_dispatcher.drain()
+        if delivered:
+            print(f"Sent {delivered} queued notifications; outbox {outbox_dispatcher.stats()}")
+
+
+def purge_dead_notifications(app):
+    with app.app_context():
+        retention_days = app.config.get("OUTBOX_RETENTION_DAYS", 14)
+        purged = NotificationRepo.purge_dead(datetime.utcnow() - timedelta(days=retention_days))
+        print(f"Purged {purged} undeliverable notifications older than {retention_days} days.")
+
+
+def compact_room_changes(app):
+    with app.app_context():
+        retention_days = app.config.get("ROOM_CHANGE_RETENTION_DAYS", 14)
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        rooms = RoomRepo.compact_changes(cutoff)
+        print(f"Compacted room change log for {rooms} rooms (older than {cutoff}).")
+
+
+def slide_alert_window(app):
+    with app.app_context():
+        entered = AlertRepo.slide(datetime.utcnow() + ALERT_WINDOW)
+        if entered:
+            print(f"Alert window moved forward; {entered} task occurrences entered it.")
+
+
+def reconcile_alert_counts(app):
+    with app.app_context():
+        drift = AlertRepo.reconcile()
+        for (user_id, room_id), (stored, recounted) in sorted(drift.items()):
+            print(f"Alert counter drift for user {user_id} in room {room_id}: stored {stored}, recounted {recounted}")
+        print(f"Reconciled alert counters; {len(drift)} repaired.")
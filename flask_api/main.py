@@ -3,12 +3,25 @@ import argparse
 from flask import Flask
 from dotenv import dotenv_values
 from entities import db
+from entities.schema import upgrade_schema
+from cache.principal_cache import principal_cache
+from cache.membership_index import membership_index
+from cache.calendar_density import calendar_density
+from services.password_hasher import password_hasher
+from services.push_dispatcher import push_dispatcher
+from services.outbox_dispatcher import outbox_dispatcher
 from importlib import import_module
 from sqlalchemy.orm import configure_mappers
 import firebase_admin
 from firebase_admin import credentials
 from apscheduler.schedulers.background import BackgroundScheduler
-from jobs.scheduled_tasks import send_upcoming_deadline_notifications
+from jobs.scheduled_tasks import (
+    queue_upcoming_deadline_notifications, drain_notification_outbox, purge_dead_notifications,
+    compact_room_changes, slide_alert_window, reconcile_alert_counts,
+    run_as_leader, release_scheduler_leases,
+)
+from datetime import datetime, timedelta
+import atexit
 
 def create_app() -> Flask:
     app = Flask(__name__)
@@ -30,6 +43,33 @@ def create_app() -> Flask:
         SECRET_KEY                = cfg.get("SECRET_KEY", "dev-secret-key"),
         SQLALCHEMY_DATABASE_URI   = database_uri,
         SQLALCHEMY_TRACK_MODIFICATIONS = False,
+        PRINCIPAL_CACHE_SIZE      = int(cfg.get("PRINCIPAL_CACHE_SIZE", 1024)),
+        PRINCIPAL_CACHE_TTL       = float(cfg.get("PRINCIPAL_CACHE_TTL", 300)),
+        MEMBERSHIP_INDEX_SIZE     = int(cfg.get("MEMBERSHIP_INDEX_SIZE", 4096)),
+        MEMBERSHIP_RECHECK_INTERVAL = float(cfg.get("MEMBERSHIP_RECHECK_INTERVAL", 5)),
+        PASSWORD_HASH_WORKERS     = int(cfg.get("PASSWORD_HASH_WORKERS", 2)),
+        PASSWORD_HASH_QUEUE_SIZE  = int(cfg.get("PASSWORD_HASH_QUEUE_SIZE", 16)),
+        PASSWORD_HASH_ACQUIRE_TIMEOUT = float(cfg.get("PASSWORD_HASH_ACQUIRE_TIMEOUT", 0.5)),
+        ROOM_CHANGE_RETENTION_DAYS = int(cfg.get("ROOM_CHANGE_RETENTION_DAYS", 14)),
+        CALENDAR_MAX_RANGE_DAYS   = int(cfg.get("CALENDAR_MAX_RANGE_DAYS", 62)),
+        CALENDAR_DENSITY_DAYS     = int(cfg.get("CALENDAR_DENSITY_DAYS", 60)),
+        CALENDAR_DENSITY_CACHE_SIZE = int(cfg.get("CALENDAR_DENSITY_CACHE_SIZE", 1024)),
+        PAGE_SIZE_DEFAULT         = int(cfg.get("PAGE_SIZE_DEFAULT", 50)),
+        PAGE_SIZE_MAX             = int(cfg.get("PAGE_SIZE_MAX", 200)),
+        TASK_BATCH_MAX            = int(cfg.get("TASK_BATCH_MAX", 500)),
+        PUSH_TRANSPORT            = cfg.get("PUSH_TRANSPORT", "firebase"),
+        PUSH_DISPATCH_WORKERS     = int(cfg.get("PUSH_DISPATCH_WORKERS", 4)),
+        PUSH_BATCH_SIZE           = int(cfg.get("PUSH_BATCH_SIZE", 500)),
+        OUTBOX_BATCH_SIZE         = int(cfg.get("OUTBOX_BATCH_SIZE", 1000)),
+        OUTBOX_LEASE_SECONDS      = float(cfg.get("OUTBOX_LEASE_SECONDS", 120)),
+        OUTBOX_MAX_ATTEMPTS       = int(cfg.get("OUTBOX_MAX_ATTEMPTS", 6)),
+        OUTBOX_RETRY_BASE_SECONDS = float(cfg.get("OUTBOX_RETRY_BASE_SECONDS", 30)),
+        OUTBOX_RETRY_MAX_SECONDS  = float(cfg.get("OUTBOX_RETRY_MAX_SECONDS", 3600)),
+        OUTBOX_RETENTION_DAYS     = int(cfg.get("OUTBOX_RETENTION_DAYS", 14)),
+        DEBUG_ENDPOINTS           = cfg.get("DEBUG_ENDPOINTS", "false").lower() == "true",
+        FAST_SERIALIZER_BLUEPRINTS = {
+            name.strip() for name in cfg.get("FAST_SERIALIZER_BLUEPRINTS", "room,users").split(",") if name.strip()
+        },
     )
     
     if not app.config["SQLALCHEMY_DATABASE_URI"]:
@@ -37,13 +77,20 @@ def create_app() -> Flask:
 
     # ── Bind extensions FIRST ─────────────────────────
     db.init_app(app)
+    principal_cache.init_app(app)
+    membership_index.init_app(app)
+    calendar_density.init_app(app)
+    password_hasher.init_app(app)
+    push_dispatcher.init_app(app)
+    outbox_dispatcher.init_app(app)
 
     # ── Load all models while a context is active ─────
     with app.app_context():
-        for m in ("user", "room", "task", "finance"):
+        for m in ("user", "room", "task", "finance", "notification", "scheduler"):
             import_module(f"entities.{m}")
         configure_mappers()
         db.create_all()
+        upgrade_schema()
 
     # ── NOW import & register blueprints ──────────────
     from controllers.auth_controller   import auth_bp
@@ -70,12 +117,45 @@ app = create_app()
 init_firebase()
 
 scheduler = BackgroundScheduler()
+# Every worker process runs this scheduler; run_as_leader lets one of them
+# run each tick (a lease row per job), except for the outbox drain, whose
+# rows are leased individually so every worker can help send them.
 scheduler.add_job(
-    lambda: send_upcoming_deadline_notifications(app),
+    lambda: run_as_leader(app, queue_upcoming_deadline_notifications, timedelta(minutes=15)),
     'interval',
     minutes=15
 )
+# Sends what producers queued in notification_outbox
+scheduler.add_job(
+    lambda: drain_notification_outbox(app),
+    'interval',
+    seconds=30
+)
+scheduler.add_job(
+    lambda: run_as_leader(app, purge_dead_notifications, timedelta(hours=24)),
+    'interval',
+    hours=24
+)
+scheduler.add_job(
+    lambda: run_as_leader(app, compact_room_changes, timedelta(hours=24)),
+    'interval',
+    hours=24
+)
+# Alert counters count through a horizon that has to keep up with the clock
+scheduler.add_job(
+    lambda: run_as_leader(app, slide_alert_window, timedelta(minutes=5)),
+    'interval',
+    minutes=5,
+    next_run_time=datetime.now()
+)
+scheduler.add_job(
+    lambda: run_as_leader(app, reconcile_alert_counts, timedelta(hours=24)),
+    'interval',
+    hours=24
+)
 scheduler.start()
+# Hand this worker's leases over at once on a clean exit instead of at expiry
+atexit.register(lambda: release_scheduler_leases(app))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,45 @@
+# flask_api/perf/__init__.py
+# Benchmarks and query-plan checks. Run from the flask_api folder, e.g.
+#   python -m perf.login_throughput
+from flask import Flask
+from entities import db
+from importlib import import_module
+from sqlalchemy.orm import configure_mappers
+
+# Register every mapper before any marshmallow schema inspects a model.
+for _module in ("user", "room", "task", "finance", "notification", "scheduler"):
+    import_module(f"entities.{_module}")
+
+
+def create_bench_app(database_uri: str = "sqlite://", **config) -> Flask:
+    """Same wiring as main.create_app, minus firebase and the scheduler."""
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY="bench-secret-key-bench-secret-key",
+        SQLALCHEMY_DATABASE_URI=database_uri,
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        **config,
+    )
+    db.init_app(app)
+
+    with app.app_context():
+        for m in ("user", "room", "task", "finance", "notification", "scheduler"):
+            import_module(f"entities.{m}")
+        configure_mappers()
+        db.create_all()
+
+    from controllers.auth_controller   import auth_bp
+    from controllers.user_controller   import users_bp
+    from controllers.room_controller   import rooms_bp
+    from controllers.task_controller   import tasks_bp
+    from controllers.finance_controller import finance_bp
+    from controllers.calendar_controller import calendar_bp
+
+    app.register_blueprint(auth_bp,   url_prefix="/auth")
+    app.register_blueprint(users_bp,  url_prefix="/users")
+    app.register_blueprint(rooms_bp,  url_prefix="/rooms")
+    app.register_blueprint(tasks_bp,  url_prefix="/tasks")
+    app.register_blueprint(finance_bp, url_prefix="/finance")
+    app.register_blueprint(calendar_bp, url_prefix="/calendar")
+
+    return app
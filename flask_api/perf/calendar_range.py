@@ -0,0 +1,97 @@
+# flask_api/perf/calendar_range.py
+# One /calendar range request vs one request per day for a month view.
+#   python -m perf.calendar_range --tasks 3000 --bills 1000
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import jwt
+from sqlalchemy import insert
+
+from perf import create_bench_app
+from entities import db
+from entities.user import User
+from entities.room import Room, RoomMember
+from entities.task import Task, TaskUser
+from entities.finance import Bill
+
+ROOM_ID = 1
+
+
+def seed(task_count: int, bill_count: int) -> None:
+    rng = random.Random(11)
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [
+        {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+        for i in range(1, 5)
+    ])
+    db.session.execute(insert(Room), [{"id": ROOM_ID, "name": "Flat", "address": "1 Main St"}])
+    db.session.execute(insert(RoomMember), [{"room_id": ROOM_ID, "user_id": i} for i in range(1, 5)])
+    # Deadlines spread over the past 60 days, all already visible.
+    tasks = []
+    for i in range(1, task_count + 1):
+        deadline = now - timedelta(minutes=rng.randint(0, 60 * 24 * 60))
+        tasks.append({"id": i, "room_id": ROOM_ID, "title": "chore", "scheduled_date": deadline - timedelta(days=1),
+                      "deadline": deadline, "notified": True})
+    db.session.execute(insert(Task), tasks)
+    db.session.execute(insert(TaskUser), [
+        {"task_id": t, "user_id": u, "status": "todo"} for t in range(1, task_count + 1) for u in (1, 2)
+    ])
+    db.session.execute(insert(Bill), [
+        {"room_id": ROOM_ID, "amount": 10, "title": "bill", "category": "misc", "payer_user_id": 1,
+         "scheduled_date": now - timedelta(minutes=rng.randint(0, 60 * 24 * 60))}
+        for _ in range(bill_count)
+    ])
+    db.session.commit()
+
+
+def timed(fn, rounds: int):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = fn()
+    return (time.perf_counter() - start) / rounds, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=3000)
+    parser.add_argument("--bills", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        seed(args.tasks, args.bills)
+    token = jwt.encode({"username": "user1"}, app.config["SECRET_KEY"], algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    client = app.test_client()
+
+    last = datetime.utcnow().date()
+    days = [last - timedelta(days=offset) for offset in range(args.days - 1, -1, -1)]
+
+    def one_day(day):
+        response = client.post(f"/calendar/{ROOM_ID}", json={"date": day.isoformat()}, headers=headers)
+        assert response.status_code == 200, response.data
+        return response.get_json()
+
+    def per_day():
+        return {day.isoformat(): one_day(day) for day in days}
+
+    def ranged():
+        response = client.post(f"/calendar/{ROOM_ID}", json={"start": days[0].isoformat(), "end": days[-1].isoformat()},
+                               headers=headers)
+        assert response.status_code == 200, response.data
+        return response.get_json()
+
+    single_time, _ = timed(lambda: one_day(last), args.rounds)
+    loop_time, expected = timed(per_day, args.rounds)
+    range_time, actual = timed(ranged, args.rounds)
+
+    expected = {day: schedule for day, schedule in expected.items() if schedule["tasks"] or schedule["bills"]}
+    assert actual["days"] == expected, "range output differs from per-day requests"
+
+    print(f"single day            {single_time * 1000:8.2f} ms")
+    print(f"{args.days} single-day calls  {loop_time * 1000:8.2f} ms")
+    print(f"one {args.days}-day range     {range_time * 1000:8.2f} ms   x{loop_time / range_time:.1f} vs per-day loop")
@@ -0,0 +1,80 @@
+# flask_api/perf/deadline_digest.py
+# Deadline reminders: one push per (occurrence, device) vs one digest per (user, device), and the statements spent
+# marking the occurrences notified.
+#   python -m perf.deadline_digest --tasks 2000 20000
+import argparse
+import contextlib
+import io
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, delete, select, func
+
+from perf import create_bench_app
+from perf.notification_candidates import seed, USERS
+from entities import db
+from entities.user import User
+from entities.room import Room
+from entities.device_token import DeviceToken
+from entities.task import TaskOccurrence
+from entities.notification import NotificationOutbox
+from services.task_service import TaskService
+from jobs.scheduled_tasks import queue_upcoming_deadline_notifications
+
+
+def count_statements(fn, *args):
+    statements = []
+    listener = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        fn(*args)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    return statements
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, nargs="+", default=[2000, 20000])
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "name": f"User {i}", "email": f"user{i}@example.com",
+             "password_hash": "x"}
+            for i in range(1, USERS + 1)
+        ])
+        db.session.execute(insert(Room), [{"id": 1, "name": "Flat", "address": ""}])
+        # Every user on two devices; one in five on none
+        db.session.execute(insert(DeviceToken), [
+            {"user_id": i, "token": f"token-{i}-{d}"} for i in range(1, USERS + 1) if i % 5 for d in (1, 2)
+        ])
+        db.session.commit()
+
+        for task_count in args.tasks:
+            seed(task_count)
+            db.session.execute(delete(NotificationOutbox))
+            db.session.execute(delete(TaskOccurrence))
+            # Some later occurrences already have a row (a cancelled sibling, say)
+            db.session.execute(insert(TaskOccurrence), [
+                {"task_id": i, "occurrence": k, "cancelled": False, "notified": False}
+                for i in range(20, task_count + 1, 20) for k in range(1, 31)
+            ])
+            db.session.commit()
+
+            now = datetime.utcnow()
+            due = list(TaskService.iter_due_notifications(now, now + timedelta(days=2)))
+            per_occurrence = sum(len(recipients) for _, _, _, recipients in due)
+            db.session.rollback()
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                statements = count_statements(queue_upcoming_deadline_notifications, app)
+            digests = db.session.scalar(select(func.count()).select_from(NotificationOutbox))
+            writes = [s for s in statements if s.lstrip().upper().startswith(("UPDATE", "INSERT"))]
+            print(f"tasks={task_count:<6} occurrences={len(due):<5} pushes per occurrence {per_occurrence:6d}  "
+                  f"digests {digests:4d}  fan-in {per_occurrence / max(digests, 1):5.1f}x  "
+                  f"writes {len(writes)} (per-occurrence flags would be ~{len(due)})")
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                queue_upcoming_deadline_notifications(app)
+            assert db.session.scalar(select(func.count()).select_from(NotificationOutbox)) == digests, "re-notified"
@@ -0,0 +1,112 @@
+# flask_api/perf/finance_activity.py
+# Finance activity feed: load-everything-and-sort vs the merged stream and one keyset page.
+#   python -m perf.finance_activity --bills 20000 --payments 20000
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import joinedload
+
+from perf import create_bench_app
+from entities import db
+from entities.user import User
+from entities.room import Room
+from entities.finance import Bill, Payment
+from services.finance_service import FinanceService
+
+ROOM_ID = 1
+
+
+def seed(bill_count: int, payment_count: int) -> None:
+    rng = random.Random(5)
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [
+        {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+        for i in range(1, 5)
+    ])
+    db.session.execute(insert(Room), [{"id": ROOM_ID, "name": "Flat", "address": "1 Main St"}])
+    # Three years of history, all already visible.
+    db.session.execute(insert(Bill), [
+        {"room_id": ROOM_ID, "amount": 10, "title": "bill", "category": "misc", "payer_user_id": 1,
+         "scheduled_date": now - timedelta(minutes=rng.randint(1, 60 * 24 * 365 * 3)),
+         "meta_data": {"users": [{"user_id": 1, "amount_due": 5}, {"user_id": 2, "amount_due": 5}]}}
+        for _ in range(bill_count)
+    ])
+    db.session.execute(insert(Payment), [
+        {"room_id": ROOM_ID, "amount": 5, "title": "payment", "category": "misc", "payer_user_id": 2,
+         "payee_user_id": 1, "created_at": now - timedelta(minutes=rng.randint(1, 60 * 24 * 365 * 3))}
+        for _ in range(payment_count)
+    ])
+    db.session.commit()
+
+
+def legacy_activity():
+    """The previous implementation: every row with joinedloads, sorted in Python."""
+    bills = db.session.scalars(
+        select(Bill)
+        .where(Bill.room_id == ROOM_ID, Bill.scheduled_date <= datetime.utcnow())
+        .order_by(Bill.scheduled_date.desc())
+        .options(joinedload(Bill.payer))
+    ).all()
+    payments = db.session.scalars(
+        select(Payment)
+        .where(Payment.room_id == ROOM_ID)
+        .order_by(Payment.created_at.desc())
+        .options(joinedload(Payment.payer), joinedload(Payment.payee))
+    ).all()
+    merged = []
+    for bill in bills:
+        item = FinanceService.bill_to_dict(bill)
+        item["_sort_key"] = bill.scheduled_date
+        merged.append(item)
+    for payment in payments:
+        item = FinanceService.payment_to_dict(payment)
+        item["_sort_key"] = payment.created_at
+        merged.append(item)
+    merged.sort(key=lambda x: x["_sort_key"], reverse=True)
+    for item in merged:
+        item.pop("_sort_key", None)
+    return merged
+
+
+def measure(fn):
+    db.session.expunge_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bills", type=int, default=20000)
+    parser.add_argument("--payments", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        seed(args.bills, args.payments)
+
+        runs = [
+            ("load + sort", legacy_activity),
+            ("stream, whole feed", lambda: list(FinanceService.get_room_financial_activity(ROOM_ID))),
+            ("stream, first item", lambda: list(islice(FinanceService.get_room_financial_activity(ROOM_ID), 1))),
+            (f"page of {args.limit}", lambda: FinanceService.get_financial_activity_page(ROOM_ID, args.limit)[0]),
+        ]
+        results = {}
+        for name, fn in runs:
+            elapsed, peak, results[name] = measure(fn)
+            print(f"{name:<20} {elapsed * 1000:9.1f} ms   peak {peak / 2 ** 20:7.1f} MiB")
+
+        dates = lambda items: [item.get("scheduled_date") or item["created_at"] for item in items]
+        expected = dates(results["load + sort"])
+        assert dates(results["stream, whole feed"]) == expected, "stream order differs from the sorted list"
+        assert dates(results[f"page of {args.limit}"]) == expected[:args.limit], "page differs from the list head"
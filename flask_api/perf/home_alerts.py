@@ -0,0 +1,91 @@
+# flask_api/perf/home_alerts.py
+# Home-screen alert badges: recounting tasks per load vs the maintained counters.
+#   python -m perf.home_alerts --rooms 5 --tasks 20000
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, func, or_
+
+from perf import create_bench_app
+from entities import db
+from entities.user import User
+from entities.room import Room, RoomMember
+from entities.task import Task, TaskUser
+from repository.alert_repo import AlertRepo, ALERT_WINDOW
+from services.room_service import RoomService
+
+USER_ID = 1
+
+
+def seed(room_count: int, task_count: int) -> None:
+    rng = random.Random(20)
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [
+        {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"} for i in (1, 2)
+    ])
+    db.session.execute(insert(Room), [{"id": r, "name": f"Room {r}", "address": ""} for r in range(1, room_count + 1)])
+    db.session.execute(insert(RoomMember), [
+        {"room_id": r, "user_id": u} for r in range(1, room_count + 1) for u in (1, 2)
+    ])
+    # A year of history either side of today; most of it done
+    db.session.execute(insert(Task), [
+        {"id": i, "room_id": rng.randint(1, room_count), "title": "chore", "scheduled_date": now - timedelta(days=400),
+         "deadline": now + timedelta(minutes=rng.randint(-60 * 24 * 365, 60 * 24 * 365))}
+        for i in range(1, task_count + 1)
+    ])
+    db.session.execute(insert(TaskUser), [
+        {"task_id": i, "user_id": u, "status": rng.choice(("complete", "complete", "complete", "todo"))}
+        for i in range(1, task_count + 1) for u in (1, 2)
+    ])
+    db.session.commit()
+
+
+def legacy_alerts(user_id: int):
+    """The previous per-load recount of the user's open tasks due within the window."""
+    stmt = (
+        select(Task.room_id, func.count(TaskUser.id))
+            .join(TaskUser, TaskUser.task_id == Task.id)
+            .where(TaskUser.user_id == user_id, or_(TaskUser.status.is_(None), TaskUser.status != "complete"),
+                   Task.deadline.is_not(None), Task.deadline <= datetime.utcnow() + ALERT_WINDOW)
+            .group_by(Task.room_id)
+    )
+    return dict(db.session.execute(stmt).all())
+
+
+def timed(fn, runs: int):
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = fn()
+    return (time.perf_counter() - start) / runs, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        seed(args.rooms, args.tasks)
+        start = time.perf_counter()
+        AlertRepo.rebuild(datetime.utcnow() + ALERT_WINDOW)
+        print(f"initial build      {(time.perf_counter() - start) * 1000:9.2f} ms")
+
+        old, expected = timed(lambda: legacy_alerts(USER_ID), args.runs)
+        new, summary = timed(lambda: RoomService.get_room_alerts_and_balances(USER_ID), args.runs)
+        actual = {room_id: row["alerts"] for room_id, row in summary.items() if row["alerts"]}
+        assert actual == expected, (actual, expected)
+        print(f"recount per load   {old * 1000:9.2f} ms")
+        print(f"counters per load  {new * 1000:9.2f} ms")
+
+        start = time.perf_counter()
+        AlertRepo.slide(datetime.utcnow() + ALERT_WINDOW + timedelta(minutes=5))
+        print(f"5-minute slide     {(time.perf_counter() - start) * 1000:9.2f} ms")
+        start = time.perf_counter()
+        drift = AlertRepo.reconcile()
+        print(f"reconcile          {(time.perf_counter() - start) * 1000:9.2f} ms   drift {len(drift)}")
+        assert not drift
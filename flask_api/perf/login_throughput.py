@@ -0,0 +1,85 @@
+# flask_api/perf/login_throughput.py
+# Login throughput with N concurrent clients: inline hashing vs the pool.
+#   python -m perf.login_throughput --clients 16 --logins 8 --workers 4
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from perf import create_bench_app
+from services.password_hasher import password_hasher
+
+
+def run(workers: int, clients: int, logins_per_client: int, db_path: str) -> dict:
+    app = create_bench_app(f"sqlite:///{db_path}", PASSWORD_HASH_WORKERS=workers,
+                           PASSWORD_HASH_QUEUE_SIZE=clients, PASSWORD_HASH_ACQUIRE_TIMEOUT=30)
+    password_hasher.init_app(app)
+
+    client = app.test_client()
+    r = client.post("/auth/login", json={"username": "bench", "password": "bench-password"})
+    if r.status_code != 200:
+        r = client.post("/auth/create-user", json={"username": "bench", "password": "bench-password",
+                                                   "email": "bench@example.com"})
+    token = r.get_json()["token"]
+
+    statuses = []
+    # A cheap endpoint polled alongside the logins shows how much the
+    # hashing stalls unrelated requests in the same process.
+    probe_latencies = []
+    probe_statuses = []
+    done = threading.Event()
+
+    def login_client():
+        c = app.test_client()
+        for _ in range(logins_per_client):
+            r = c.post("/auth/login", json={"username": "bench", "password": "bench-password"})
+            statuses.append(r.status_code)
+
+    def probe():
+        c = app.test_client()
+        while not done.is_set():
+            t0 = time.perf_counter()
+            r = c.get("/rooms", headers={"Authorization": f"Bearer {token}"})
+            probe_latencies.append(time.perf_counter() - t0)
+            probe_statuses.append(r.status_code)
+            time.sleep(0.005)
+
+    probe_thread = threading.Thread(target=probe)
+    threads = [threading.Thread(target=login_client) for _ in range(clients)]
+    start = time.perf_counter()
+    probe_thread.start()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    probe_thread.join()
+    password_hasher.shutdown()
+    assert set(probe_statuses) <= {200}, f"probe failed: {sorted(set(probe_statuses))}"
+
+    probe_latencies.sort()
+    p99 = probe_latencies[int(len(probe_latencies) * 0.99) - 1] if probe_latencies else 0.0
+    return {
+        "workers": workers,
+        "logins": len(statuses),
+        "ok": statuses.count(200),
+        "seconds": round(elapsed, 3),
+        "logins_per_sec": round(len(statuses) / elapsed, 1),
+        "probe_p99_ms": round(p99 * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=4, help="Logins per client")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        for workers in (0, args.workers):
+            label = "inline" if workers == 0 else f"pool({workers})"
+            print(label, run(workers, args.clients, args.logins, db_path))
@@ -0,0 +1,120 @@
+# flask_api/perf/notification_candidates.py
+# Deadline reminder candidates: per-task/per-user lookups vs one streamed join, as the tasks table grows.
+#   python -m perf.notification_candidates --tasks 1000 10000 50000
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, delete, select
+
+from perf import create_bench_app
+from entities import db
+from entities.user import User
+from entities.room import Room
+from entities.device_token import DeviceToken
+from entities.task import Task, TaskUser
+from services.task_service import TaskService
+import recurrence
+
+USERS = 50
+
+
+def seed(task_count: int) -> None:
+    """``task_count`` tasks over a year either side of now, every twentieth a weekly series; two assignees each."""
+    rng = random.Random(21)
+    db.session.execute(delete(TaskUser))
+    db.session.execute(delete(Task))
+    now = datetime.utcnow()
+    tasks = []
+    for i in range(1, task_count + 1):
+        deadline = now + timedelta(minutes=rng.randint(-60 * 24 * 365, 60 * 24 * 365))
+        series = i % 20 == 0
+        tasks.append({
+            "id": i, "room_id": 1, "title": "chore", "scheduled_date": deadline - timedelta(days=7),
+            "deadline": deadline, "frequency": "1w" if series else "", "notified": deadline < now,
+            "occurrences": 30 if series else None, "series_end": deadline + timedelta(weeks=29) if series else None,
+        })
+    db.session.execute(insert(Task), tasks)
+    db.session.execute(insert(TaskUser), [
+        {"task_id": i, "user_id": u, "status": rng.choice(("todo", "complete"))}
+        for i in range(1, task_count + 1) for u in rng.sample(range(1, USERS + 1), 2)
+    ])
+    db.session.commit()
+
+
+def legacy_candidates(now, until):
+    """The previous job: tracked tasks, lazy-loaded assignees, then a user and a token lookup per recipient."""
+    tasks = {task.id: task for task in db.session.scalars(
+        select(Task).where(Task.deadline <= until, Task.deadline >= now, Task.notified == False)
+    )}
+    tasks.update((task.id, task) for task in db.session.scalars(
+        select(Task).where(Task.series_end >= now, Task.deadline <= until)
+    ))
+    sent = []
+    for task in tasks.values():
+        step, count = recurrence.series(task)
+        for k in recurrence.occurrence_indexes(task.deadline, step, count, now, until + timedelta(microseconds=1)):
+            for task_user in task.users:
+                if k == 0 and task_user.status == "complete":
+                    continue
+                user = db.session.get(User, task_user.user_id)
+                token = DeviceToken.query.filter_by(user_id=user.id).first()
+                if token:
+                    sent.append((task.id, k, user.id))
+    return sorted(sent)
+
+
+def streamed_candidates(now, until):
+    return sorted(
+        (task.id, k, row.user_id)
+        for task, k, _, recipients in TaskService.iter_due_notifications(now, until) for row in recipients
+    )
+
+
+def measure(fn, *args):
+    statements = []
+    listener = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    db.session.expunge_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn(*args)
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        event.remove(db.engine, "before_cursor_execute", listener)
+    return len(statements), elapsed, peak, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+            for i in range(1, USERS + 1)
+        ])
+        db.session.execute(insert(Room), [{"id": 1, "name": "Flat", "address": ""}])
+        # One user in five has no device registered
+        db.session.execute(insert(DeviceToken), [
+            {"user_id": i, "token": f"token-{i}"} for i in range(1, USERS + 1) if i % 5
+        ])
+        db.session.commit()
+
+        now = datetime.utcnow()
+        until = now + timedelta(days=2)
+        for task_count in args.tasks:
+            seed(task_count)
+            old_queries, old_time, old_peak, expected = measure(legacy_candidates, now, until)
+            new_queries, new_time, new_peak, actual = measure(streamed_candidates, now, until)
+            assert actual == expected, "streamed candidates differ from the per-row lookups"
+            print(f"tasks={task_count:<6} recipients={len(actual):<5} "
+                  f"lookups {old_queries:5d} queries {old_time * 1000:8.1f} ms {old_peak / 2 ** 20:6.1f} MiB   "
+                  f"streamed {new_queries:3d} queries {new_time * 1000:7.1f} ms {new_peak / 2 ** 20:6.1f} MiB")
@@ -0,0 +1,226 @@
+# flask_api/perf/query_plans.py
+# Seeds a large SQLite database, runs every repository read query and checks
+# its EXPLAIN QUERY PLAN. Exits non-zero if any query full-scans a table.
+#   python -m perf.query_plans [--rooms 200] [--verbose]
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert
+
+from perf import create_bench_app
+from entities import db
+from entities.user import User
+from entities.device_token import DeviceToken
+from entities.room import Room, RoomMember, RoomInvitation, RoomChange
+from entities.task import Task, TaskUser
+from entities.finance import Bill, Payment
+from entities.notification import NotificationOutbox
+from repository.task_repo import TaskRepo
+from repository.finance_repo import FinanceRepo
+from repository.room_repo import RoomRepo
+from repository.user_repo import UserRepo
+from repository.alert_repo import AlertRepo
+from repository.notification_repo import NotificationRepo
+
+SCAN = re.compile(r"\bSCAN (\w+)")
+
+# Queries whose scan is understood; each entry should name why.
+KNOWN_SCANS = set()
+
+
+def seed(rooms: int, members_per_room: int = 5, tasks_per_room: int = 100, bills_per_room: int = 50) -> None:
+    rng = random.Random(446)
+    now = datetime.utcnow()
+    user_count = rooms * 2
+    db.session.execute(insert(User), [
+        {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+        for i in range(1, user_count + 1)
+    ])
+    db.session.execute(insert(DeviceToken), [
+        {"user_id": i, "token": f"token-{i}"} for i in range(1, user_count + 1)
+    ])
+    db.session.execute(insert(Room), [
+        {"id": r, "name": f"Room {r}", "address": f"{r} Main St"} for r in range(1, rooms + 1)
+    ])
+
+    members, invitations, tasks, task_users, bills, payments, changes, outbox = [], [], [], [], [], [], [], []
+    task_id = 0
+    for r in range(1, rooms + 1):
+        room_users = rng.sample(range(1, user_count + 1), members_per_room)
+        members += [{"room_id": r, "user_id": u} for u in room_users]
+        invitations.append({"room_id": r, "inviter_user_id": room_users[0],
+                            "invitee_user_id": rng.randint(1, user_count), "status": "waiting"})
+        for _ in range(tasks_per_room):
+            task_id += 1
+            scheduled = now + timedelta(days=rng.randint(-300, 60))
+            tasks.append({"id": task_id, "room_id": r, "title": "chore", "scheduled_date": scheduled,
+                          "deadline": scheduled + timedelta(hours=rng.randint(1, 72)),
+                          "notified": rng.random() < 0.9})
+            for u in rng.sample(room_users, 2):
+                task_users.append({"task_id": task_id, "user_id": u,
+                                   "status": rng.choice(["todo", "in-progress", "complete"])})
+            changes.append({"room_id": r, "entity": "task", "entity_id": task_id, "op": "upsert"})
+            if rng.random() < 0.05:
+                outbox.append({"kind": "task_deadline", "ref": f"{task_id}:0", "user_id": room_users[0],
+                               "token": f"token-{room_users[0]}", "title": "reminder", "body": "chore",
+                               "status": rng.choice(["pending", "pending", "dead"]),
+                               "available_at": now + timedelta(minutes=rng.randint(-60, 60)), "created_at": now})
+        for _ in range(bills_per_room):
+            bills.append({"room_id": r, "amount": 10, "title": "bill", "category": "misc",
+                          "payer_user_id": room_users[0],
+                          "scheduled_date": now + timedelta(days=rng.randint(-300, 60))})
+            payments.append({"room_id": r, "amount": 5, "title": "payment", "category": "misc",
+                             "payer_user_id": room_users[1], "payee_user_id": room_users[0]})
+
+    for model, rows in ((RoomMember, members), (RoomInvitation, invitations), (Task, tasks),
+                        (TaskUser, task_users), (Bill, bills), (Payment, payments), (RoomChange, changes),
+                        (NotificationOutbox, outbox)):
+        db.session.execute(insert(model), rows)
+    db.session.commit()
+    db.session.execute(db.text("ANALYZE"))
+    db.session.commit()
+
+
+def repository_queries(now: datetime):
+    """(label, callable) for every read query on the four repositories."""
+    day_start = datetime.combine(now.date(), datetime.min.time())
+    day_end = day_start + timedelta(days=1)
+    return [
+        ("TaskRepo.get_tasks_for_room", lambda: TaskRepo.get_tasks_for_room(7, now)),
+        ("TaskRepo.get_assignee_statuses_for_room", lambda: TaskRepo.get_assignee_statuses_for_room(7, now)),
+        ("TaskRepo.get_assignee_statuses", lambda: TaskRepo.get_assignee_statuses([1, 2, 3])),
+        ("TaskRepo.get_single_tasks_page", lambda: TaskRepo.get_single_tasks_page(7, now, 51)),
+        ("TaskRepo.get_single_tasks_page (cursor)",
+         lambda: TaskRepo.get_single_tasks_page(7, now, 51, (day_start, 42))),
+        ("TaskRepo.get_series_for_room", lambda: TaskRepo.get_series_for_room(7, now, day_start, day_end)),
+        ("TaskRepo.get_all_tasks_for_room", lambda: TaskRepo.get_all_tasks_for_room(7)),
+        ("TaskRepo.get_tasks_by_ids", lambda: TaskRepo.get_tasks_by_ids([1, 2, 3])),
+        ("TaskRepo.get_latest_visible_scheduled_date", lambda: TaskRepo.get_latest_visible_scheduled_date(7, now)),
+        ("TaskRepo.get_tasks_for_room_between", lambda: TaskRepo.get_tasks_for_room_between(7, day_start, day_end)),
+        ("TaskRepo.get_task_rows_for_room_between",
+         lambda: TaskRepo.get_task_rows_for_room_between(7, day_start, day_end)),
+        ("TaskRepo.get_task_series_between",
+         lambda: TaskRepo.get_task_series_between(7, day_start, day_end + timedelta(days=59))),
+        ("TaskRepo.get_occurrence_state", lambda: TaskRepo.get_occurrence_state([1, 2, 3])),
+        ("TaskRepo.get_tasks_for_user",
+         lambda: TaskRepo.get_tasks_for_user(3, ("todo", "in-progress"), now, day_start, day_end)),
+        ("TaskRepo.get_series_for_user", lambda: TaskRepo.get_series_for_user(3, now, day_start, day_end)),
+        ("TaskRepo.get_task_by_id", lambda: TaskRepo.get_task_by_id(42)),
+        ("TaskRepo.iter_notification_candidates",
+         lambda: list(TaskRepo.iter_notification_candidates(now, now + timedelta(days=2)))),
+        ("FinanceRepo.find_bill_by_id", lambda: FinanceRepo.find_bill_by_id(42)),
+        ("FinanceRepo.find_payment_by_id", lambda: FinanceRepo.find_payment_by_id(42)),
+        ("FinanceRepo.iter_single_bills", lambda: list(FinanceRepo.iter_single_bills(7, now))),
+        ("FinanceRepo.get_single_bills_page", lambda: FinanceRepo.get_single_bills_page(7, now, 51)),
+        ("FinanceRepo.get_single_bills_page (cursor)",
+         lambda: FinanceRepo.get_single_bills_page(7, now, 51, (day_start, 42))),
+        ("FinanceRepo.get_series_bills_for_room",
+         lambda: FinanceRepo.get_series_bills_for_room(7, now, day_start, day_end)),
+        ("FinanceRepo.get_payments_page", lambda: FinanceRepo.get_payments_page(7, 51, (day_start, 42))),
+        ("FinanceRepo.get_all_bills_for_room", lambda: FinanceRepo.get_all_bills_for_room(7)),
+        ("FinanceRepo.get_all_payments_for_room", lambda: FinanceRepo.get_all_payments_for_room(7)),
+        ("FinanceRepo.get_bills_by_ids", lambda: FinanceRepo.get_bills_by_ids([1, 2, 3])),
+        ("FinanceRepo.get_payments_by_ids", lambda: FinanceRepo.get_payments_by_ids([1, 2, 3])),
+        ("FinanceRepo.get_bill_series_between",
+         lambda: FinanceRepo.get_bill_series_between(7, day_start, day_end + timedelta(days=59))),
+        ("FinanceRepo.get_cancelled_occurrences", lambda: FinanceRepo.get_cancelled_occurrences([1, 2, 3])),
+        ("FinanceRepo.get_latest_visible_bill_date", lambda: FinanceRepo.get_latest_visible_bill_date(7)),
+        ("FinanceRepo.iter_payments", lambda: list(FinanceRepo.iter_payments(7))),
+        ("FinanceRepo.get_bills_for_room_between",
+         lambda: FinanceRepo.get_bills_for_room_between(7, day_start, day_end)),
+        ("RoomRepo.get_room", lambda: RoomRepo.get_room(7)),
+        ("RoomRepo.list_rooms_for_user", lambda: RoomRepo.list_rooms_for_user(3)),
+        ("RoomRepo.list_invites_for_user", lambda: RoomRepo.list_invites_for_user(3)),
+        ("RoomRepo.list_members", lambda: RoomRepo.list_members(7)),
+        ("RoomRepo.list_invitations_for_room", lambda: RoomRepo.list_invitations_for_room(7)),
+        ("RoomRepo.get_invitations_by_ids", lambda: RoomRepo.get_invitations_by_ids([1, 2])),
+        ("RoomRepo.get_invitation", lambda: RoomRepo.get_invitation(1)),
+        ("RoomRepo.get_room_with_members", lambda: RoomRepo.get_room_with_members(7)),
+        ("RoomRepo.list_invitations_for_user_by_status",
+         lambda: RoomRepo.list_invitations_for_user_by_status(3, "waiting")),
+        ("RoomRepo.list_invitations_for_user_by_status (page)",
+         lambda: RoomRepo.list_invitations_for_user_by_status(3, "waiting", 51, (now, 42))),
+        ("RoomRepo.waiting_invitations_for_user_by_room", lambda: RoomRepo.waiting_invitations_for_user_by_room(3, 7)),
+        ("RoomRepo.list_room_ids_for_user", lambda: RoomRepo.list_room_ids_for_user(3)),
+        ("RoomRepo.get_alerts_and_owes_for_user", lambda: RoomRepo.get_alerts_and_owes_for_user(3)),
+        ("AlertRepo.count_open (touched tasks)", lambda: AlertRepo.count_open(now, task_ids=[41, 42])),
+        ("AlertRepo.count_open (window slide)", lambda: AlertRepo.count_open(now + timedelta(days=1), after=now)),
+        ("AlertRepo.get_counts_for_user", lambda: AlertRepo.get_counts_for_user(3)),
+        ("RoomRepo.find_non_members", lambda: RoomRepo.find_non_members([1, 2, 3], 7)),
+        ("RoomRepo.get_membership_version", lambda: RoomRepo.get_membership_version(3)),
+        ("RoomRepo.get_calendar_version", lambda: RoomRepo.get_calendar_version(7)),
+        ("RoomRepo.get_room_version", lambda: RoomRepo.get_room_version(7)),
+        ("RoomRepo.list_changes_since", lambda: RoomRepo.list_changes_since(7, 100)),
+        ("RoomRepo.get_latest_change_id", lambda: RoomRepo.get_latest_change_id(7, before=now)),
+        ("RoomRepo.get_compacted_through", lambda: RoomRepo.get_compacted_through(7)),
+        ("UserRepo.find_by_id", lambda: UserRepo.find_by_id(3)),
+        ("UserRepo.find_by_username", lambda: UserRepo.find_by_username("user3")),
+        ("UserRepo.get_users_by_ids", lambda: UserRepo.get_users_by_ids([1, 2, 3])),
+        ("UserRepo.get_device_token", lambda: UserRepo.get_device_token(3, None)),
+        ("NotificationRepo.lease", lambda: NotificationRepo.lease("plans", 100, now, timedelta(minutes=2))),
+        ("NotificationRepo.get_backlog", lambda: NotificationRepo.get_backlog(now)),
+    ]
+
+
+def capture_statements(fn):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        db.session.rollback()
+        db.session.expunge_all()
+    return statements
+
+
+def full_scans(statement, parameters, tables):
+    with db.engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    details = [row[-1] for row in plan]
+    scans = []
+    for detail in details:
+        match = SCAN.search(detail)
+        if match and match.group(1) in tables:
+            scans.append(detail)
+    return details, scans
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_bench_app(f"sqlite:///{os.path.join(tmp, 'plans.db')}")
+        with app.app_context():
+            seed(args.rooms)
+            tables = set(db.metadata.tables)
+            failures = []
+            for label, fn in repository_queries(datetime.utcnow()):
+                for statement, parameters in capture_statements(fn):
+                    details, scans = full_scans(statement, parameters, tables)
+                    if args.verbose:
+                        print(f"{label}\n    " + "\n    ".join(details))
+                    if scans and label not in KNOWN_SCANS:
+                        failures.append((label, scans))
+
+    for label, scans in failures:
+        print(f"FULL SCAN  {label}: {'; '.join(scans)}")
+    print(f"{len(failures)} queries regressed to a full table scan")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# flask_api/perf/recurring_tasks.py
+# Recurring task creation: one row per occurrence (one commit each) vs one series row.
+#   python -m perf.recurring_tasks --repeat 52 365 --assignees 5
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, func, select
+
+from perf import create_bench_app
+from entities import db
+from entities.user import User
+from entities.room import Room
+from entities.task import Task, TaskUser
+from repository.task_repo import TaskRepo
+from repository.room_repo import RoomRepo
+
+ROOM_ID = 1
+
+
+def legacy_create(occurrences, assignees):
+    """The original create_task_service loop: one commit per task and per assignee.
+
+    Only the first occurrence keeps the assignees' statuses; later ones were
+    written with a NULL status. The bulk INSERT ... RETURNING path that first
+    replaced this loop is gone; the series row (TaskRepo.create_task_series)
+    superseded it, and later occurrences without a row of their own read as
+    "todo".
+    """
+    for index, (scheduled_date, deadline) in enumerate(occurrences):
+        task = Task(room_id=ROOM_ID, title="chore", frequency="1w", repeat=len(occurrences) - 1,
+                    scheduled_date=scheduled_date, deadline=deadline)
+        db.session.add(task)
+        db.session.flush()
+        RoomRepo.record_change(ROOM_ID, "task", task.id)
+        RoomRepo.bump_calendar_version(ROOM_ID)
+        db.session.commit()
+        for user_id, status in assignees:
+            db.session.add(TaskUser(task_id=task.id, user_id=user_id, status=status if index == 0 else None))
+            RoomRepo.record_change(ROOM_ID, "task", task.id)
+            db.session.commit()
+
+
+def series_create(occurrences, assignees):
+    scheduled_date, deadline = occurrences[0]
+    TaskRepo.create_task_series(ROOM_ID, "chore", None, "1w", len(occurrences) - 1, scheduled_date, deadline,
+                                len(occurrences), assignees)
+
+
+def count_rows():
+    return sum(db.session.scalar(select(func.count()).select_from(model)) for model in (Task, TaskUser))
+
+
+def measure(fn, occurrences, assignees):
+    commits = []
+    listener = lambda session: commits.append(1)
+    event.listen(db.session, "after_commit", listener)
+    start = time.perf_counter()
+    try:
+        fn(occurrences, assignees)
+    finally:
+        elapsed = time.perf_counter() - start
+        event.remove(db.session, "after_commit", listener)
+    return len(commits), elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, nargs="+", default=[52, 365])
+    parser.add_argument("--assignees", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_bench_app(f"sqlite:///{os.path.join(tmp, 'tasks.db')}")
+        with app.app_context():
+            db.session.execute(insert(User), [
+                {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+                for i in range(1, args.assignees + 1)
+            ])
+            db.session.execute(insert(Room), [{"id": ROOM_ID, "name": "Flat", "address": "1 Main St"}])
+            db.session.commit()
+
+            assignees = [(user_id, "todo") for user_id in range(1, args.assignees + 1)]
+            now = datetime.utcnow()
+            for repeat in args.repeat:
+                occurrences = [(now + timedelta(weeks=i), now + timedelta(weeks=i, days=1)) for i in range(repeat + 1)]
+                results = {}
+                for name, fn in (("per-row", legacy_create), ("series", series_create)):
+                    before = count_rows()
+                    results[name] = measure(fn, occurrences, assignees) + (count_rows() - before,)
+                (old_commits, old_time, old_rows), (new_commits, new_time, new_rows) = (
+                    results["per-row"], results["series"])
+                assert new_rows == 1 + len(assignees), f"series: wrote {new_rows} rows"
+                print(f"repeat={repeat:<4} assignees={args.assignees}   per-row {old_rows:5d} rows "
+                      f"{old_commits:5d} commits {old_time * 1000:9.1f} ms   series {new_rows} rows "
+                      f"{new_commits} commit {new_time * 1000:6.1f} ms   x{old_time / new_time:.0f}")
@@ -0,0 +1,111 @@
+# flask_api/perf/scheduler_leader.py
+# Scheduler leases across processes: several processes tick the same job against one SQLite file; each tick must run
+# exactly once, the leader keeps it, a crashed leader is replaced after its lease expires, a released one at once.
+#   python -m perf.scheduler_leader --processes 4 --ticks 20
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+from perf import create_bench_app
+from entities import db
+from jobs import scheduled_tasks
+from jobs.scheduled_tasks import run_as_leader, release_scheduler_leases
+
+INTERVAL = timedelta(seconds=1)
+
+tick = None
+
+
+def record_run(app):
+    with app.app_context():
+        db.session.execute(db.text("INSERT INTO job_runs (tick, pid) VALUES (:tick, :pid)"),
+                           {"tick": tick, "pid": os.getpid()})
+        db.session.commit()
+
+
+def worker(database_uri, ticks, everyone, survivors):
+    global tick
+    # No margin, so a dead leader's lease expires one interval after its last tick
+    scheduled_tasks.LEASE_MARGIN = timedelta(0)
+    app = create_bench_app(database_uri)
+
+    # All processes alive
+    leader = False
+    for tick in range(ticks):
+        everyone.wait()
+        leader = run_as_leader(app, record_run, INTERVAL) or leader
+    everyone.wait()
+    if leader:
+        os._exit(0)  # crash: the lease is not released
+
+    # The leader is gone; wait out its lease
+    survivors.wait()
+    time.sleep(INTERVAL.total_seconds())
+    leader = False
+    for tick in range(ticks, 2 * ticks):
+        survivors.wait()
+        leader = run_as_leader(app, record_run, INTERVAL) or leader
+    survivors.wait()
+
+    # The new leader releases; another takes over at the next tick
+    if leader:
+        release_scheduler_leases(app)
+    survivors.wait()
+    tick = 2 * ticks
+    if not leader:
+        run_as_leader(app, record_run, INTERVAL)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f"sqlite:///{os.path.join(tmp, 'scheduler.db')}"
+        app = create_bench_app(database_uri)
+        with app.app_context():
+            db.session.execute(db.text("CREATE TABLE job_runs (tick INTEGER, pid INTEGER)"))
+            db.session.commit()
+
+        context = multiprocessing.get_context("spawn")
+        everyone = context.Barrier(args.processes)
+        survivors = context.Barrier(args.processes - 1)
+        processes = [
+            context.Process(target=worker, args=(database_uri, args.ticks, everyone, survivors))
+            for _ in range(args.processes)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=120)
+        assert all(process.exitcode == 0 for process in processes), [process.exitcode for process in processes]
+
+        with app.app_context():
+            runs = db.session.execute(db.text("SELECT tick, pid FROM job_runs ORDER BY tick")).all()
+            db.engine.dispose()
+
+    by_tick = {}
+    for run_tick, pid in runs:
+        by_tick.setdefault(run_tick, []).append(pid)
+    failures = [(t, by_tick.get(t, [])) for t in range(2 * args.ticks + 1) if len(by_tick.get(t, [])) != 1]
+    first = {pids[0] for t, pids in by_tick.items() if t < args.ticks}
+    second = {pids[0] for t, pids in by_tick.items() if args.ticks <= t < 2 * args.ticks}
+    handover = by_tick.get(2 * args.ticks, [None])[0]
+    print(f"{args.processes} processes, {2 * args.ticks + 1} ticks in {time.perf_counter() - start:.1f} s: "
+          f"{len(runs)} runs; leaders {sorted(first)} -> {sorted(second)} -> {handover}")
+    for t, pids in failures:
+        print(f"tick {t} ran {len(pids)} times: {pids}")
+    ok = not failures and len(first) == 1 and len(second) == 1 and first != second and handover not in second
+    print("single execution per tick" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
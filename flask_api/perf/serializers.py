@@ -0,0 +1,71 @@
+# flask_api/perf/serializers.py
+# Marshmallow vs fast dict builders for room lists with nested members.
+#   python -m perf.serializers --rooms 1000 --members 10
+import argparse
+import time
+from datetime import datetime
+
+from perf import create_bench_app
+from entities.room import Room, RoomMember, RoomInvitation
+from entities.user import User
+from schemas.room_schemas import RoomSchema, RoomInvitationSchema
+from schemas.user_schemas import UserSchema, UserPublicSchema
+from schemas.fast_serializers import (
+    FastRoomSchema,
+    FastRoomInvitationSchema,
+    FastUserSchema,
+    FastUserPublicSchema,
+)
+
+
+def build_fixtures(room_count: int, member_count: int):
+    now = datetime.utcnow()
+    users = [
+        User(id=i, username=f"user{i}", email=f"user{i}@example.com", name=f"User {i}",
+             password_hash="x", created_at=now, updated_at=now)
+        for i in range(member_count * 10)
+    ]
+    rooms = []
+    for r in range(room_count):
+        room = Room(id=r, name=f"Room {r}", address=f"{r} Main St", description="", picture_url=None)
+        room.members = [RoomMember(room_id=r, user_id=(r + m) % len(users)) for m in range(member_count)]
+        rooms.append(room)
+    invitations = [
+        RoomInvitation(room_id=r, inviter_user_id=0, invitee_user_id=1, status="waiting")
+        for r in range(room_count)
+    ]
+    return rooms, users, invitations
+
+
+def timed(label: str, schema, fast_schema, objects, rounds: int):
+    expected = schema.dump(objects)
+    assert fast_schema.dump(objects) == expected, f"{label}: fast output differs from marshmallow"
+
+    results = {}
+    for name, impl in (("marshmallow", schema), ("fast", fast_schema)):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            impl.dump(objects)
+        results[name] = (time.perf_counter() - start) / rounds
+    speedup = results["marshmallow"] / results["fast"]
+    print(f"{label:<28} marshmallow {results['marshmallow'] * 1000:8.2f} ms   "
+          f"fast {results['fast'] * 1000:7.2f} ms   x{speedup:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--members", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        rooms, users, invitations = build_fixtures(args.rooms, args.members)
+        timed(f"rooms x{args.rooms} ({args.members} members)", RoomSchema(many=True), FastRoomSchema(many=True),
+              rooms, args.rounds)
+        timed(f"invitations x{args.rooms}", RoomInvitationSchema(many=True), FastRoomInvitationSchema(many=True),
+              invitations, args.rounds)
+        timed(f"users x{len(users)}", UserSchema(many=True), FastUserSchema(many=True), users, args.rounds)
+        timed(f"public users x{len(users)}", UserPublicSchema(many=True), FastUserPublicSchema(many=True),
+              users, args.rounds)
@@ -0,0 +1,138 @@
+# flask_api/perf/task_batch_update.py
+# "Mark all my chores complete": per-assignee SELECT + commit vs one batched unit of work.
+#   python -m perf.task_batch_update --tasks 10 100 500
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, delete, select
+from werkzeug.exceptions import BadRequest
+
+from perf import create_bench_app
+from entities import db
+from entities.user import User
+from entities.room import Room
+from entities.task import Task, TaskUser, TaskUserOccurrence
+from repository.room_repo import RoomRepo
+from services.task_service import TaskService
+
+ROOM_ID = 1
+ASSIGNEES = (1, 2, 3)
+
+
+def seed(task_count: int) -> None:
+    db.session.execute(delete(TaskUser))
+    db.session.execute(delete(Task))
+    now = datetime.utcnow()
+    db.session.execute(insert(Task), [
+        {"id": i, "room_id": ROOM_ID, "title": "chore", "scheduled_date": now, "deadline": now + timedelta(hours=i)}
+        for i in range(1, task_count + 1)
+    ])
+    db.session.execute(insert(TaskUser), [
+        {"task_id": t, "user_id": u, "status": "todo"} for t in range(1, task_count + 1) for u in ASSIGNEES
+    ])
+    db.session.commit()
+
+
+def legacy_update(task_ids, status):
+    """The previous write path, once per task: a SELECT and commit per assignee, then the task."""
+    for task_id in task_ids:
+        for user_id in ASSIGNEES:
+            task_user = TaskUser.query.filter_by(user_id=user_id, task_id=task_id).first()
+            task_user.status = status
+            RoomRepo.record_change(task_user.task.room_id, "task", task_id)
+            db.session.commit()
+        task = db.session.get(Task, task_id)
+        task.title = "chore"
+        RoomRepo.record_change(task.room_id, "task", task.id)
+        db.session.commit()
+
+
+def batch_update(task_ids, status):
+    TaskService.update_tasks(ROOM_ID, [
+        {"task_id": task_id, "title": "chore", "assignees": [{"user_id": u, "status": status} for u in ASSIGNEES]}
+        for task_id in task_ids
+    ])
+
+
+def check_occurrence_edits() -> None:
+    """Edits of occurrence k >= 1 carry that occurrence's date; echoing it back must not move the series."""
+    anchor = datetime(2020, 1, 6, 9)
+    db.session.execute(delete(TaskUserOccurrence))
+    db.session.execute(delete(TaskUser))
+    db.session.execute(delete(Task))
+    db.session.execute(insert(Task), [{
+        "id": 1, "room_id": ROOM_ID, "title": "bins", "scheduled_date": anchor, "deadline": anchor,
+        "frequency": "1w", "repeat": 4, "occurrences": 5, "series_end": anchor + timedelta(weeks=4),
+    }])
+    db.session.execute(insert(TaskUser), [{"task_id": 1, "user_id": u, "status": "todo"} for u in ASSIGNEES])
+    db.session.commit()
+
+    def series():
+        db.session.expire_all()
+        task = db.session.get(Task, 1)
+        return task.deadline, task.series_end
+
+    # Title change and "mark complete" on occurrence 2, echoing its date; user ids as the list response keys them
+    TaskService.update_tasks(ROOM_ID, [{
+        "task_id": 1, "occurrence": 2, "deadline": anchor + timedelta(weeks=2), "title": "recycling",
+        "assignees": [{"user_id": "1", "status": "complete"}],
+    }])
+    assert series() == (anchor, anchor + timedelta(weeks=4)), series()
+    assert db.session.scalar(select(TaskUserOccurrence.status).where(TaskUserOccurrence.occurrence == 2)) == "complete"
+
+    # Moving occurrence 2 a day later moves the whole series a day
+    TaskService.update_tasks(ROOM_ID, [{"task_id": 1, "occurrence": 2, "deadline": anchor + timedelta(weeks=2, days=1)}])
+    assert series() == (anchor + timedelta(days=1), anchor + timedelta(weeks=4, days=1)), series()
+
+    for assignee in ({"user_id": "one", "status": "todo"}, {"user_id": 99, "status": "todo"}):
+        try:
+            TaskService.update_tasks(ROOM_ID, [{"task_id": 1, "assignees": [assignee]}])
+        except BadRequest:
+            continue
+        raise AssertionError(f"accepted assignee {assignee}")
+    print("occurrence edits OK")
+
+
+def count_statements(fn, *args):
+    statements = []
+    listener = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    db.session.expunge_all()
+    start = time.perf_counter()
+    try:
+        fn(*args)
+    finally:
+        elapsed = time.perf_counter() - start
+        event.remove(db.engine, "before_cursor_execute", listener)
+    return len(statements), elapsed
+
+
+def statuses():
+    return db.session.execute(select(TaskUser.task_id, TaskUser.user_id, TaskUser.status).order_by(TaskUser.id)).all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"} for i in ASSIGNEES
+        ])
+        db.session.execute(insert(Room), [{"id": ROOM_ID, "name": "Flat", "address": "1 Main St"}])
+        db.session.commit()
+
+        check_occurrence_edits()
+        for task_count in args.tasks:
+            task_ids = list(range(1, task_count + 1))
+            seed(task_count)
+            old_queries, old_time = count_statements(legacy_update, task_ids, "complete")
+            expected = statuses()
+            seed(task_count)
+            new_queries, new_time = count_statements(batch_update, task_ids, "complete")
+            assert statuses() == expected, "batched update wrote different statuses"
+            print(f"tasks={task_count:<5} per-assignee {old_queries:5d} statements {old_time * 1000:8.1f} ms   "
+                  f"batched {new_queries:3d} statements {new_time * 1000:7.1f} ms")
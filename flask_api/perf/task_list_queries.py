@@ -0,0 +1,95 @@
+# flask_api/perf/task_list_queries.py
+# SQL statements and time for /tasks/list/<room_id> as the room grows; fails if the count grows with it.
+#   python -m perf.task_list_queries --tasks 10 100 1000 5000
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, select, delete
+
+from perf import create_bench_app
+from entities import db
+from entities.user import User
+from entities.room import Room
+from entities.task import Task, TaskUser
+from services.task_service import TaskService
+
+ROOM_ID = 1
+ASSIGNEES = (1, 2, 3)
+
+
+def seed(task_count: int) -> None:
+    """``task_count`` visible tasks, every tenth a weekly series, each with three assignees."""
+    db.session.execute(delete(TaskUser))
+    db.session.execute(delete(Task))
+    now = datetime.utcnow()
+    tasks = []
+    for i in range(1, task_count + 1):
+        deadline = now + timedelta(minutes=i)
+        series = i % 10 == 0
+        tasks.append({
+            "id": i, "room_id": ROOM_ID, "title": "chore", "scheduled_date": now - timedelta(days=30),
+            "deadline": deadline, "frequency": "1w" if series else "", "repeat": 7 if series else 0,
+            "occurrences": 8 if series else None, "series_end": deadline + timedelta(weeks=7) if series else None,
+        })
+    db.session.execute(insert(Task), tasks)
+    db.session.execute(insert(TaskUser), [
+        {"task_id": t, "user_id": u, "status": "todo"} for t in range(1, task_count + 1) for u in ASSIGNEES
+    ])
+    db.session.commit()
+
+
+def legacy_list():
+    """The previous read path: tracked Task instances, assignees lazy-loaded per task."""
+    tasks = db.session.scalars(
+        select(Task).where(Task.room_id == ROOM_ID, Task.scheduled_date <= datetime.utcnow()).order_by(Task.deadline)
+    ).all()
+    return TaskService.expand_occurrences(zip(tasks, TaskService.prepare_tasks(tasks)), visible_at=datetime.utcnow())
+
+
+def count_statements(fn):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    db.session.expunge_all()
+    start = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        elapsed = time.perf_counter() - start
+        event.remove(db.engine, "before_cursor_execute", listener)
+    return len(statements), elapsed, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    client = app.test_client()
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"} for i in ASSIGNEES
+        ])
+        db.session.execute(insert(Room), [{"id": ROOM_ID, "name": "Flat", "address": "1 Main St"}])
+        db.session.commit()
+
+        counts = set()
+        for task_count in args.tasks:
+            seed(task_count)
+            old_queries, old_time, expected = count_statements(legacy_list)
+
+            def request():
+                response = client.get(f"/tasks/list/{ROOM_ID}")
+                assert response.status_code == 200, response.data
+                return response.get_json()
+
+            new_queries, new_time, actual = count_statements(request)
+            assert actual == expected, "projection output differs from the ORM path"
+            counts.add(new_queries)
+            print(f"tasks={task_count:<6} lazy loads {old_queries:5d} queries {old_time * 1000:8.1f} ms   "
+                  f"projection {new_queries:2d} queries {new_time * 1000:8.1f} ms")
+
+        assert len(counts) == 1, f"query count grows with the task count: {sorted(counts)}"
+        print(f"OK: {counts.pop()} queries per request regardless of room size")
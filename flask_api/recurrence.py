@@ -0,0 +1,83 @@
+# flask_api/recurrence.py
+"""Recurrence rules for tasks and bills.
+
+A recurring task or bill is stored as one series row. ``frequency`` ("3d",
+"2w", "1m") is the step and ``occurrences`` the number of occurrences, and
+occurrence ``k`` is the stored row with its dates shifted by ``k`` steps.
+Rows without ``occurrences`` (single tasks/bills and rows written before
+series existed) are one occurrence. Helpers here work on index ranges so a
+window over a long series costs O(occurrences in the window).
+"""
+from calendar import monthrange
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+UNITS = {"d": "days", "w": "weeks", "m": "months"}
+
+Step = Tuple[int, str]
+
+
+def parse_frequency(frequency: Optional[str]) -> Optional[Step]:
+    """``"2w"`` -> ``(2, "weeks")``; None for an empty or malformed frequency."""
+    if not frequency:
+        return None
+    unit = UNITS.get(frequency[-1])
+    try:
+        amount = int(frequency[:-1])
+    except ValueError:
+        return None
+    if unit is None or amount <= 0:
+        return None
+    return amount, unit
+
+
+def shift(value: Optional[datetime], step: Optional[Step], index: int) -> Optional[datetime]:
+    """``value`` moved ``index`` steps forward; months keep the day, clamped to the month's end."""
+    if value is None or not index:
+        return value
+    amount, unit = step
+    if unit == "months":
+        months = value.month - 1 + amount * index
+        year, month = value.year + months // 12, months % 12 + 1
+        return value.replace(year=year, month=month, day=min(value.day, monthrange(year, month)[1]))
+    return value + timedelta(**{unit: amount * index})
+
+
+def series(row) -> Tuple[Optional[Step], int]:
+    """(step, occurrence count) of a task/bill row."""
+    step = parse_frequency(row.frequency) if row.occurrences else None
+    return step, (row.occurrences if step else 1)
+
+
+def first_index_at_or_after(anchor: datetime, step: Optional[Step], moment: datetime) -> int:
+    """Smallest ``k`` with ``shift(anchor, step, k) >= moment``."""
+    if moment <= anchor:
+        return 0
+    if step is None:
+        return 1
+    amount, unit = step
+    if unit == "months":
+        index = ((moment.year - anchor.year) * 12 + moment.month - anchor.month) // amount - 1
+    else:
+        index = (moment - anchor) // timedelta(**{unit: amount})
+    index = max(index, 0)
+    while shift(anchor, step, index) < moment:
+        index += 1
+    return index
+
+
+def occurrence_indexes(anchor: Optional[datetime], step: Optional[Step], count: int,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None) -> range:
+    """Indexes ``k < count`` whose shifted ``anchor`` lies in ``[start, end)``."""
+    if anchor is None:
+        return range(count if start is None and end is None else 0)
+    first = first_index_at_or_after(anchor, step, start) if start is not None else 0
+    stop = min(first_index_at_or_after(anchor, step, end), count) if end is not None else count
+    return range(first, max(first, stop))
+
+
+def visible_count(scheduled_date: Optional[datetime], step: Optional[Step], count: int, now: datetime) -> int:
+    """How many leading occurrences have a ``scheduled_date`` at or before ``now``."""
+    if scheduled_date is None:
+        return count
+    return min(count, first_index_at_or_after(scheduled_date, step, now + timedelta(microseconds=1)))
@@ -0,0 +1,236 @@
+# flask_api/repository/alert_repo.py
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select, update, delete, insert, func, or_
+
+from entities import db
+from entities.task import (
+    Task, TaskUser, TaskOccurrence, TaskUserOccurrence, TaskAlertCount, AlertHorizon,
+)
+from repository.upsert import upsert
+import recurrence
+
+# A task counts towards a user's alerts once its deadline is at most this far away
+ALERT_WINDOW = timedelta(days=1)
+
+HORIZON_ID = 1
+
+# Where the horizon starts: no deadline is this early, so empty counters are exact there
+EMPTY_HORIZON = datetime.min
+
+# What snapshot hands to record: the horizon and the touched tasks' counts before the write
+Snapshot = Tuple[datetime, Counter]
+
+
+class AlertRepo:
+    """Per-(user, room) counters behind the home screen's "alerts" badge.
+
+    A counter holds the user's open (not complete, not cancelled) task
+    occurrences in the room with a deadline at or before the horizon. Task
+    writes keep it exact by recounting the tasks they touch before and after
+    the write, in the same transaction (snapshot/record), while holding a
+    share lock on the horizon row. ``slide`` moves the horizon forward and
+    adds what entered the window; ``reconcile`` compares every counter with
+    a full recount.
+
+    The horizon row is created at EMPTY_HORIZON by whichever comes first,
+    a task write or the scheduler's first slide, and the counters are only
+    ever counted under its lock, so no write falls between a count and
+    the counters it is added to.
+    """
+
+    @staticmethod
+    def get_horizon(lock: bool = False, read: bool = True) -> Optional[datetime]:
+        stmt = select(AlertHorizon.counted_through).where(AlertHorizon.id == HORIZON_ID)
+        if lock:
+            stmt = stmt.with_for_update(read=read)
+        return db.session.scalar(stmt)
+
+    @staticmethod
+    def lock_horizon(read: bool = True) -> datetime:
+        """Lock the horizon row, creating it at EMPTY_HORIZON if it does not exist yet; caller commits."""
+        horizon = AlertRepo.get_horizon(lock=True, read=read)
+        if horizon is None:
+            upsert(AlertHorizon, [{"id": HORIZON_ID, "counted_through": EMPTY_HORIZON}], ("id",))
+            horizon = AlertRepo.get_horizon(lock=True, read=read)
+        return horizon
+
+    @staticmethod
+    def get_counts_for_user(user_id: int) -> Dict[int, int]:
+        stmt = select(TaskAlertCount.room_id, TaskAlertCount.alerts).where(TaskAlertCount.user_id == user_id)
+        return dict(db.session.execute(stmt).all())
+
+    @staticmethod
+    def count_open(through: datetime, after: Optional[datetime] = None,
+                   task_ids: Optional[Iterable[int]] = None) -> Counter:
+        """Open occurrences per (user_id, room_id) with a deadline in ``(after, through]``.
+
+        Limited to ``task_ids`` when given; otherwise every task is recounted.
+        """
+        counts = Counter()
+        if task_ids is not None:
+            task_ids = list(task_ids)
+            if not task_ids:
+                return counts
+
+        open_status = or_(TaskUser.status.is_(None), TaskUser.status != "complete")
+        singles = (
+            select(TaskUser.user_id, Task.room_id, func.count())
+                .join(Task, Task.id == TaskUser.task_id)
+                .where(open_status, Task.occurrences.is_(None),
+                       Task.deadline.is_not(None), Task.deadline <= through)
+                .group_by(TaskUser.user_id, Task.room_id)
+        )
+        series = (
+            select(Task.id, Task.room_id, Task.deadline, Task.frequency, Task.occurrences,
+                   TaskUser.user_id, TaskUser.status)
+                .join(TaskUser, TaskUser.task_id == Task.id)
+                .where(Task.occurrences.is_not(None), Task.deadline <= through)
+        )
+        if after is not None:
+            singles = singles.where(Task.deadline > after)
+            series = series.where(Task.series_end > after)
+        if task_ids is not None:
+            singles = singles.where(Task.id.in_(task_ids))
+            series = series.where(Task.id.in_(task_ids))
+
+        for user_id, room_id, count in db.session.execute(singles):
+            counts[(user_id, room_id)] += count
+
+        start = after + timedelta(microseconds=1) if after is not None else None
+        end = through + timedelta(microseconds=1)
+        due = []
+        for row in db.session.execute(series):
+            step, count = recurrence.series(row)
+            due.extend((row, k) for k in recurrence.occurrence_indexes(row.deadline, step, count, start, end))
+        cancelled, statuses = AlertRepo._occurrence_state({row.id for row, _ in due})
+        for row, k in due:
+            status = row.status if k == 0 else statuses.get((row.id, k, row.user_id), "todo")
+            if status != "complete" and (row.id, k) not in cancelled:
+                counts[(row.user_id, row.room_id)] += 1
+        return counts
+
+    @staticmethod
+    def snapshot(task_ids: Iterable[int] = ()) -> Snapshot:
+        """Before a task write: share-lock the horizon and count the tasks as they are; caller passes the result to record."""
+        horizon = AlertRepo.lock_horizon()
+        return horizon, AlertRepo.count_open(horizon, task_ids=task_ids)
+
+    @staticmethod
+    def record(snapshot: Snapshot, task_ids: Iterable[int]) -> None:
+        """After the write, same transaction: add the change in the tasks' counts to the counters; caller commits."""
+        horizon, before = snapshot
+        db.session.flush()
+        after = AlertRepo.count_open(horizon, task_ids=task_ids)
+        after.subtract(before)
+        AlertRepo._add(after)
+
+    @staticmethod
+    def slide(through: datetime) -> int:
+        """Move the horizon forward to ``through``, adding what entered the window to the counters.
+
+        The first slide moves it from EMPTY_HORIZON and so builds the
+        counters. Returns how many occurrences entered the window.
+        """
+        try:
+            horizon = AlertRepo.lock_horizon(read=False)
+            if through <= horizon:
+                db.session.rollback()
+                return 0
+            entered = AlertRepo.count_open(through, after=horizon)
+            AlertRepo._add(entered)
+            db.session.execute(
+                update(AlertHorizon).where(AlertHorizon.id == HORIZON_ID).values(counted_through=through)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return sum(entered.values())
+
+    @staticmethod
+    def rebuild(through: datetime) -> int:
+        """Recount every counter through ``through`` from scratch under the horizon lock; returns the total."""
+        try:
+            AlertRepo.lock_horizon(read=False)
+            counts = AlertRepo.count_open(through)
+            db.session.execute(delete(TaskAlertCount))
+            db.session.execute(
+                update(AlertHorizon).where(AlertHorizon.id == HORIZON_ID).values(counted_through=through)
+            )
+            AlertRepo._insert(counts)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return sum(counts.values())
+
+    @staticmethod
+    def reconcile() -> Dict[Tuple[int, int], Tuple[int, int]]:
+        """Compare every counter with a full recount and repair the ones that drifted.
+
+        Returns ``{(user_id, room_id): (stored, recounted)}`` for each repair.
+        """
+        horizon = AlertRepo.get_horizon(lock=True, read=False)
+        if horizon is None:
+            db.session.rollback()
+            return {}
+        try:
+            expected = AlertRepo.count_open(horizon)
+            stored = {
+                (user_id, room_id): alerts
+                for user_id, room_id, alerts in db.session.execute(
+                    select(TaskAlertCount.user_id, TaskAlertCount.room_id, TaskAlertCount.alerts)
+                )
+            }
+            drift = {
+                key: (stored.get(key, 0), expected.get(key, 0))
+                for key in set(stored) | set(expected)
+                if stored.get(key, 0) != expected.get(key, 0)
+            }
+            AlertRepo._add(Counter({key: new - old for key, (old, new) in drift.items()}))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return drift
+
+    @staticmethod
+    def _occurrence_state(series_ids):
+        """(cancelled {(task_id, k)}, statuses {(task_id, k, user_id): status}) of later occurrences."""
+        if not series_ids:
+            return set(), {}
+        cancelled = set(db.session.execute(
+            select(TaskOccurrence.task_id, TaskOccurrence.occurrence)
+                .where(TaskOccurrence.task_id.in_(series_ids), TaskOccurrence.cancelled.is_(True))
+        ).all())
+        statuses = {
+            (task_id, k, user_id): status
+            for task_id, k, user_id, status in db.session.execute(
+                select(TaskUserOccurrence.task_id, TaskUserOccurrence.occurrence,
+                       TaskUserOccurrence.user_id, TaskUserOccurrence.status)
+                    .where(TaskUserOccurrence.task_id.in_(series_ids))
+            )
+        }
+        return cancelled, statuses
+
+    @staticmethod
+    def _add(deltas: Counter) -> None:
+        """counter += delta for each key, creating missing counters; caller commits."""
+        rows = [
+            {"user_id": user_id, "room_id": room_id, "alerts": delta}
+            for (user_id, room_id), delta in deltas.items() if delta
+        ]
+        upsert(TaskAlertCount, rows, ("user_id", "room_id"),
+               lambda excluded: {"alerts": TaskAlertCount.alerts + excluded.alerts})
+
+    @staticmethod
+    def _insert(counts: Counter) -> None:
+        rows = [
+            {"user_id": user_id, "room_id": room_id, "alerts": alerts}
+            for (user_id, room_id), alerts in counts.items() if alerts
+        ]
+        if rows:
+            db.session.execute(insert(TaskAlertCount), rows)
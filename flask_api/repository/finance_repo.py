@@ -1,11 +1,46 @@
 # pylint: disable=all
-from sqlalchemy import select, func
-from sqlalchemy.orm import joinedload
-from entities.finance import Bill, Payment
+from sqlalchemy import select, update, delete, func, or_
+from entities.finance import Bill, BillOccurrence, Payment
 from entities import db
-from typing import List, Optional
+from repository.room_repo import RoomRepo
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
 from datetime import datetime
+import recurrence
 
+# Rows fetched per round trip when a list is streamed instead of loaded
+STREAM_BATCH_SIZE = 500
+
+
+def _single_bills_before(room_id: int, now: datetime, before: Optional[Tuple[datetime, int]]):
+    """Visible single bills before the ``(scheduled_date, id)`` key, newest first."""
+    stmt = (
+        select(Bill)
+        .where(Bill.room_id == room_id, Bill.occurrences.is_(None), Bill.scheduled_date <= now)
+        .order_by(Bill.scheduled_date.desc(), Bill.id.desc())
+    )
+    if before is not None:
+        scheduled_date, bill_id = before
+        stmt = stmt.where(
+            Bill.scheduled_date <= scheduled_date,
+            or_(Bill.scheduled_date < scheduled_date, Bill.id < bill_id),
+        )
+    return stmt
+
+
+def _payments_before(room_id: int, before: Optional[Tuple[datetime, int]]):
+    """Payments before the ``(created_at, id)`` key, newest first."""
+    stmt = (
+        select(Payment)
+        .where(Payment.room_id == room_id)
+        .order_by(Payment.created_at.desc(), Payment.id.desc())
+    )
+    if before is not None:
+        created_at, payment_id = before
+        stmt = stmt.where(
+            Payment.created_at <= created_at,
+            or_(Payment.created_at < created_at, Payment.id < payment_id),
+        )
+    return stmt
 
 
 class FinanceRepo:
@@ -19,35 +54,123 @@ class FinanceRepo:
         return db.session.get(Payment, payment_id)
 
     @staticmethod
-    def get_bills_for_room(room_id: int) -> List[Bill]:
-        stmt = (
-            select(Bill)
-            .where(Bill.room_id == room_id, Bill.scheduled_date <= db.func.now())
-            .order_by(Bill.scheduled_date.desc())
-            .options(joinedload(Bill.payer))
+    def get_single_bills_page(room_id: int, now: datetime, limit: int,
+                              before: Optional[Tuple[datetime, int]] = None) -> List[Bill]:
+        """Up to ``limit`` visible single bills before the ``(scheduled_date, id)`` key, newest first."""
+        return db.session.scalars(_single_bills_before(room_id, now, before).limit(limit)).all()
+
+    @staticmethod
+    def iter_single_bills(room_id: int, now: datetime, before: Optional[Tuple[datetime, int]] = None) -> Iterator[Bill]:
+        """Same rows as get_single_bills_page without a limit, fetched in batches as they are consumed."""
+        stmt = _single_bills_before(room_id, now, before).execution_options(yield_per=STREAM_BATCH_SIZE)
+        return iter(db.session.scalars(stmt))
+
+    @staticmethod
+    def get_series_bills_for_room(room_id: int, now: datetime, ends_at_or_after: Optional[datetime] = None,
+                                  starts_at_or_before: Optional[datetime] = None) -> List[Bill]:
+        """Visible bill series of the room, optionally only those with occurrences in the given bounds."""
+        stmt = select(Bill).where(
+            Bill.room_id == room_id,
+            Bill.occurrences.is_not(None),
+            Bill.scheduled_date <= min(now, starts_at_or_before or now),
         )
+        if ends_at_or_after is not None:
+            stmt = stmt.where(Bill.series_end >= ends_at_or_after)
+        return db.session.scalars(stmt).all()
+
+    @staticmethod
+    def get_payments_page(room_id: int, limit: int, before: Optional[Tuple[datetime, int]] = None) -> List[Payment]:
+        """Up to ``limit`` payments before the ``(created_at, id)`` key, newest first."""
+        return db.session.scalars(_payments_before(room_id, before).limit(limit)).all()
+
+    @staticmethod
+    def iter_payments(room_id: int, before: Optional[Tuple[datetime, int]] = None) -> Iterator[Payment]:
+        """Same rows as get_payments_page without a limit, fetched in batches as they are consumed."""
+        stmt = _payments_before(room_id, before).execution_options(yield_per=STREAM_BATCH_SIZE)
+        return iter(db.session.scalars(stmt))
+
+    @staticmethod
+    def get_all_bills_for_room(room_id: int) -> List[Bill]:
+        stmt = select(Bill).where(Bill.room_id == room_id).order_by(Bill.scheduled_date.desc())
         return db.session.scalars(stmt).all()
 
     @staticmethod
-    def get_payments_for_room(room_id: int) -> List[Payment]:
+    def get_all_payments_for_room(room_id: int) -> List[Payment]:
+        stmt = select(Payment).where(Payment.room_id == room_id).order_by(Payment.created_at.desc())
+        return db.session.scalars(stmt).all()
+
+    @staticmethod
+    def get_bills_by_ids(bill_ids: List[int]) -> List[Bill]:
+        if not bill_ids:
+            return []
+        return db.session.scalars(select(Bill).where(Bill.id.in_(bill_ids))).all()
+
+    @staticmethod
+    def get_payments_by_ids(payment_ids: List[int]) -> List[Payment]:
+        if not payment_ids:
+            return []
+        return db.session.scalars(select(Payment).where(Payment.id.in_(payment_ids))).all()
+
+    @staticmethod
+    def get_bill_series_between(room_id: int, start: datetime, end: datetime):
+        """(id, scheduled_date, amount, frequency, occurrences) of bills with an occurrence in [start, end)."""
         stmt = (
-            select(Payment)
-            .where(Payment.room_id == room_id)
-            .order_by(Payment.created_at.desc())
-            .options(
-                joinedload(Payment.payer),
-                joinedload(Payment.payee)
+            select(Bill.id, Bill.scheduled_date, Bill.amount, Bill.frequency, Bill.occurrences)
+                .where(
+                Bill.room_id == room_id,
+                Bill.scheduled_date < end,
+                func.coalesce(Bill.series_end, Bill.scheduled_date) >= start,
             )
         )
-        return db.session.scalars(stmt).all()
+        return db.session.execute(stmt).all()
+
+    @staticmethod
+    def get_cancelled_occurrences(bill_ids: Iterable[int]) -> Set[Tuple[int, int]]:
+        bill_ids = list(bill_ids)
+        if not bill_ids:
+            return set()
+        stmt = (
+            select(BillOccurrence.bill_id, BillOccurrence.occurrence)
+                .where(BillOccurrence.bill_id.in_(bill_ids), BillOccurrence.cancelled == True)
+        )
+        return {(bill_id, occurrence) for bill_id, occurrence in db.session.execute(stmt)}
+
+    @staticmethod
+    def cancel_occurrence(bill_id: int, occurrence: int) -> Optional[Bill]:
+        bill = db.session.get(Bill, bill_id)
+        if bill:
+            db.session.merge(BillOccurrence(bill_id=bill_id, occurrence=occurrence, cancelled=True))
+            RoomRepo.record_change(bill.room_id, "bill", bill_id)
+            RoomRepo.bump_calendar_version(bill.room_id)
+            db.session.commit()
+        return bill
+
+    @staticmethod
+    def get_latest_visible_bill_date(room_id: int) -> Optional[datetime]:
+        now = datetime.utcnow()
+        latest = db.session.scalar(
+            select(func.max(Bill.scheduled_date))
+                .where(Bill.room_id == room_id, Bill.scheduled_date <= now, Bill.occurrences.is_(None))
+        )
+        series = db.session.execute(
+            select(Bill.scheduled_date, Bill.frequency, Bill.occurrences)
+                .where(Bill.room_id == room_id, Bill.scheduled_date <= now, Bill.occurrences.is_not(None))
+        ).all()
+        for row in series:
+            step, count = recurrence.series(row)
+            visible = recurrence.visible_count(row.scheduled_date, step, count, now)
+            scheduled = recurrence.shift(row.scheduled_date, step, visible - 1)
+            latest = scheduled if latest is None else max(latest, scheduled)
+        return latest
 
     @staticmethod
-    def get_bills_for_room_by_date(room_id: int, target_date: datetime) -> List[Bill]:
+    def get_bills_for_room_between(room_id: int, start: datetime, end: datetime) -> List[Bill]:
         stmt = (
             select(Bill)
                 .where(
                 Bill.room_id == room_id,
-                func.date(Bill.scheduled_date) == target_date,
+                Bill.scheduled_date < end,
+                func.coalesce(Bill.series_end, Bill.scheduled_date) >= start,
                 Bill.scheduled_date <= datetime.utcnow()
             )
             .order_by(Bill.scheduled_date.desc())
@@ -57,7 +180,8 @@ class FinanceRepo:
 
 
     @staticmethod
-    def create_bill(title: str, category: str, amount: float, payer_user_id: int, frequency: Optional[str], repeat: int, room_id: int, scheduled_date: datetime, meta_data=None) -> Bill:
+    def create_bill(title: str, category: str, amount: float, payer_user_id: int, frequency: Optional[str], repeat: int, room_id: int, scheduled_date: datetime, meta_data=None, occurrences: int = 1) -> Bill:
+        step = recurrence.parse_frequency(frequency) if occurrences > 1 else None
         bill = Bill(
             title=title,
             category=category,
@@ -68,9 +192,14 @@ class FinanceRepo:
             repeat=repeat,
             scheduled_date=scheduled_date,
             meta_data=meta_data,
-            status="waiting"
+            status="waiting",
+            occurrences=occurrences if step else None,
+            series_end=recurrence.shift(scheduled_date, step, occurrences - 1) if step else None,
         )
         db.session.add(bill)
+        db.session.flush()
+        RoomRepo.record_change(room_id, "bill", bill.id)
+        RoomRepo.bump_calendar_version(room_id)
         db.session.commit()
         return bill
 
@@ -85,6 +214,8 @@ class FinanceRepo:
             payee_user_id=payee_user_id
         )
         db.session.add(payment)
+        db.session.flush()
+        RoomRepo.record_change(room_id, "payment", payment.id)
         db.session.commit()
         return payment
 
@@ -93,7 +224,10 @@ class FinanceRepo:
         bill = db.session.get(Bill, bill_id)
         if not bill:
             return False
+        db.session.execute(delete(BillOccurrence).where(BillOccurrence.bill_id == bill_id))
         db.session.delete(bill)
+        RoomRepo.record_change(bill.room_id, "bill", bill_id, "delete")
+        RoomRepo.bump_calendar_version(bill.room_id)
         db.session.commit()
 
     @staticmethod
@@ -102,4 +236,5 @@ class FinanceRepo:
         if not payment:
             return False
         db.session.delete(payment)
+        RoomRepo.record_change(payment.room_id, "payment", payment_id, "delete")
         db.session.commit()
\ No newline at end of file
@@ -0,0 +1,143 @@
+# flask_api/repository/notification_repo.py
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import select, update, delete, insert, func, and_, or_, case, bindparam
+
+from entities import db
+from entities.notification import NotificationOutbox
+
+# Columns a dispatcher needs from a leased row
+LEASED_COLUMNS = (
+    NotificationOutbox.id, NotificationOutbox.token, NotificationOutbox.title, NotificationOutbox.body,
+    NotificationOutbox.attempts, NotificationOutbox.created_at,
+)
+
+
+class NotificationRepo:
+
+    @staticmethod
+    def enqueue(messages: Iterable[dict]) -> int:
+        """Insert outbox rows (kind, ref, user_id, token, title, body); caller commits with its own change."""
+        now = datetime.utcnow()
+        rows = [{**message, "available_at": now, "created_at": now} for message in messages]
+        if rows:
+            db.session.execute(insert(NotificationOutbox), rows)
+        return len(rows)
+
+    @staticmethod
+    def lease(owner: str, limit: int, now: datetime, lease_for: timedelta) -> List:
+        """Claim up to ``limit`` ready rows for ``owner`` until ``now + lease_for`` and return them.
+
+        A row is ready when it is pending, due, and not leased or its lease
+        expired. The claim is one UPDATE that picks the candidates in a
+        subquery and re-checks readiness itself, both through
+        ix_notification_outbox_ready, so two dispatchers never hold the
+        same row; on PostgreSQL SKIP LOCKED keeps them from waiting on each
+        other's candidates.
+        """
+        ready = (
+            NotificationOutbox.status == "pending",
+            NotificationOutbox.available_at <= now,
+            or_(NotificationOutbox.leased_until.is_(None), NotificationOutbox.leased_until <= now),
+        )
+        candidates = (
+            select(NotificationOutbox.id)
+                .where(*ready)
+                .order_by(NotificationOutbox.available_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+        )
+        try:
+            claimed = db.session.execute(
+                update(NotificationOutbox)
+                    .where(NotificationOutbox.id.in_(candidates.scalar_subquery()), *ready)
+                    .values(lease_owner=owner, leased_until=now + lease_for)
+                    .execution_options(synchronize_session=False)
+            ).rowcount
+            if not claimed:
+                db.session.rollback()
+                return []
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return db.session.execute(
+            select(*LEASED_COLUMNS)
+                .where(NotificationOutbox.lease_owner == owner)
+                .order_by(NotificationOutbox.id)
+        ).all()
+
+    @staticmethod
+    def ack(ids: Iterable[int]) -> int:
+        """Delete rows that were sent."""
+        ids = list(ids)
+        if not ids:
+            return 0
+        try:
+            deleted = db.session.execute(delete(NotificationOutbox).where(NotificationOutbox.id.in_(ids))).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return deleted
+
+    @staticmethod
+    def retry(owner: str, failures: Iterable[Tuple[int, int, datetime, str]], max_attempts: int) -> int:
+        """Release ``(id, attempts, available_at, error)`` rows still leased by ``owner`` for another attempt.
+
+        ``attempts`` is the count after this failure; rows that reached
+        ``max_attempts`` are marked dead. Returns how many were marked dead.
+        """
+        rows = [
+            {"b_id": row_id, "b_attempts": attempts, "b_available_at": available_at, "b_error": error,
+             "b_status": "dead" if attempts >= max_attempts else "pending"}
+            for row_id, attempts, available_at, error in failures
+        ]
+        if not rows:
+            return 0
+        table = NotificationOutbox.__table__
+        try:
+            db.session.execute(
+                update(table)
+                    .where(table.c.id == bindparam("b_id"), table.c.lease_owner == owner)
+                    .values(status=bindparam("b_status"), attempts=bindparam("b_attempts"),
+                            available_at=bindparam("b_available_at"), last_error=bindparam("b_error"),
+                            lease_owner=None, leased_until=None),
+                rows,
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return sum(1 for row in rows if row["b_status"] == "dead")
+
+    @staticmethod
+    def get_backlog(now: datetime) -> Dict[str, object]:
+        """Pending, ready, in-flight and dead row counts and the oldest pending row's creation time."""
+        is_ready = and_(NotificationOutbox.available_at <= now,
+                        or_(NotificationOutbox.leased_until.is_(None), NotificationOutbox.leased_until <= now))
+        pending, ready, leased, oldest = db.session.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(case((is_ready, 1), else_=0)), 0),
+                func.coalesce(func.sum(case((NotificationOutbox.leased_until > now, 1), else_=0)), 0),
+                func.min(NotificationOutbox.created_at),
+            ).where(NotificationOutbox.status == "pending")
+        ).one()
+        dead = db.session.scalar(select(func.count()).where(NotificationOutbox.status == "dead"))
+        return {"pending": pending, "ready": ready, "leased": leased, "dead": dead, "oldest_pending": oldest}
+
+    @staticmethod
+    def purge_dead(before: datetime) -> int:
+        """Delete dead rows created before ``before``."""
+        try:
+            deleted = db.session.execute(
+                delete(NotificationOutbox)
+                    .where(NotificationOutbox.status == "dead", NotificationOutbox.created_at < before)
+            ).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return deleted
@@ -1,10 +1,14 @@
 # flask_api/repos/room_repo.py
-from typing import List, Optional
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
+from typing import Iterable, List, Optional, Set, Tuple
+from datetime import datetime
+from sqlalchemy import select, update, insert, func, and_, or_
+from sqlalchemy.orm import joinedload, selectinload
 from entities import db
-from entities.room import Room, RoomMember, RoomInvitation
+from entities.room import Room, RoomMember, RoomInvitation, MembershipVersion, RoomVersion, RoomChange
 from entities.user import User
+from entities.task import TaskAlertCount
+from entities.finance import FinanceSummary
+from repository.upsert import upsert
 
 
 class RoomRepo:
@@ -20,6 +24,7 @@ class RoomRepo:
         invitation = db.session.get(RoomInvitation, invitation_id)
         if invitation:
             db.session.delete(invitation)
+            RoomRepo.record_change(invitation.room_id, "invitation", invitation.id, "delete")
             db.session.commit()
 
     @staticmethod
@@ -32,6 +37,7 @@ class RoomRepo:
         room.description = description
         if picture_url:
             room.picture_url = picture_url
+        RoomRepo.record_change(room_id, "room", room_id)
         db.session.commit()
         return room
 
@@ -43,6 +49,8 @@ class RoomRepo:
     def add_member(room_id: int, user_id: int) -> RoomMember:
         member = RoomMember(room_id=room_id, user_id=user_id)
         db.session.add(member)
+        RoomRepo.bump_membership_version(user_id)
+        RoomRepo.record_change(room_id, "member", user_id)
         db.session.commit()
         return member
 
@@ -61,6 +69,8 @@ class RoomRepo:
             status=status,
         )
         db.session.add(invitation)
+        db.session.flush()
+        RoomRepo.record_change(room_id, "invitation", invitation.id)
         db.session.commit()
         return invitation
 
@@ -71,17 +81,26 @@ class RoomRepo:
                 .join(RoomMember)
                 .where(RoomMember.user_id == user_id)
                 .order_by(Room.created_at.desc())
+                .options(selectinload(Room.members))
         )
         return db.session.scalars(stmt).all()
 
     @staticmethod
-    def list_invites_for_user(user_id: int) -> List[Room]:
+    def list_invites_for_user(user_id: int, limit: Optional[int] = None,
+                              before: Optional[Tuple[datetime, int]] = None) -> List[Room]:
+        """Rooms the user was invited to, newest first; ``limit``/``before`` page by (created_at, id)."""
         stmt = (
             select(Room)
             .join(RoomInvitation)
             .where(RoomInvitation.invitee_user_id == user_id)
-            .order_by(Room.created_at.desc())
+            .order_by(Room.created_at.desc(), Room.id.desc())
+            .options(selectinload(Room.members))
         )
+        if before is not None:
+            created_at, room_id = before
+            stmt = stmt.where(Room.created_at <= created_at, or_(Room.created_at < created_at, Room.id < room_id))
+        if limit is not None:
+            stmt = stmt.limit(limit)
         return db.session.scalars(stmt).all()
 
     @staticmethod
@@ -94,6 +113,22 @@ class RoomRepo:
         )
         return db.session.scalars(stmt).all()
 
+    @staticmethod
+    def list_invitations_for_room(room_id: int) -> List[RoomInvitation]:
+        stmt = (
+            select(RoomInvitation)
+                .where(RoomInvitation.room_id == room_id)
+                .order_by(RoomInvitation.created_at.desc())
+        )
+        return db.session.scalars(stmt).all()
+
+    @staticmethod
+    def get_invitations_by_ids(invitation_ids: List[int]) -> List[RoomInvitation]:
+        if not invitation_ids:
+            return []
+        stmt = select(RoomInvitation).where(RoomInvitation.id.in_(invitation_ids))
+        return db.session.scalars(stmt).all()
+
     @staticmethod
     def get_invitation(invitation_id: int) -> Optional[RoomInvitation]:
         return db.session.get(RoomInvitation, invitation_id)
@@ -118,19 +153,29 @@ class RoomRepo:
         if inv is None:
             raise ValueError("Invitation not found")
         inv.status = status
+        RoomRepo.record_change(inv.room_id, "invitation", inv.id)
         db.session.commit()
         return inv
 
     @staticmethod
-    def list_invitations_for_user_by_status(user_id: int, status: str) -> List[RoomInvitation]:
+    def list_invitations_for_user_by_status(user_id: int, status: str, limit: Optional[int] = None,
+                                            before: Optional[Tuple[datetime, int]] = None) -> List[RoomInvitation]:
         stmt = (
             select(RoomInvitation)
                 .where(
                 RoomInvitation.invitee_user_id == user_id,
                 RoomInvitation.status == status,
             )
-                .order_by(RoomInvitation.created_at.desc())
+                .order_by(RoomInvitation.created_at.desc(), RoomInvitation.id.desc())
         )
+        if before is not None:
+            created_at, invitation_id = before
+            stmt = stmt.where(
+                RoomInvitation.created_at <= created_at,
+                or_(RoomInvitation.created_at < created_at, RoomInvitation.id < invitation_id),
+            )
+        if limit is not None:
+            stmt = stmt.limit(limit)
         return db.session.scalars(stmt).all()
 
     @staticmethod
@@ -150,6 +195,166 @@ class RoomRepo:
         member = RoomMember.query.filter_by(user_id=user_id, room_id=room_id).first()
         if member:
             db.session.delete(member)
+            RoomRepo.bump_membership_version(user_id)
+            RoomRepo.record_change(room_id, "member", user_id, "delete")
             db.session.commit()
         else:
-            raise ValueError("User is not a member of the room")
\ No newline at end of file
+            raise ValueError("User is not a member of the room")
+
+    @staticmethod
+    def list_room_ids_for_user(user_id: int) -> List[int]:
+        stmt = select(RoomMember.room_id).where(RoomMember.user_id == user_id)
+        return db.session.scalars(stmt).all()
+
+    @staticmethod
+    def get_alerts_and_owes_for_user(user_id: int):
+        """One row per joined room: (room_id, the user's task alert counter, owes JSON)."""
+        stmt = (
+            select(RoomMember.room_id, func.coalesce(TaskAlertCount.alerts, 0), FinanceSummary.owes)
+                .outerjoin(
+                TaskAlertCount,
+                and_(TaskAlertCount.room_id == RoomMember.room_id, TaskAlertCount.user_id == user_id),
+            )
+                .outerjoin(
+                FinanceSummary,
+                and_(FinanceSummary.room_id == RoomMember.room_id, FinanceSummary.user_id == user_id),
+            )
+                .where(RoomMember.user_id == user_id)
+        )
+        return db.session.execute(stmt).all()
+
+    @staticmethod
+    def find_non_members(user_ids: Iterable[int], room_id: int) -> Set[int]:
+        """Return the subset of user_ids that are not members of room_id."""
+        wanted = {int(user_id) for user_id in user_ids}
+        if not wanted:
+            return set()
+        stmt = (
+            select(RoomMember.user_id)
+                .where(RoomMember.room_id == room_id, RoomMember.user_id.in_(wanted))
+        )
+        return wanted - set(db.session.scalars(stmt).all())
+
+    @staticmethod
+    def get_membership_version(user_id: int) -> int:
+        version = db.session.scalar(
+            select(MembershipVersion.version).where(MembershipVersion.user_id == user_id)
+        )
+        return version or 0
+
+    @staticmethod
+    def bump_membership_version(user_id: int) -> None:
+        """Bump the user's membership version; caller commits."""
+        upsert(MembershipVersion, [{"user_id": user_id, "version": 1}], ("user_id",),
+               lambda excluded: {"version": MembershipVersion.version + 1})
+
+
+    @staticmethod
+    def get_room_version(room_id: int) -> int:
+        version = db.session.scalar(
+            select(RoomVersion.version).where(RoomVersion.room_id == room_id)
+        )
+        return version or 0
+
+    @staticmethod
+    def bump_room_version(room_id: int) -> None:
+        """Bump the room's version so cached reads (ETags) go stale; caller commits."""
+        upsert(RoomVersion, [{"room_id": room_id, "version": 1}], ("room_id",),
+               lambda excluded: {"version": RoomVersion.version + 1})
+
+    @staticmethod
+    def get_calendar_version(room_id: int) -> int:
+        version = db.session.scalar(
+            select(RoomVersion.calendar_version).where(RoomVersion.room_id == room_id)
+        )
+        return version or 0
+
+    @staticmethod
+    def bump_calendar_version(room_id: int) -> None:
+        """Mark the room's calendar density stale; caller commits."""
+        upsert(RoomVersion, [{"room_id": room_id, "version": 0, "calendar_version": 1}], ("room_id",),
+               lambda excluded: {"calendar_version": RoomVersion.calendar_version + 1})
+
+    @staticmethod
+    def record_profile_change(user_id: int) -> None:
+        """The user's profile shows up in every member list they belong to; caller commits."""
+        for room_id in RoomRepo.list_room_ids_for_user(user_id):
+            RoomRepo.record_change(room_id, "member", user_id)
+
+    @staticmethod
+    def record_change(room_id: int, entity: str, entity_id: int, op: str = "upsert") -> None:
+        """Append to the room's change log and bump its version; caller commits."""
+        db.session.add(RoomChange(room_id=room_id, entity=entity, entity_id=entity_id, op=op))
+        RoomRepo.bump_room_version(room_id)
+
+    @staticmethod
+    def record_changes(room_id: int, entity: str, entity_ids: Iterable[int], op: str = "upsert") -> None:
+        """record_change for many rows with one multi-row insert and a single version bump; caller commits."""
+        rows = [
+            {"room_id": room_id, "entity": entity, "entity_id": entity_id, "op": op}
+            for entity_id in entity_ids
+        ]
+        if rows:
+            db.session.execute(insert(RoomChange), rows)
+            RoomRepo.bump_room_version(room_id)
+
+    @staticmethod
+    def list_changes_since(room_id: int, cursor: int) -> List[RoomChange]:
+        stmt = (
+            select(RoomChange)
+                .where(RoomChange.room_id == room_id, RoomChange.id > cursor)
+                .order_by(RoomChange.id)
+        )
+        return db.session.scalars(stmt).all()
+
+    @staticmethod
+    def get_latest_change_id(room_id: int, before: Optional[datetime] = None) -> int:
+        stmt = select(func.max(RoomChange.id)).where(RoomChange.room_id == room_id)
+        if before is not None:
+            stmt = stmt.where(RoomChange.created_at <= before)
+        return db.session.scalar(stmt) or RoomRepo.get_compacted_through(room_id)
+
+    @staticmethod
+    def get_compacted_through(room_id: int) -> int:
+        stmt = select(RoomVersion.compacted_through).where(RoomVersion.room_id == room_id)
+        return db.session.scalar(stmt) or 0
+
+    @staticmethod
+    def reset_change_log(room_id: int) -> None:
+        """Force every client of the room back to a full snapshot; caller commits.
+
+        For bulk writes that bypass record_change."""
+        marker = RoomChange(room_id=room_id, entity="room", entity_id=room_id, op="upsert")
+        db.session.add(marker)
+        RoomRepo.bump_room_version(room_id)
+        db.session.flush()
+        db.session.execute(
+            update(RoomVersion)
+                .where(RoomVersion.room_id == room_id)
+                .values(compacted_through=marker.id)
+        )
+
+    @staticmethod
+    def compact_changes(older_than: datetime) -> int:
+        """Delete change-log entries older than the cutoff and raise each room's
+        compacted_through so stale cursors fall back to a snapshot."""
+        stmt = (
+            select(RoomChange.room_id, func.max(RoomChange.id))
+                .where(RoomChange.created_at < older_than)
+                .group_by(RoomChange.room_id)
+        )
+        watermarks = db.session.execute(stmt).all()
+        for room_id, max_id in watermarks:
+            result = db.session.execute(
+                update(RoomVersion)
+                    .where(RoomVersion.room_id == room_id, RoomVersion.compacted_through < max_id)
+                    .values(compacted_through=max_id)
+            )
+            if result.rowcount == 0 and db.session.get(RoomVersion, room_id) is None:
+                db.session.add(RoomVersion(room_id=room_id, version=0, compacted_through=max_id))
+            db.session.execute(
+                RoomChange.__table__.delete()
+                    .where(RoomChange.room_id == room_id, RoomChange.id <= max_id)
+            )
+        db.session.commit()
+        return len(watermarks)
@@ -0,0 +1,48 @@
+# flask_api/repository/scheduler_repo.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import update, delete, or_
+from sqlalchemy.exc import IntegrityError
+
+from entities import db
+from entities.scheduler import SchedulerLease
+
+
+class SchedulerRepo:
+
+    @staticmethod
+    def acquire(name: str, owner: str, now: datetime, ttl: timedelta) -> bool:
+        """Take or renew the ``name`` lease for ``owner`` until ``now + ttl``; False if another owner holds it.
+
+        The renewal is a conditional UPDATE and the first lease an INSERT
+        on the primary key, so of several processes racing for a free lease
+        exactly one succeeds.
+        """
+        try:
+            taken = db.session.execute(
+                update(SchedulerLease)
+                    .where(SchedulerLease.name == name,
+                           or_(SchedulerLease.owner == owner, SchedulerLease.expires_at <= now))
+                    .values(owner=owner, expires_at=now + ttl)
+            ).rowcount
+            if not taken:
+                db.session.add(SchedulerLease(name=name, owner=owner, expires_at=now + ttl))
+            db.session.commit()
+        except IntegrityError:
+            # The lease exists and someone else holds it
+            db.session.rollback()
+            return False
+        except Exception:
+            db.session.rollback()
+            raise
+        return True
+
+    @staticmethod
+    def release(owner: str) -> None:
+        """Give up every lease ``owner`` holds, so other processes take them at their next tick."""
+        try:
+            db.session.execute(delete(SchedulerLease).where(SchedulerLease.owner == owner))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
@@ -1,66 +1,278 @@
 from sqlalchemy import select
-from entities.task import Task, TaskUser
+from entities.task import Task, TaskUser, TaskOccurrence, TaskUserOccurrence
 from entities import db
-from typing import List, Optional
-from datetime import datetime, date
-from sqlalchemy import select, func
-from sqlalchemy.orm import joinedload
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from datetime import datetime
+from sqlalchemy import select, insert, update, delete, func, or_, bindparam, tuple_
+from sqlalchemy.orm import joinedload, selectinload
+from entities.room import Room, RoomMember
+from entities.user import User
+from entities.device_token import DeviceToken
+from repository.room_repo import RoomRepo
+from repository.alert_repo import AlertRepo
+import recurrence
+
+# Rows fetched per round trip when streaming
+STREAM_BATCH_SIZE = 500
+
+# What the deadline notification job needs per (task, assignee, device token)
+NOTIFICATION_COLUMNS = (
+    Task.id, Task.title, Task.deadline, Task.frequency, Task.occurrences, Task.notified,
+    TaskUser.user_id, TaskUser.status, User.name, User.username, DeviceToken.token,
+)
+
+# Tasks with an occurrence whose deadline is >= start: single tasks by their
+# deadline, series by their last occurrence.
+def _ends_at_or_after(start: datetime):
+    return func.coalesce(Task.series_end, Task.deadline) >= start
+
+# Task columns read by list endpoints as plain rows instead of tracked Task instances
+TASK_ROW_COLUMNS = (
+    Task.id, Task.title, Task.deadline, Task.description, Task.frequency, Task.repeat,
+    Task.scheduled_date, Task.occurrences, Task.series_end,
+)
 
 class TaskRepo:
 
     @staticmethod
-    def get_tasks_for_room(room_id: int) -> List[Task]:
+    def get_tasks_for_room(room_id: int, now: datetime):
+        """Tasks of the room visible at ``now``, as TASK_ROW_COLUMNS rows."""
+        stmt = (
+            select(*TASK_ROW_COLUMNS)
+                .where(Task.room_id == room_id, Task.scheduled_date <= now)
+                .order_by(Task.deadline)
+        )
+        return db.session.execute(stmt).all()
+
+    @staticmethod
+    def get_assignee_statuses_for_room(room_id: int, now: datetime) -> Dict[int, Dict[int, str]]:
+        """task_id -> {user_id: status} for get_tasks_for_room(room_id, now), in one query."""
+        task_ids = select(Task.id).where(Task.room_id == room_id, Task.scheduled_date <= now)
+        return TaskRepo._statuses_where(TaskUser.task_id.in_(task_ids))
+
+    @staticmethod
+    def get_assignee_statuses(task_ids: Iterable[int]) -> Dict[int, Dict[int, str]]:
+        """task_id -> {user_id: status} for a bounded list of tasks, such as one page."""
+        task_ids = list(task_ids)
+        if not task_ids:
+            return {}
+        return TaskRepo._statuses_where(TaskUser.task_id.in_(task_ids))
+
+    @staticmethod
+    def _statuses_where(condition) -> Dict[int, Dict[int, str]]:
+        statuses = {}
+        stmt = select(TaskUser.task_id, TaskUser.user_id, TaskUser.status).where(condition)
+        for task_id, user_id, status in db.session.execute(stmt):
+            statuses.setdefault(task_id, {})[user_id] = status
+        return statuses
+
+    @staticmethod
+    def get_single_tasks_page(room_id: int, now: datetime, limit: int,
+                              after: Optional[Tuple[Optional[datetime], int]] = None):
+        """Up to ``limit`` visible single tasks, as TASK_ROW_COLUMNS rows, after the ``(deadline, id)`` key ``after``.
+
+        Ordered by (deadline, id) with tasks that have no deadline first.
+        """
+        visible = (Task.room_id == room_id, Task.occurrences.is_(None), Task.scheduled_date <= now)
+        deadline, task_id = after or (None, 0)
+        tasks = []
+        if deadline is None:
+            tasks = db.session.execute(
+                select(*TASK_ROW_COLUMNS)
+                    .where(*visible, Task.deadline.is_(None), Task.id > task_id)
+                    .order_by(Task.id)
+                    .limit(limit)
+            ).all()
+        if len(tasks) < limit:
+            stmt = (
+                select(*TASK_ROW_COLUMNS)
+                    .where(*visible, Task.deadline.is_not(None))
+                    .order_by(Task.deadline, Task.id)
+                    .limit(limit - len(tasks))
+            )
+            if deadline is not None:
+                stmt = stmt.where(Task.deadline >= deadline, or_(Task.deadline > deadline, Task.id > task_id))
+            tasks = list(tasks) + list(db.session.execute(stmt))
+        return tasks
+
+    @staticmethod
+    def get_series_for_room(room_id: int, now: datetime, ends_at_or_after: Optional[datetime] = None,
+                            starts_at_or_before: Optional[datetime] = None):
+        """Visible task series of the room as TASK_ROW_COLUMNS rows, optionally only those with
+        occurrences due in the given bounds."""
+        stmt = (
+            select(*TASK_ROW_COLUMNS)
+                .where(Task.room_id == room_id, Task.occurrences.is_not(None), Task.scheduled_date <= now)
+        )
+        if ends_at_or_after is not None:
+            stmt = stmt.where(Task.series_end >= ends_at_or_after)
+        if starts_at_or_before is not None:
+            stmt = stmt.where(Task.deadline <= starts_at_or_before)
+        return db.session.execute(stmt).all()
+
+    @staticmethod
+    def get_all_tasks_for_room(room_id: int) -> List[Task]:
         stmt = (
             select(Task)
-                .where(Task.room_id == room_id, Task.scheduled_date <= datetime.now())
+                .options(selectinload(Task.users))
+                .where(Task.room_id == room_id)
                 .order_by(Task.deadline)
         )
         return db.session.scalars(stmt).all()
 
     @staticmethod
-    def get_tasks_for_room_by_date(room_id: int, target_date: date) -> List[Task]:
+    def get_tasks_by_ids(task_ids: List[int]) -> List[Task]:
+        if not task_ids:
+            return []
+        stmt = (
+            select(Task)
+                .options(selectinload(Task.users))
+                .where(Task.id.in_(task_ids))
+                .order_by(Task.deadline)
+        )
+        return db.session.scalars(stmt).all()
+
+    @staticmethod
+    def get_latest_visible_scheduled_date(room_id: int, now: datetime) -> Optional[datetime]:
+        latest = db.session.scalar(
+            select(func.max(Task.scheduled_date))
+                .where(Task.room_id == room_id, Task.scheduled_date <= now, Task.occurrences.is_(None))
+        )
+        series = db.session.execute(
+            select(Task.scheduled_date, Task.frequency, Task.occurrences)
+                .where(Task.room_id == room_id, Task.scheduled_date <= now, Task.occurrences.is_not(None))
+        ).all()
+        for row in series:
+            step, count = recurrence.series(row)
+            visible = recurrence.visible_count(row.scheduled_date, step, count, now)
+            scheduled = recurrence.shift(row.scheduled_date, step, visible - 1)
+            latest = scheduled if latest is None else max(latest, scheduled)
+        return latest
+
+    @staticmethod
+    def get_tasks_for_room_between(room_id: int, start: datetime, end: datetime) -> List[Task]:
         stmt = (
             select(Task)
                 .options(joinedload(Task.users))
                 .where(
                 Task.room_id == room_id,
-                func.date(Task.deadline) == target_date,
-                Task.scheduled_date <= datetime.now()
+                Task.deadline < end,
+                _ends_at_or_after(start),
+                Task.scheduled_date <= datetime.utcnow()
             )
+                .order_by(Task.deadline, Task.id)
         )
         return db.session.execute(stmt).unique().scalars().all()
 
     @staticmethod
-    def get_uncompleted_task_users(task_id: int) -> List[TaskUser]:
+    def get_task_rows_for_room_between(room_id: int, start: datetime, end: datetime):
+        """Same filter as get_tasks_for_room_between, as plain rows (one per assignee)."""
         stmt = (
-            select(TaskUser)
-                .where(TaskUser.task_id == task_id)
-                .where(TaskUser.status != 'complete' if TaskUser.status else True)
+            select(*TASK_ROW_COLUMNS, TaskUser.user_id, TaskUser.status)
+                .outerjoin(TaskUser, TaskUser.task_id == Task.id)
+                .where(
+                Task.room_id == room_id,
+                Task.deadline < end,
+                _ends_at_or_after(start),
+                Task.scheduled_date <= datetime.utcnow()
+            )
+                .order_by(Task.deadline, Task.id)
         )
-        return db.session.scalars(stmt).all()
+        return db.session.execute(stmt).all()
 
     @staticmethod
-    def get_tasks_for_user(user_id: int) -> List[Task]:
+    def get_task_series_between(room_id: int, start: datetime, end: datetime):
+        """(id, scheduled_date, deadline, frequency, occurrences) of tasks with an occurrence due in [start, end)."""
         stmt = (
-            select(Task)
-            .join(TaskUser)
-            .where(TaskUser.user_id == user_id)
-            .order_by(Task.deadline)
+            select(Task.id, Task.scheduled_date, Task.deadline, Task.frequency, Task.occurrences)
+                .where(Task.room_id == room_id, Task.deadline < end, _ends_at_or_after(start))
         )
-        return db.session.scalars(stmt).all()
+        return db.session.execute(stmt).all()
+
+    @staticmethod
+    def get_occurrence_state(task_ids: Iterable[int]) -> Tuple[Set[Tuple[int, int]], Set[Tuple[int, int]],
+                                                            Dict[Tuple[int, int], Dict[int, str]]]:
+        """(cancelled, notified, statuses) of the given series' later occurrences, keyed by (task_id, k)."""
+        task_ids = list(task_ids)
+        cancelled, notified, statuses = set(), set(), {}
+        if not task_ids:
+            return cancelled, notified, statuses
+        for row in db.session.scalars(select(TaskOccurrence).where(TaskOccurrence.task_id.in_(task_ids))):
+            if row.cancelled:
+                cancelled.add((row.task_id, row.occurrence))
+            if row.notified:
+                notified.add((row.task_id, row.occurrence))
+        for row in db.session.scalars(select(TaskUserOccurrence).where(TaskUserOccurrence.task_id.in_(task_ids))):
+            statuses.setdefault((row.task_id, row.occurrence), {})[row.user_id] = row.status
+        return cancelled, notified, statuses
+
+    @staticmethod
+    def set_occurrence_flags(task_id: int, occurrence: int, **flags) -> None:
+        """Upsert cancelled/notified on one later occurrence; caller commits."""
+        result = db.session.execute(
+            update(TaskOccurrence)
+                .where(TaskOccurrence.task_id == task_id, TaskOccurrence.occurrence == occurrence)
+                .values(**flags)
+        )
+        if result.rowcount == 0:
+            db.session.add(TaskOccurrence(task_id=task_id, occurrence=occurrence, **flags))
 
     @staticmethod
-    def get_task_for_user(task_id: int, user_id: int) -> Optional[TaskUser]:
+    def get_tasks_for_user(user_id: int, statuses: Iterable[str], now: datetime,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """Visible single tasks assigned to the user with one of ``statuses``, in rooms they still belong to.
+
+        TASK_ROW_COLUMNS rows plus ``room_id``, ``room_name`` and the user's
+        ``status``, ordered by (deadline, id) with undated tasks first; a
+        window ``[start, end)`` on the deadline drops undated tasks.
+        """
         stmt = (
-            select(TaskUser)
-            .where(TaskUser.task_id == task_id, TaskUser.user_id == user_id)
+            TaskRepo._user_assignments(user_id, now)
+                .where(TaskUser.status.in_(list(statuses)), Task.occurrences.is_(None))
+                .order_by(Task.deadline.is_not(None), Task.deadline, Task.id)
         )
-        return db.session.scalar(stmt)
+        if start is not None:
+            stmt = stmt.where(Task.deadline >= start)
+        if end is not None:
+            stmt = stmt.where(Task.deadline < end)
+        return db.session.execute(stmt).all()
 
     @staticmethod
-    def create_task(room_id: int, title: str, description: str, frequency: int, repeat: int, scheduled_date: Optional[datetime],
-                    deadline: Optional[datetime]) -> Task:
+    def get_series_for_user(user_id: int, now: datetime,
+                            start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """Visible series assigned to the user with an occurrence that can fall in ``[start, end)``.
 
+        Same columns as get_tasks_for_user; ``status`` is the first
+        occurrence's, later ones come from get_occurrence_state.
+        """
+        stmt = TaskRepo._user_assignments(user_id, now).where(Task.occurrences.is_not(None))
+        if start is not None:
+            stmt = stmt.where(Task.series_end >= start)
+        if end is not None:
+            stmt = stmt.where(Task.deadline < end)
+        return db.session.execute(stmt).all()
+
+    @staticmethod
+    def _user_assignments(user_id: int, now: datetime):
+        return (
+            select(*TASK_ROW_COLUMNS, Task.room_id, Room.name.label("room_name"), TaskUser.status)
+                .select_from(TaskUser)
+                .join(Task, Task.id == TaskUser.task_id)
+                .join(RoomMember, (RoomMember.room_id == Task.room_id) & (RoomMember.user_id == user_id))
+                .join(Room, Room.id == Task.room_id)
+                .where(TaskUser.user_id == user_id, Task.scheduled_date <= now)
+        )
+
+    @staticmethod
+    def create_task_series(room_id: int, title: str, description: Optional[str], frequency: Optional[str],
+                           repeat: int, scheduled_date: datetime, deadline: datetime, occurrences: int,
+                           assignees: List[Tuple[int, Optional[str]]]) -> Task:
+        """Insert a task (a series when occurrences > 1) and its assignees in one transaction.
+
+        The assignees' given status applies to the first occurrence; later
+        occurrences start as "todo".
+        """
+        step = recurrence.parse_frequency(frequency) if occurrences > 1 else None
         task = Task(
             room_id=room_id,
             title=title,
@@ -68,83 +280,167 @@ class TaskRepo:
             frequency=frequency,
             repeat=repeat,
             scheduled_date=scheduled_date,
-            deadline=deadline
+            deadline=deadline,
+            occurrences=occurrences if step else None,
+            series_end=recurrence.shift(deadline, step, occurrences - 1) if step else None,
         )
-
-        db.session.add(task)
-        db.session.commit()
+        try:
+            alerts = AlertRepo.snapshot()
+            db.session.add(task)
+            db.session.flush()
+            if assignees:
+                db.session.execute(insert(TaskUser), [
+                    {"task_id": task.id, "user_id": user_id, "status": status or "todo"}
+                    for user_id, status in assignees
+                ])
+            AlertRepo.record(alerts, [task.id])
+            RoomRepo.record_change(room_id, "task", task.id)
+            RoomRepo.bump_calendar_version(room_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
         return task
 
-    @staticmethod
-    def create_task_user(user_id: int, task_id: int, status: Optional[str]):
-        task_user = TaskUser(task_id=task_id, user_id=user_id, status=status)
-        db.session.add(task_user)
-        db.session.commit()
-        return task_user
-
     @staticmethod
     def get_task_by_id(task_id: int):
         return Task.query.get(task_id)
 
     @staticmethod
-    def update_task_user(user_id: int, task_id: int, status: str):
-        task_user = TaskUser.query.filter_by(user_id=user_id, task_id=task_id).first()
-        if task_user:
-            task_user.status = status
-            db.session.commit()
+    def get_task_rows(room_id: int, task_ids: Iterable[int]):
+        """TASK_ROW_COLUMNS rows of the given tasks that belong to the room."""
+        stmt = select(*TASK_ROW_COLUMNS).where(Task.room_id == room_id, Task.id.in_(list(task_ids)))
+        return db.session.execute(stmt).all()
 
     @staticmethod
-    def update_task(task_id: int, title: Optional[str] = None, description: Optional[str] = None, deadline: Optional[datetime] = None):
-        task = Task.query.get(task_id)
-        if task:
-            if title is not None:
-                task.title = title
-            if description is not None:
-                task.description = description
-            if deadline is not None:
-                task.deadline = deadline
+    def update_tasks(room_id: int, tasks: List[dict], statuses: List[Tuple[int, int, str]],
+                     occurrence_statuses: List[Tuple[int, int, int, str]], calendar_changed: bool) -> None:
+        """Apply a batch of task edits in one transaction.
+
+        ``tasks`` are ``{"id": ..., column: value}`` dicts (one UPDATE by primary
+        key), ``statuses`` ``(task_id, user_id, status)`` for first occurrences
+        and ``occurrence_statuses`` ``(task_id, occurrence, user_id, status)`` for
+        later ones. Each of the three is written with a single executemany.
+        """
+        task_ids = {task["id"] for task in tasks}
+        task_ids.update(task_id for task_id, _, _ in statuses)
+        task_ids.update(task_id for task_id, _, _, _ in occurrence_statuses)
+        try:
+            alerts = AlertRepo.snapshot(task_ids)
+            if tasks:
+                db.session.execute(update(Task), tasks)
+            if statuses:
+                db.session.execute(
+                    update(TaskUser.__table__)
+                        .where(TaskUser.task_id == bindparam("b_task_id"), TaskUser.user_id == bindparam("b_user_id"))
+                        .values(status=bindparam("b_status")),
+                    [{"b_task_id": t, "b_user_id": u, "b_status": s} for t, u, s in statuses],
+                )
+            if occurrence_statuses:
+                keys = {(t, k, u): s for t, k, u, s in occurrence_statuses}
+                db.session.execute(
+                    delete(TaskUserOccurrence)
+                        .where(tuple_(TaskUserOccurrence.task_id, TaskUserOccurrence.occurrence,
+                                      TaskUserOccurrence.user_id).in_(list(keys)))
+                )
+                db.session.execute(insert(TaskUserOccurrence), [
+                    {"task_id": t, "occurrence": k, "user_id": u, "status": s} for (t, k, u), s in keys.items()
+                ])
+            AlertRepo.record(alerts, task_ids)
+            RoomRepo.record_changes(room_id, "task", sorted(task_ids))
+            if calendar_changed:
+                RoomRepo.bump_calendar_version(room_id)
             db.session.commit()
-        return task
+        except Exception:
+            db.session.rollback()
+            raise
 
     @staticmethod
-    def get_upcoming_tasks(date: datetime) -> List[Task]:
-        stmt = (
-            select(Task)
-                .where(
-                Task.deadline <= date,
-                Task.deadline >= datetime.now(),
-                Task.notified == False
+    def iter_notification_candidates(now: datetime, until: datetime) -> Iterator:
+        """(task, assignee, device token) rows for tasks with an occurrence due in ``[now, until]``.
+
+        First un-notified single tasks, only for assignees who have not
+        completed them, then every series with an occurrence in the window
+        and all of its assignees. Rows come grouped by task, ordered by
+        (deadline, task, user, token), and are fetched in batches of
+        STREAM_BATCH_SIZE as they are consumed. Assignees without a device
+        token are left out.
+        """
+        def candidates(*conditions):
+            return (
+                select(*NOTIFICATION_COLUMNS)
+                    .select_from(Task)
+                    .join(TaskUser, TaskUser.task_id == Task.id)
+                    .join(User, User.id == TaskUser.user_id)
+                    .join(DeviceToken, DeviceToken.user_id == TaskUser.user_id)
+                    .where(*conditions)
+                    .order_by(Task.deadline, Task.id, TaskUser.user_id, DeviceToken.id)
+                    .execution_options(yield_per=STREAM_BATCH_SIZE)
             )
-                .order_by(Task.deadline)
-        )
-        return db.session.scalars(stmt).all()
 
-    @staticmethod
-    def set_task_notified(task_id: int):
-        task = Task.query.get(task_id)
-        if task:
-            task.notified = True
-            db.session.commit()
-        return task
+        yield from db.session.execute(candidates(
+            Task.occurrences.is_(None), Task.notified == False, Task.deadline >= now, Task.deadline <= until,
+            or_(TaskUser.status.is_(None), TaskUser.status != "complete"),
+        ))
+        yield from db.session.execute(candidates(
+            Task.occurrences.is_not(None), Task.series_end >= now, Task.deadline <= until,
+        ))
 
     @staticmethod
-    def get_tasks_for_date(target_date, now):
-        return (
-            db.session.query(Task)
-                .options(joinedload(Task.users))
-                .filter(
-                func.date(Task.deadline) == target_date,
-                Task.scheduled_date > now
-            )
-                .all()
-        )
+    def set_occurrences_notified(keys: Iterable[Tuple[int, int]]) -> None:
+        """Mark ``(task_id, occurrence)`` pairs notified, in one transaction.
+
+        A fixed number of statements however many pairs: one UPDATE for
+        single tasks (occurrence 0), and for later occurrences one UPDATE of
+        the existing task_occurrences rows plus one INSERT of the missing ones.
+        """
+        keys = set(keys)
+        single_ids = [task_id for task_id, occurrence in keys if not occurrence]
+        later = [key for key in keys if key[1]]
+        try:
+            if single_ids:
+                db.session.execute(update(Task).where(Task.id.in_(single_ids)).values(notified=True))
+            if later:
+                in_later = tuple_(TaskOccurrence.task_id, TaskOccurrence.occurrence).in_(later)
+                existing = set(db.session.execute(
+                    select(TaskOccurrence.task_id, TaskOccurrence.occurrence).where(in_later)
+                ).all())
+                if existing:
+                    db.session.execute(update(TaskOccurrence).where(in_later).values(notified=True))
+                missing = [
+                    {"task_id": task_id, "occurrence": occurrence, "notified": True}
+                    for task_id, occurrence in later if (task_id, occurrence) not in existing
+                ]
+                if missing:
+                    db.session.execute(insert(TaskOccurrence), missing)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
 
     @staticmethod
     def delete_task(task_id: int):
         task = Task.query.get(task_id)
         if task:
+            alerts = AlertRepo.snapshot([task_id])
+            db.session.execute(delete(TaskOccurrence).where(TaskOccurrence.task_id == task_id))
+            db.session.execute(delete(TaskUserOccurrence).where(TaskUserOccurrence.task_id == task_id))
             db.session.delete(task)
+            AlertRepo.record(alerts, [task_id])
+            RoomRepo.record_change(task.room_id, "task", task_id, "delete")
+            RoomRepo.bump_calendar_version(task.room_id)
             db.session.commit()
             return True
         return False
 
+    @staticmethod
+    def cancel_occurrence(task_id: int, occurrence: int) -> Optional[Task]:
+        task = Task.query.get(task_id)
+        if task:
+            alerts = AlertRepo.snapshot([task_id])
+            TaskRepo.set_occurrence_flags(task_id, occurrence, cancelled=True)
+            AlertRepo.record(alerts, [task_id])
+            RoomRepo.record_change(task.room_id, "task", task_id)
+            RoomRepo.bump_calendar_version(task.room_id)
+            db.session.commit()
+        return task
@@ -0,0 +1,33 @@
+# flask_api/repository/upsert.py
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from entities import db
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def upsert(model, rows: List[dict], keys: Iterable[str],
+           on_conflict: Optional[Callable[[object], Dict]] = None) -> None:
+    """Insert ``rows``, updating the existing row instead where one has the same ``keys``; caller commits.
+
+    ``on_conflict(excluded)`` returns the SET clause; ``excluded`` holds
+    the values that were to be inserted and the model's columns the
+    stored ones, e.g. ``lambda excluded: {"n": Model.n + excluded.n}``.
+    Without it an existing row is left as it is. Insert and update are
+    one statement, so two writers racing for a missing row cannot both
+    insert it.
+    """
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in _INSERTS:
+        raise NotImplementedError(f"upsert is not supported on {dialect}")
+    stmt = _INSERTS[dialect](model).values(rows)
+    if on_conflict is None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=list(keys))
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=list(keys), set_=on_conflict(stmt.excluded))
+    db.session.execute(stmt)
@@ -3,10 +3,12 @@ from __future__ import annotations
 
 from typing import Optional
 from sqlalchemy import select
-from werkzeug.security import generate_password_hash
 
 from entities import db
 from entities.user import User, DeviceToken
+from repository.room_repo import RoomRepo
+from cache.principal_cache import principal_cache
+from services.password_hasher import password_hasher
 
 
 class UserRepo:
@@ -44,7 +46,7 @@ class UserRepo:
         user = User(
             username=username,
             email=email,
-            password_hash=generate_password_hash(raw_password),
+            password_hash=password_hasher.hash(raw_password),
             name=name or username,
             profile_picture_url=profile_picture_url,
         )
@@ -59,8 +61,9 @@ class UserRepo:
             return None
 
         user.username = username
-        user.password_hash = generate_password_hash(password)
+        user.password_hash = password_hasher.hash(password)
         db.session.commit()
+        principal_cache.invalidate_user(user_id)
         return user
 
     @staticmethod
@@ -72,7 +75,9 @@ class UserRepo:
         user.username = username
         user.name = name
         user.profile_picture_url = profile_picture_url
+        RoomRepo.record_profile_change(user_id)
         db.session.commit()
+        principal_cache.invalidate_user(user_id)
         return user
 
     @staticmethod
@@ -0,0 +1,93 @@
+# flask_api/schemas/fast_serializers.py
+from abc import ABC, abstractmethod
+
+from flask import current_app, has_request_context, request
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+class _FastDumper(ABC):
+    """Plain attribute-to-dict builder with the same ``dump`` signature as a marshmallow schema."""
+
+    def __init__(self, many: bool = False):
+        self.many = many
+
+    def dump(self, obj, many=None):
+        many = self.many if many is None else many
+        if many:
+            build = self.build
+            return [build(item) for item in obj]
+        return self.build(obj)
+
+    @staticmethod
+    @abstractmethod
+    def build(obj) -> dict:
+        """The dict for one object."""
+
+
+class FastRoomSchema(_FastDumper):
+    @staticmethod
+    def build(room) -> dict:
+        return {
+            "id": room.id,
+            "name": room.name,
+            "address": room.address,
+            "description": room.description,
+            "picture_url": room.picture_url,
+            "members": [{"user_id": member.user_id} for member in room.members],
+        }
+
+
+class FastRoomInvitationSchema(_FastDumper):
+    @staticmethod
+    def build(invitation) -> dict:
+        return {
+            "room_id": invitation.room_id,
+            "inviter_user_id": invitation.inviter_user_id,
+            "invitee_user_id": invitation.invitee_user_id,
+            "status": invitation.status,
+        }
+
+
+class FastUserSchema(_FastDumper):
+    @staticmethod
+    def build(user) -> dict:
+        return {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "name": user.name,
+            "profile_picture_url": user.profile_picture_url,
+            "created_at": _iso(user.created_at),
+            "updated_at": _iso(user.updated_at),
+        }
+
+
+class FastUserPublicSchema(_FastDumper):
+    @staticmethod
+    def build(user) -> dict:
+        return {
+            "id": user.id,
+            "username": user.username,
+            "name": user.name,
+            "profile_picture_url": user.profile_picture_url,
+        }
+
+
+class BlueprintSchema:
+    """Dumps with the fast builder when the current request's blueprint is listed
+    in ``FAST_SERIALIZER_BLUEPRINTS``, otherwise with the marshmallow schema."""
+
+    def __init__(self, schema, fast_schema):
+        self.schema = schema
+        self.fast_schema = fast_schema
+
+    def dump(self, obj, many=None):
+        return self._select().dump(obj, many=many)
+
+    def _select(self):
+        if has_request_context() and request.blueprint in current_app.config.get("FAST_SERIALIZER_BLUEPRINTS", ()):
+            return self.fast_schema
+        return self.schema
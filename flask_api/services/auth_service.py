@@ -5,6 +5,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from typing import Optional, Tuple
 from repository.user_repo import UserRepo
 from entities.user import User
+from services.password_hasher import password_hasher
 
 
 class AuthService:
@@ -31,7 +32,7 @@ class AuthService:
     @staticmethod
     def authenticate_user(username: str, password: str) -> Optional[str]:
         user: User = UserRepo.find_by_username(username)
-        if not user or not check_password_hash(user.password_hash, password):
+        if not user or not password_hasher.verify(user.password_hash, password):
             return None
 
         token = jwt.encode(
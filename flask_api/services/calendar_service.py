@@ -3,20 +3,55 @@ from flask import current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 from typing import Optional, Tuple
 from repository.user_repo import UserRepo
+from repository.task_repo import TaskRepo
+from repository.finance_repo import FinanceRepo
 from entities.user import User
 from services.finance_service import FinanceService
 from services.task_service import TaskService
-from datetime import datetime, date
+from datetime import datetime, date, timezone
+from utils import local_date, utc_day_bounds
 
 class CalendarService:
     @staticmethod
-    def get_schedule_for_date(room_id: int, target_date: date):
-        tasks = TaskService.get_tasks_for_room_by_date(room_id, target_date)
-        bills = FinanceService.get_room_bills_by_date(room_id, target_date)
+    def get_schedule_for_date(room_id: int, target_date: date, tz=timezone.utc):
+        tasks = TaskService.get_tasks_for_room_by_date(room_id, target_date, tz)
+        bills = FinanceService.get_room_bills_by_date(room_id, target_date, tz)
 
         return {
             "tasks": tasks,
             "bills": bills,
         }
 
-    
\ No newline at end of file
+    @staticmethod
+    def get_schedule_for_range(room_id: int, start_date: date, end_date: date, tz=timezone.utc):
+        """Tasks and bills for every day in ``[start_date, end_date]``, keyed by ISO date.
+
+        One query each for tasks (joined to their assignee statuses, read as
+        plain rows) and bills covers the whole window; series are expanded to
+        their occurrences in the window, which are bucketed by their local day
+        in ``tz``. Days with nothing scheduled are left out.
+        """
+        start, _ = utc_day_bounds(start_date, tz)
+        _, end = utc_day_bounds(end_date, tz)
+
+        task_rows = TaskRepo.get_task_rows_for_room_between(room_id, start, end)
+        bills = FinanceRepo.get_bills_for_room_between(room_id, start, end)
+
+        now = datetime.utcnow()
+        tasks = TaskService.expand_occurrences(TaskService.prepare_task_rows(task_rows), start, end, now,
+                                               with_deadlines=True)
+        days = {}
+        for deadline, task in tasks:
+            day = local_date(deadline, tz).isoformat()
+            days.setdefault(day, {"tasks": [], "bills": []})["tasks"].append(task)
+        for bill in FinanceService.expand_bills(bills, FinanceService.calendar_bill_to_dict, start, end, now):
+            day = local_date(datetime.fromisoformat(bill["scheduled_date"]), tz).isoformat()
+            days.setdefault(day, {"tasks": [], "bills": []})["bills"].append(bill)
+
+        return {
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat(),
+            "days": dict(sorted(days.items())),
+        }
+
+    
@@ -1,74 +1,200 @@
 # pylint: disable=all
 from repository.finance_repo import FinanceRepo
 from repository.room_repo import RoomRepo
-from typing import List, Optional
+from typing import Callable, Iterator, List, Optional, Tuple
 from flask import abort
 from entities import db
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date, timezone
+from itertools import islice
+from operator import itemgetter
+import heapq
+import sys
 from entities.finance import Bill, FinanceSummary
 from services.room_service import RoomService
+from utils import utc_day_bounds
+from cache.calendar_density import calendar_density
+import recurrence
+
+# Kind component of activity keys; bills sort before payments on equal dates
+BILL_KIND, PAYMENT_KIND = 1, 0
 
 
 class FinanceService:
 
     @staticmethod
-    def get_room_bills_by_date(room_id: int, target_date: datetime) -> List[dict]:
-        bills = FinanceRepo.get_bills_for_room_by_date(room_id, target_date)
-        result = []
+    def get_room_bills_by_date(room_id: int, target_date: date, tz=timezone.utc) -> List[dict]:
+        start, end = utc_day_bounds(target_date, tz)
+        bills = FinanceRepo.get_bills_for_room_between(room_id, start, end)
+        return FinanceService.expand_bills(bills, FinanceService.calendar_bill_to_dict, start, end, datetime.utcnow())
+
+    @staticmethod
+    def expand_bills(bills, to_dict: Callable[[Bill], dict], start: Optional[datetime] = None,
+                     end: Optional[datetime] = None, visible_at: Optional[datetime] = None) -> List[dict]:
+        """``to_dict`` of each non-cancelled bill occurrence scheduled in ``[start, end)``, in the bills' order.
+
+        With ``visible_at`` only occurrences already scheduled by then are kept.
+        Occurrence dicts carry their own ``occurrence`` index and ``scheduled_date``.
+        """
+        cancelled = FinanceRepo.get_cancelled_occurrences(bill.id for bill in bills if bill.occurrences)
+        expanded = []
         for bill in bills:
-            result.append({
-                "type": "bill",
-                "id": bill.id,
-                "title": bill.title,
-                "amount": float(bill.amount),
-                "category": bill.category,
-                "payer_user_id": bill.payer_user_id,
-                "metadata": bill.meta_data,
-                "deadline": bill.deadline.isoformat() if hasattr(bill, 'deadline') else None,
-                "scheduled_date": bill.scheduled_date.isoformat() if bill.scheduled_date else None,
-                "created_at": bill.created_at.isoformat(),
-            })
-        return result
-
-    @staticmethod
-    def get_room_financial_activity(room_id: int) -> List[dict]:
-        bills = FinanceRepo.get_bills_for_room(room_id)
-        payments = FinanceRepo.get_payments_for_room(room_id)
-
-        merged = []
+            step, count = recurrence.series(bill)
+            if visible_at is not None:
+                count = recurrence.visible_count(bill.scheduled_date, step, count, visible_at)
+            indexes = recurrence.occurrence_indexes(bill.scheduled_date, step, count, start, end)
+            base = to_dict(bill) if indexes else None
+            for k in indexes:
+                if (bill.id, k) in cancelled:
+                    continue
+                scheduled_date = recurrence.shift(bill.scheduled_date, step, k)
+                expanded.append(dict(
+                    base,
+                    occurrence=k,
+                    scheduled_date=scheduled_date.isoformat() if scheduled_date else None,
+                ))
+        return expanded
+
+    @staticmethod
+    def calendar_bill_to_dict(bill: Bill) -> dict:
+        return {
+            "type": "bill",
+            "id": bill.id,
+            "title": bill.title,
+            "amount": float(bill.amount),
+            "category": bill.category,
+            "payer_user_id": bill.payer_user_id,
+            "metadata": bill.meta_data,
+            "deadline": bill.deadline.isoformat() if hasattr(bill, 'deadline') else None,
+            "scheduled_date": bill.scheduled_date.isoformat() if bill.scheduled_date else None,
+            "created_at": bill.created_at.isoformat(),
+        }
+
+    @staticmethod
+    def get_room_financial_activity(room_id: int) -> Iterator[dict]:
+        """Visible bill occurrences and payments of the room, newest first, as a stream.
+
+        Bills and payments are read from two cursors already ordered by the
+        database and merged with the bill series' occurrences, so items are
+        produced one at a time instead of sorting the whole history.
+        """
+        bases = {}
+        for key, row in FinanceService._activity_stream(room_id):
+            yield FinanceService._activity_item(key, row, bases)
+
+    @staticmethod
+    def get_financial_activity_page(room_id: int, limit: int,
+                                    before: Optional[Tuple[datetime, int, int, int]] = None):
+        """One page of get_room_financial_activity before the key ``before``.
+
+        Returns ``(items, next key or None)``; see _activity_stream for keys.
+        """
+        page = list(islice(FinanceService._activity_stream(room_id, before, limit), limit + 1))
+        bases = {}
+        items = [FinanceService._activity_item(key, row, bases) for key, row in page[:limit]]
+        return items, (page[limit - 1][0] if len(page) > limit else None)
+
+    @staticmethod
+    def _activity_stream(room_id: int, before: Optional[Tuple[datetime, int, int, int]] = None,
+                         limit: Optional[int] = None) -> Iterator[tuple]:
+        """``(key, bill or payment)`` newest first, after the key ``before``.
+
+        Keys are ``(date, kind, id, occurrence)`` with kind 1 for bills and 0
+        for payments, so bills come first on equal dates. Single bills and
+        payments come from keyset queries. With ``limit`` only ``limit + 1``
+        of each are read and bill series are loaded only when they have
+        occurrences inside that page; without it both are streamed.
+        """
+        now = datetime.utcnow()
+
+        def bound(kind):
+            # (date, id) keyset for one stream: rows of another kind tie on the date
+            if before is None:
+                return None
+            date_, kind_, id_, _ = before
+            return date_, id_ if kind == kind_ else (0 if kind > kind_ else sys.maxsize)
+
+        if limit is None:
+            singles = FinanceRepo.iter_single_bills(room_id, now, bound(BILL_KIND))
+            payments = FinanceRepo.iter_payments(room_id, bound(PAYMENT_KIND))
+        else:
+            singles = FinanceRepo.get_single_bills_page(room_id, now, limit + 1, bound(BILL_KIND))
+            payments = FinanceRepo.get_payments_page(room_id, limit + 1, bound(PAYMENT_KIND))
+        head = heapq.merge(
+            (((bill.scheduled_date, BILL_KIND, bill.id, 0), bill) for bill in singles),
+            (((payment.created_at, PAYMENT_KIND, payment.id, 0), payment) for payment in payments),
+            key=itemgetter(0), reverse=True,
+        )
+        floor = None
+        if limit is not None:
+            head = list(islice(head, limit + 1))
+            floor = head[-1][0][0] if len(head) > limit else None
+
+        series = FinanceRepo.get_series_bills_for_room(room_id, now, floor, before[0] if before else None)
+        cancelled = FinanceRepo.get_cancelled_occurrences(bill.id for bill in series)
+
+        def occurrences(bill):
+            step, count = recurrence.series(bill)
+            count = recurrence.visible_count(bill.scheduled_date, step, count, now)
+            if before is not None:
+                count = min(count, recurrence.first_index_at_or_after(
+                    bill.scheduled_date, step, before[0] + timedelta(microseconds=1)))
+            for k in range(count - 1, -1, -1):
+                key = (recurrence.shift(bill.scheduled_date, step, k), BILL_KIND, bill.id, k)
+                if floor is not None and key[0] < floor:
+                    break
+                if (before is None or key < before) and (bill.id, k) not in cancelled:
+                    yield key, bill
+
+        return heapq.merge(head, *(occurrences(bill) for bill in series), key=itemgetter(0), reverse=True)
+
+    @staticmethod
+    def _activity_item(key, row, bases: dict) -> dict:
+        scheduled_date, kind, row_id, k = key
+        if kind == PAYMENT_KIND:
+            return FinanceService.payment_to_dict(row)
+        if row.occurrences is None:
+            return dict(FinanceService.bill_to_dict(row), occurrence=0)
+        if row_id not in bases:
+            bases[row_id] = FinanceService.bill_to_dict(row)
+        return dict(bases[row_id], occurrence=k, scheduled_date=scheduled_date.isoformat())
+
+    @staticmethod
+    def bill_to_dict(bill: Bill) -> dict:
+        return {
+            "type": "bill",
+            "id": bill.id,
+            "title": bill.title,
+            "amount": float(bill.amount),
+            "category": bill.category,
+            "payer_user_id": bill.payer_user_id,
+            "meta_data": bill.meta_data,
+            "scheduled_date": bill.scheduled_date.isoformat() if bill.scheduled_date else None,
+            "created_at": bill.created_at.isoformat(),
+            "occurrences": bill.occurrences or 1,
+            "series_end": bill.series_end.isoformat() if bill.series_end else None,
+        }
 
+    @staticmethod
+    def bill_series_to_dict(bills) -> List[dict]:
+        """bill_to_dict plus each series' cancelled occurrences, for clients that expand series themselves."""
+        cancelled = FinanceRepo.get_cancelled_occurrences(bill.id for bill in bills if bill.occurrences)
+        items = []
         for bill in bills:
-            scheduled_sort_key = bill.scheduled_date or bill.created_at
-            merged.append({
-                "type": "bill",
-                "id": bill.id,
-                "title": bill.title,
-                "amount": float(bill.amount),
-                "category": bill.category,
-                "payer_user_id": bill.payer_user_id,
-                "meta_data": bill.meta_data,
-                "scheduled_date": bill.scheduled_date.isoformat() if bill.scheduled_date else None,
-                "created_at": bill.created_at.isoformat(),
-                "_sort_key": scheduled_sort_key
-            })
-
-        for payment in payments:
-            merged.append({
-                "type": "payment",
-                "id": payment.id,
-                "amount": float(payment.amount),
-                "payer_user_id": payment.payer_user_id,
-                "payee_user_id": payment.payee_user_id,
-                "created_at": payment.created_at.isoformat(),
-                "_sort_key": payment.created_at
-            })
-
-        merged.sort(key=lambda x: x["_sort_key"], reverse=True)
-
-        for item in merged:
-            item.pop("_sort_key", None)
-
-        return merged
+            item = FinanceService.bill_to_dict(bill)
+            item["cancelled"] = sorted(k for bill_id, k in cancelled if bill_id == bill.id)
+            items.append(item)
+        return items
+
+    @staticmethod
+    def payment_to_dict(payment) -> dict:
+        return {
+            "type": "payment",
+            "id": payment.id,
+            "amount": float(payment.amount),
+            "payer_user_id": payment.payer_user_id,
+            "payee_user_id": payment.payee_user_id,
+            "created_at": payment.created_at.isoformat(),
+        }
 
     @staticmethod
     def validate_users(users: Optional[List[dict]], room_id: int) -> List[tuple]:
@@ -96,11 +222,12 @@ class FinanceService:
             except (ValueError, TypeError):
                 abort(400, f"Invalid user_id value '{user_id}', it must be a valid user ID.")
             
-            if not RoomService.validate_room_user(user_id, room_id):
-                abort(404, f"User {user_id} does not belong to the specified room.")
-            
             validated_users.append((user_id, amount_due))
 
+        missing = RoomService.find_users_not_in_room((user_id for user_id, _ in validated_users), room_id)
+        if missing:
+            abort(404, f"User {min(missing)} does not belong to the specified room.")
+
         return validated_users
 
     @staticmethod
@@ -159,47 +286,42 @@ class FinanceService:
             if amount_due < 0:
                 abort(400, f"Amount due for user {user_id} cannot be negative.")
         
-        scheduled_dates = FinanceService.calculate_scheduled_dates(freq_value, unit, repeat)
+        scheduled_date = datetime.utcnow()
+        occurrences = max(repeat, 1) if freq_value else 1
         
         try:
-            bills = []
-            for scheduled_date in scheduled_dates:
-                bill = FinanceRepo.create_bill(
-                    title=title,
-                    category=category,
-                    amount=amount,
-                    payer_user_id=payer_id,
-                    frequency=frequency,
-                    repeat=repeat,
-                    room_id=room_id,
-                    scheduled_date=scheduled_date,
-                    meta_data={
-                        "users": [{"user_id": user_id, "amount_due": amount_due} 
-                                for user_id, amount_due in user_data]
-                    }
-                )
-                bills.append(bill)
+            # One series row; occurrences are expanded on read
+            bill = FinanceRepo.create_bill(
+                title=title,
+                category=category,
+                amount=amount,
+                payer_user_id=payer_id,
+                frequency=frequency,
+                repeat=repeat,
+                room_id=room_id,
+                scheduled_date=scheduled_date,
+                meta_data={
+                    "users": [{"user_id": user_id, "amount_due": amount_due} 
+                            for user_id, amount_due in user_data]
+                },
+                occurrences=occurrences,
+            )
             
             # Update debt balances
             FinanceService.update_debt_balances_for_bill(room_id, payer_id, user_data)
+            step, count = recurrence.series(bill)
+            window_start, window_end = calendar_density.window()
+            calendar_density.apply(room_id, 1, bills=[
+                (recurrence.shift(scheduled_date, step, k), float(amount))
+                for k in recurrence.occurrence_indexes(scheduled_date, step, count, window_start, window_end)
+            ])
             
-            return bills[0]
+            return bill
             
         except Exception as e:
             db.session.rollback()
             raise e
 
-    @staticmethod
-    def calculate_scheduled_dates(freq_value: int, unit: str, repeat: int) -> List[datetime]:
-        scheduled_dates = []
-        now = datetime.now()
-        scheduled_dates.append(now)
-        if repeat > 0:
-            for i in range(1, repeat):
-                scheduled_dates.append(now + timedelta(**{unit: freq_value * i}))
-
-        return scheduled_dates
-
     @staticmethod
     def create_payment_service(room_id: int, title: str, category: str, amount: float, payer_id: int, payee_id: int):
         if not RoomService.validate_room_users([payee_id, payer_id], room_id):
@@ -220,7 +342,11 @@ class FinanceService:
         return payment
 
     @staticmethod
-    def delete_bill(user_id: int, bill_id: int):
+    def delete_bill(user_id: int, bill_id: int, occurrence: Optional[int] = None):
+        """Delete the bill (every occurrence), or cancel just ``occurrence`` of a series.
+
+        The debt is booked once per bill, so only deleting the whole bill reverses it.
+        """
         if not FinanceService.is_user_in_room_of_bill(user_id, bill_id):
             abort(403, "User does not belong to the room.")
         
@@ -228,9 +354,22 @@ class FinanceService:
         if not bill:
             abort(404, "Bill not found.")
         
+        room_id, scheduled_date, amount = bill.room_id, bill.scheduled_date, float(bill.amount)
+        step, count = recurrence.series(bill)
+        if occurrence is not None and count > 1:
+            if not 0 <= occurrence < count:
+                abort(404, "Occurrence not found.")
+            FinanceRepo.cancel_occurrence(bill_id, occurrence)
+            calendar_density.apply(room_id, 1, bills=[(recurrence.shift(scheduled_date, step, occurrence), -amount)])
+            return
+
         try:
             FinanceService.reverse_debt_balances_for_bill(bill)
             FinanceRepo.delete_bill(bill_id)
+            if count > 1:
+                calendar_density.invalidate(room_id)
+            else:
+                calendar_density.apply(room_id, 1, bills=[(scheduled_date, -amount)])
         except Exception as e:
             db.session.rollback()
             raise e
@@ -309,6 +448,7 @@ class FinanceService:
                     FinanceService._update_debt_amount(creditor_summary, 'debts', debtor_id_str, new_creditor_debt_amount)
             
             # Single commit after all updates
+            RoomRepo.bump_room_version(room_id)
             db.session.commit()
             print(f"🔍 All debt updates committed successfully")
             
@@ -404,6 +544,7 @@ class FinanceService:
             FinanceService._update_debt_amount(debtor_summary, 'owes', creditor_id_str, new_debt_amount)
             FinanceService._update_debt_amount(creditor_summary, 'debts', debtor_id_str, new_creditor_debt_amount)
             
+            RoomRepo.bump_room_version(room_id)
             db.session.commit()
             
         except Exception as e:
@@ -462,6 +603,7 @@ class FinanceService:
                 FinanceService._update_debt_amount(debtor_summary, 'debts', creditor_id_str, amount)
                 FinanceService._update_debt_amount(creditor_summary, 'owes', debtor_id_str, amount)
             
+            RoomRepo.bump_room_version(room_id)
             db.session.commit()
             print(f"🔍 REDUCE_DEBT: Commit successful!")
             
@@ -541,7 +683,8 @@ class FinanceService:
     
         
         from schemas.user_schemas import UserPublicSchema
-        user_schema = UserPublicSchema(many=False)
+        from schemas.fast_serializers import BlueprintSchema, FastUserPublicSchema
+        user_schema = BlueprintSchema(UserPublicSchema(many=False), FastUserPublicSchema(many=False))
         
         # Get room with members
         room = RoomService.get_room_by_id_with_members(room_id)
@@ -619,5 +762,6 @@ class FinanceService:
             summary.debts = {}
             db.session.add(summary)
         
+        RoomRepo.bump_room_version(room_id)
         db.session.commit()
         print(f"✅ Cleaned up debt data for room {room_id}")
\ No newline at end of file
@@ -0,0 +1,104 @@
+# flask_api/services/outbox_dispatcher.py
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+from repository.notification_repo import NotificationRepo
+from services.push_dispatcher import push_dispatcher, PushMessage
+
+
+class OutboxDispatcher:
+    """Drains notification_outbox through the push dispatcher.
+
+    Each round leases up to ``batch_size`` ready rows, sends them (the push
+    dispatcher caps how many transport calls run at once), deletes the ones
+    that went out and releases the rest with exponential backoff. A process
+    that dies mid-round leaves its rows leased; they become ready again when
+    the lease expires, so delivery is at least once.
+    """
+
+    def __init__(self, batch_size: int = 1000, lease_seconds: float = 120, max_attempts: int = 6,
+                 retry_base_seconds: float = 30, retry_max_seconds: float = 3600):
+        self.batch_size = batch_size
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base_seconds
+        self.retry_max = retry_max_seconds
+        self._lock = threading.Lock()
+        self._reset()
+
+    def init_app(self, app) -> None:
+        self.batch_size = int(app.config.get("OUTBOX_BATCH_SIZE", self.batch_size))
+        self.lease = timedelta(seconds=float(app.config.get("OUTBOX_LEASE_SECONDS", self.lease.total_seconds())))
+        self.max_attempts = int(app.config.get("OUTBOX_MAX_ATTEMPTS", self.max_attempts))
+        self.retry_base = float(app.config.get("OUTBOX_RETRY_BASE_SECONDS", self.retry_base))
+        self.retry_max = float(app.config.get("OUTBOX_RETRY_MAX_SECONDS", self.retry_max))
+        self._reset()
+
+    def backoff(self, attempts: int) -> timedelta:
+        """Delay before attempt ``attempts + 1``: retry_base doubling per attempt, capped at retry_max."""
+        return timedelta(seconds=min(self.retry_max, self.retry_base * 2 ** max(attempts - 1, 0)))
+
+    def drain(self, max_rounds: Optional[int] = None) -> int:
+        """Send ready rows until none are left (or ``max_rounds`` leases); returns how many were sent."""
+        delivered = 0
+        rounds = 0
+        while max_rounds is None or rounds < max_rounds:
+            rounds += 1
+            owner = uuid.uuid4().hex
+            rows = NotificationRepo.lease(owner, self.batch_size, datetime.utcnow(), self.lease)
+            if not rows:
+                break
+            by_id = {row.id: row for row in rows}
+            results = push_dispatcher.dispatch(
+                PushMessage(token=row.token, title=row.title, body=row.body, key=row.id) for row in rows
+            )
+            sent_ids = [result.message.key for result in results if result.success]
+            NotificationRepo.ack(sent_ids)
+            done = datetime.utcnow()
+
+            failures = []
+            for result in results:
+                if not result.success:
+                    attempts = by_id[result.message.key].attempts + 1
+                    failures.append((result.message.key, attempts, done + self.backoff(attempts), result.error))
+            dead = NotificationRepo.retry(owner, failures, self.max_attempts)
+
+            with self._lock:
+                self.rounds += 1
+                self.delivered += len(sent_ids)
+                self.retried += len(failures) - dead
+                self.dead += dead
+                self.latencies.extend((done - by_id[row_id].created_at).total_seconds() for row_id in sent_ids)
+            delivered += len(sent_ids)
+            if len(rows) < self.batch_size:
+                break
+        return delivered
+
+    def stats(self) -> dict:
+        """Counters since start, enqueue-to-send latency of the last sends, and the outbox backlog."""
+        now = datetime.utcnow()
+        backlog = NotificationRepo.get_backlog(now)
+        oldest = backlog.pop("oldest_pending")
+        with self._lock:
+            latencies = sorted(self.latencies)
+            stats = {"rounds": self.rounds, "delivered": self.delivered, "retried": self.retried, "dead": self.dead}
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else None
+
+        stats["latency_seconds"] = {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0),
+                                    "samples": len(latencies)}
+        stats["backlog"] = {**backlog, "oldest_pending_seconds":
+                            round((now - oldest).total_seconds(), 3) if oldest else None}
+        return stats
+
+    def _reset(self) -> None:
+        with self._lock:
+            self.rounds = self.delivered = self.retried = self.dead = 0
+            self.latencies = deque(maxlen=1000)
+
+
+outbox_dispatcher = OutboxDispatcher()
@@ -0,0 +1,86 @@
+# flask_api/services/password_hasher.py
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from flask import abort
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasher:
+    """Runs werkzeug password hashing on a bounded worker pool.
+
+    PBKDF2/scrypt are CPU-bound by design, so hashing inline lets a burst of
+    logins starve every other request in the worker. Jobs are handed to a
+    process pool instead; at most ``workers + queue_size`` jobs may be in
+    flight and callers that cannot get a slot within ``acquire_timeout``
+    seconds get a 503 instead of piling up behind the pool.
+
+    ``workers = 0`` hashes inline on the request thread (the old behaviour).
+    The pool is forked from ``init_app`` while the process is still
+    single-threaded; ``spawn``/``forkserver`` children would re-import
+    main.py and build a second app with its own scheduler. Platforms without
+    ``fork`` (Windows) fall back to a thread pool; hashlib releases the GIL
+    while deriving keys, so threads still keep the interpreter responsive.
+    """
+
+    def __init__(self, workers: int = 0, queue_size: int = 16, acquire_timeout: float = 0.5):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.acquire_timeout = acquire_timeout
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+        self._slots = threading.BoundedSemaphore(max(workers + queue_size, 1))
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.shutdown()
+        self.workers = int(app.config.get("PASSWORD_HASH_WORKERS", self.workers))
+        self.queue_size = int(app.config.get("PASSWORD_HASH_QUEUE_SIZE", self.queue_size))
+        self.acquire_timeout = float(app.config.get("PASSWORD_HASH_ACQUIRE_TIMEOUT", self.acquire_timeout))
+        self._slots = threading.BoundedSemaphore(max(self.workers + self.queue_size, 1))
+        self.rejected = 0
+        if self.workers > 0:
+            # A fork pool launches every worker on its first submit.
+            self._get_executor().submit(int).result()
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._run(check_password_hash, password_hash, password)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self.rejected += 1
+            abort(503, "Server is busy, please try again shortly.")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if "fork" in multiprocessing.get_all_start_methods():
+                    ctx = multiprocessing.get_context("fork")
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,146 @@
+# flask_api/services/push_dispatcher.py
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Hashable, Iterable, List, NamedTuple, Optional
+
+
+class PushMessage(NamedTuple):
+    token: str
+    title: str
+    body: str
+    # Caller's handle for matching results back, e.g. (task_id, occurrence)
+    key: Optional[Hashable] = None
+
+
+class PushResult(NamedTuple):
+    message: PushMessage
+    success: bool
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class FirebaseTransport:
+    """Sends a batch with one ``messaging.send_each`` call (FCM's limit is 500 messages)."""
+    max_batch = 500
+
+    def send_batch(self, messages: List[PushMessage]) -> List[PushResult]:
+        from firebase_admin import messaging
+
+        response = messaging.send_each([
+            messaging.Message(
+                notification=messaging.Notification(title=message.title, body=message.body),
+                token=message.token,
+            )
+            for message in messages
+        ])
+        return [
+            PushResult(message, sent.success, sent.message_id, str(sent.exception) if sent.exception else None)
+            for message, sent in zip(messages, response.responses)
+        ]
+
+
+class FakeTransport:
+    """In-process stand-in for tests and benchmarks.
+
+    Each batch takes ``latency`` seconds, like one HTTP round trip, and is
+    kept in ``batches``; tokens in ``failing_tokens`` come back as failures.
+    """
+    max_batch = 500
+
+    def __init__(self, latency: float = 0.0, failing_tokens: Iterable[str] = ()):
+        self.latency = latency
+        self.failing_tokens = set(failing_tokens)
+        self.batches: List[List[PushMessage]] = []
+        self._lock = threading.Lock()
+
+    def send_batch(self, messages: List[PushMessage]) -> List[PushResult]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.batches.append(list(messages))
+            first = sum(len(batch) for batch in self.batches) - len(messages)
+        return [
+            PushResult(message, False, error="Requested entity was not found.")
+            if message.token in self.failing_tokens else
+            PushResult(message, True, message_id=f"fake/{first + i}")
+            for i, message in enumerate(messages)
+        ]
+
+
+TRANSPORTS = {"firebase": FirebaseTransport, "fake": FakeTransport}
+
+
+class PushDispatcher:
+    """Sends push messages in transport-sized batches on a bounded thread pool.
+
+    ``dispatch`` consumes its input lazily and keeps at most ``workers * 2``
+    batches queued or in flight, so a streamed input is not read ahead of
+    the senders. A batch that raises is reported as a failure for each of
+    its messages. Results come back in input order, one per message.
+    """
+
+    def __init__(self, transport=None, workers: int = 4, batch_size: int = 500):
+        self.transport = transport or FirebaseTransport()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.shutdown()
+        self.transport = TRANSPORTS[app.config.get("PUSH_TRANSPORT", "firebase")]()
+        self.workers = int(app.config.get("PUSH_DISPATCH_WORKERS", self.workers))
+        self.batch_size = int(app.config.get("PUSH_BATCH_SIZE", self.batch_size))
+        self.sent = self.failed = self.batches = 0
+
+    def dispatch(self, messages: Iterable[PushMessage]) -> List[PushResult]:
+        size = max(1, min(self.batch_size, self.transport.max_batch))
+        messages = iter(messages)
+        batches = iter(lambda: list(islice(messages, size)), [])
+        if self.workers <= 0:
+            return [result for batch in batches for result in self._send(batch)]
+
+        slots = threading.BoundedSemaphore(self.workers * 2)
+        futures: List[Future] = []
+        for batch in batches:
+            slots.acquire()
+            future = self._get_executor().submit(self._send, batch)
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+        return [result for future in futures for result in future.result()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sent": self.sent, "failed": self.failed, "batches": self.batches}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _send(self, batch: List[PushMessage]) -> List[PushResult]:
+        try:
+            results = self.transport.send_batch(batch)
+        except Exception as e:
+            results = [PushResult(message, False, error=str(e)) for message in batch]
+        sent = sum(1 for result in results if result.success)
+        with self._lock:
+            self.batches += 1
+            self.sent += sent
+            self.failed += len(results) - sent
+        return results
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="push")
+            return self._executor
+
+
+push_dispatcher = PushDispatcher()
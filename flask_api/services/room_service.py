@@ -3,10 +3,11 @@ from sqlalchemy.exc import IntegrityError
 from entities import db
 from entities.room import Room
 from repository.room_repo import RoomRepo, RoomMember, RoomInvitation
-from typing import Optional, List
+from typing import Dict, Iterable, Optional, List, Set
 from flask import abort
 from repository.user_repo import UserRepo
 from entities.user import User
+from cache.membership_index import membership_index
 
 
 class RoomService:
@@ -18,12 +19,14 @@ class RoomService:
             if inv is None:
                 raise ValueError("Invitation not found")
             inv.status = "accepted"
+            invitee_user_id = inv.invitee_user_id
             try:
                 member = RoomRepo.add_member(inv.room_id, inv.invitee_user_id)
             except IntegrityError:
                 db.session.rollback()
                 member = RoomRepo.find_member(inv.room_id, inv.invitee_user_id)
 
+        membership_index.invalidate(invitee_user_id)
         return member
 
     @staticmethod
@@ -31,8 +34,19 @@ class RoomService:
         return RoomRepo.list_rooms_for_user(user_id)
 
     @staticmethod
-    def get_invites_for_user(user_id: int):
-        return RoomRepo.list_invites_for_user(user_id)
+    def get_room_alerts_and_balances(user_id: int) -> Dict[int, dict]:
+        """Alerts come from the maintained counters (see AlertRepo), which the scheduler's slide job builds."""
+        return {
+            room_id: {
+                "alerts": alerts,
+                "balance_due": round(sum((owes or {}).values()), 2),
+            }
+            for room_id, alerts, owes in RoomRepo.get_alerts_and_owes_for_user(user_id)
+        }
+
+    @staticmethod
+    def get_invites_for_user(user_id: int, limit: Optional[int] = None, before=None):
+        return RoomRepo.list_invites_for_user(user_id, limit, before)
 
     @staticmethod
     def get_room_with_members_if_user_is_member(room_id: int, user: User) -> Room:
@@ -43,10 +57,16 @@ class RoomService:
             abort(403, "You are not a member of this room")
         return room
 
+    @staticmethod
+    def require_room_member(room_id: int, user: User) -> None:
+        if not RoomService.validate_room_user(user.id, room_id):
+            abort(403, "You are not a member of this room")
+
     @staticmethod
     def create_room_for_user(name: str, address: str, description: str, picture_url: Optional[str], user: User) -> Room:
         room = RoomRepo.create_room(name, address, description, picture_url)
         RoomRepo.add_member(room.id, user.id)
+        membership_index.invalidate(user.id)
         return room
 
     @staticmethod
@@ -82,6 +102,7 @@ class RoomService:
         updated = RoomRepo.respond_to_invitation(invitation.id, status)
         if status == "accepted":
             RoomRepo.add_member(updated.room_id, user.id)
+            membership_index.invalidate(user.id)
 
         RoomRepo.delete_invitation(invitation.id)
         return updated
@@ -92,18 +113,15 @@ class RoomService:
 
     @staticmethod
     def validate_room_users(user_ids: List[int], room_id: int) -> bool:
-        users = UserRepo.get_users_by_ids(user_ids)
-        if not all(any(room_member.room_id == room_id for room_member in user.rooms) for user in users):
-            return False
-        return True
+        return not RoomService.find_users_not_in_room(user_ids, room_id)
 
     @staticmethod
-    def validate_room_user(user_id: int, room_id: int) -> bool:
-        user = UserRepo.find_by_id(user_id)
+    def find_users_not_in_room(user_ids: Iterable[int], room_id: int) -> Set[int]:
+        return RoomRepo.find_non_members(user_ids, room_id)
 
-        if not user:
-            return False
-        return any(room_member.room_id == room_id for room_member in user.rooms)
+    @staticmethod
+    def validate_room_user(user_id: int, room_id: int) -> bool:
+        return membership_index.is_member(user_id, room_id)
 
     @staticmethod
     def leave_room(user_id: int, room_id: int) -> bool:
@@ -111,4 +129,5 @@ class RoomService:
             abort(403, "You are not a member of this room")
 
         RoomRepo.remove_member(user_id, room_id)
+        membership_index.invalidate(user_id)
         return True
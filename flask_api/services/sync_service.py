@@ -0,0 +1,116 @@
+# flask_api/services/sync_service.py
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from repository.room_repo import RoomRepo
+from repository.task_repo import TaskRepo
+from repository.finance_repo import FinanceRepo
+from repository.user_repo import UserRepo
+from services.task_service import TaskService
+from services.finance_service import FinanceService
+from schemas.fast_serializers import FastRoomSchema, FastRoomInvitationSchema, FastUserPublicSchema
+
+# The cursor only advances past changes older than this. A transaction that
+# took a lower change id may still be committing behind a newer one, so
+# recent changes are re-sent on the next poll (upserts are idempotent).
+SETTLE_WINDOW = timedelta(seconds=5)
+
+# change-log entity -> response key
+ENTITY_KEYS = {
+    "room": "room",
+    "member": "members",
+    "invitation": "invitations",
+    "task": "tasks",
+    "bill": "bills",
+    "payment": "payments",
+}
+
+
+class SyncService:
+    @staticmethod
+    def get_room_changes(room_id: int, cursor: Optional[int]) -> dict:
+        """Everything in the room that changed after ``cursor``.
+
+        Every entity key maps to ``{"upserted": [...], "deleted": [ids]}``.
+        With ``"snapshot": true`` the upserts are the room's full state and
+        the client should replace what it holds; that happens when no cursor
+        is given or the cursor predates the compacted part of the log.
+        """
+        if cursor is None or cursor < RoomRepo.get_compacted_through(room_id):
+            return SyncService.get_room_snapshot(room_id)
+
+        settled_before = datetime.utcnow() - SETTLE_WINDOW
+        next_cursor = cursor
+        settled = True
+        latest_ops = {}
+        for change in RoomRepo.list_changes_since(room_id, cursor):
+            latest_ops[(change.entity, change.entity_id)] = change.op
+            settled = settled and change.created_at <= settled_before
+            if settled:
+                next_cursor = change.id
+
+        upserted = defaultdict(list)
+        deleted = defaultdict(list)
+        for (entity, entity_id), op in latest_ops.items():
+            (deleted if op == "delete" else upserted)[entity].append(entity_id)
+
+        result = {"cursor": next_cursor, "snapshot": False}
+        loaders = SyncService._loaders(room_id)
+        for entity, key in ENTITY_KEYS.items():
+            ids = upserted.get(entity, [])
+            rows = loaders[entity](ids) if ids else []
+            found = {row["id"] for row in rows}
+            result[key] = {
+                "upserted": rows,
+                # Rows removed outside the change log are reported as deleted
+                "deleted": sorted(set(deleted.get(entity, [])) | (set(ids) - found)),
+            }
+        return result
+
+    @staticmethod
+    def get_room_snapshot(room_id: int) -> dict:
+        cursor = RoomRepo.get_latest_change_id(room_id, before=datetime.utcnow() - SETTLE_WINDOW)
+        room = RoomRepo.get_room_with_members(room_id)
+        invitations = RoomRepo.list_invitations_for_room(room_id)
+        state = {
+            "room": [FastRoomSchema.build(room)] if room else [],
+            "members": FastUserPublicSchema(many=True).dump(RoomRepo.list_members(room_id)),
+            "invitations": [SyncService._invitation_to_dict(inv) for inv in invitations],
+            "tasks": TaskService.prepare_task_series(TaskRepo.get_all_tasks_for_room(room_id)),
+            "bills": FinanceService.bill_series_to_dict(FinanceRepo.get_all_bills_for_room(room_id)),
+            "payments": [FinanceService.payment_to_dict(payment)
+                         for payment in FinanceRepo.get_all_payments_for_room(room_id)],
+        }
+        result = {"cursor": cursor, "snapshot": True}
+        for key, rows in state.items():
+            result[key] = {"upserted": rows, "deleted": []}
+        return result
+
+    @staticmethod
+    def _loaders(room_id: int) -> Dict[str, callable]:
+        def load_room(ids: List[int]) -> List[dict]:
+            room = RoomRepo.get_room_with_members(room_id)
+            return [FastRoomSchema.build(room)] if room else []
+
+        def load_members(ids: List[int]) -> List[dict]:
+            current = set(ids) - RoomRepo.find_non_members(ids, room_id)
+            users = UserRepo.get_users_by_ids(sorted(current))
+            return FastUserPublicSchema(many=True).dump(users)
+
+        def load_invitations(ids: List[int]) -> List[dict]:
+            return [SyncService._invitation_to_dict(inv) for inv in RoomRepo.get_invitations_by_ids(ids)]
+
+        return {
+            "room": load_room,
+            "member": load_members,
+            "invitation": load_invitations,
+            "task": lambda ids: TaskService.prepare_task_series(TaskRepo.get_tasks_by_ids(ids)),
+            "bill": lambda ids: FinanceService.bill_series_to_dict(FinanceRepo.get_bills_by_ids(ids)),
+            "payment": lambda ids: [FinanceService.payment_to_dict(payment)
+                                    for payment in FinanceRepo.get_payments_by_ids(ids)],
+        }
+
+    @staticmethod
+    def _invitation_to_dict(invitation) -> dict:
+        return {"id": invitation.id, **FastRoomInvitationSchema.build(invitation)}
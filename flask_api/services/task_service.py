@@ -1,24 +1,71 @@
-from repository.task_repo import TaskRepo
+from repository.task_repo import TaskRepo, STREAM_BATCH_SIZE
 from repository.user_repo import UserRepo
-from typing import List, Optional
-from datetime import datetime, timedelta, date
+from typing import Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime, timedelta, date, timezone
+from itertools import groupby, islice
+from operator import attrgetter, itemgetter
+import heapq
 from flask import abort
 from services.room_service import RoomService
+from utils import to_utc, utc_day_bounds
+from cache.calendar_density import calendar_density
+import recurrence
 
 class TaskService:
     @staticmethod
     def get_enriched_tasks_for_room(room_id: int) -> List[dict]:
-        tasks = TaskRepo.get_tasks_for_room(room_id)
-        enriched = TaskService.prepare_tasks(tasks)
+        now = datetime.utcnow()
+        tasks = TaskRepo.get_tasks_for_room(room_id, now)
+        enriched = TaskService.prepare_task_projection(tasks, TaskRepo.get_assignee_statuses_for_room(room_id, now))
 
-        return enriched
+        return TaskService.expand_occurrences(zip(tasks, enriched), visible_at=now)
 
     @staticmethod
-    def get_tasks_for_room_by_date(room_id: int, date: date) -> List[dict]:
-        tasks = TaskRepo.get_tasks_for_room_by_date(room_id, date)
+    def get_tasks_for_room_by_date(room_id: int, date: date, tz=timezone.utc) -> List[dict]:
+        start, end = utc_day_bounds(date, tz)
+        tasks = TaskRepo.get_tasks_for_room_between(room_id, start, end)
         enriched = TaskService.prepare_tasks(tasks)
 
-        return enriched
+        return TaskService.expand_occurrences(zip(tasks, enriched), start, end, datetime.utcnow())
+
+    @staticmethod
+    def get_tasks_for_user(user_id: int, statuses: Iterable[str], start: Optional[datetime] = None,
+                           end: Optional[datetime] = None) -> dict:
+        """The user's task occurrences across their rooms whose own status is in ``statuses``.
+
+        Occurrences are ordered by deadline (undated first) and, with a
+        window, limited to deadlines in ``[start, end)``. Returns
+        ``{"tasks": [...], "rooms": {room_id: name}}`` with each room named once.
+        """
+        now = datetime.utcnow()
+        statuses = set(statuses)
+        singles = TaskRepo.get_tasks_for_user(user_id, statuses, now, start, end)
+        series = TaskRepo.get_series_for_user(user_id, now, start, end)
+        cancelled, _, overrides = TaskRepo.get_occurrence_state(row.id for row in series)
+
+        def sort_key(entry):
+            deadline, task_id, k = entry[:3]
+            return deadline is not None, deadline or datetime.min, task_id, k
+
+        expanded = []
+        for row in series:
+            step, count = recurrence.series(row)
+            count = recurrence.visible_count(row.scheduled_date, step, count, now)
+            for k in recurrence.occurrence_indexes(row.deadline, step, count, start, end):
+                status = overrides.get((row.id, k), {}).get(user_id, "todo") if k else row.status
+                if status in statuses and (row.id, k) not in cancelled:
+                    expanded.append((recurrence.shift(row.deadline, step, k), row.id, k, row, step, status))
+        expanded.sort(key=sort_key)
+
+        singles = ((row.deadline, row.id, 0, row, None, row.status) for row in singles)
+        tasks, rooms = [], {}
+        for _, _, k, row, step, status in heapq.merge(singles, expanded, key=sort_key):
+            rooms[row.room_id] = row.room_name
+            item = TaskService._occurrence_dict(row, TaskService._task_dict(row, {}), step, k, {})
+            del item["statuses"]
+            item.update(room_id=row.room_id, status=status.upper())
+            tasks.append(item)
+        return {"tasks": tasks, "rooms": {str(room_id): name for room_id, name in rooms.items()}}
 
     @staticmethod
     def prepare_tasks(tasks):
@@ -28,19 +75,166 @@ class TaskService:
                 str(task_user.user_id): task_user.status.upper()
                 for task_user in task.users
             }
+            enriched.append(TaskService._task_dict(task, statuses))
+        return enriched
 
-            enriched.append({
-                "id": task.id,
-                "title": task.title,
-                "deadline": task.deadline.isoformat() if task.deadline else None,
-                "description": task.description,
-                "frequency": task.frequency,
-                "repeat": task.repeat,
-                "statuses": statuses,
-                "scheduled_date": task.scheduled_date.isoformat() if task.scheduled_date else None,
+    @staticmethod
+    def prepare_task_projection(rows, statuses) -> List[dict]:
+        """prepare_tasks for TASK_ROW_COLUMNS rows and their TaskRepo.get_assignee_statuses* map."""
+        return [
+            TaskService._task_dict(row, {
+                str(user_id): status.upper() for user_id, status in statuses.get(row.id, {}).items()
             })
+            for row in rows
+        ]
+
+    @staticmethod
+    def _task_dict(task, statuses: dict) -> dict:
+        return {
+            "id": task.id,
+            "title": task.title,
+            "deadline": task.deadline.isoformat() if task.deadline else None,
+            "description": task.description,
+            "frequency": task.frequency,
+            "repeat": task.repeat,
+            "statuses": statuses,
+            "scheduled_date": task.scheduled_date.isoformat() if task.scheduled_date else None,
+            "occurrences": task.occurrences or 1,
+            "series_end": task.series_end.isoformat() if task.series_end else None,
+        }
+
+    @staticmethod
+    def prepare_task_series(tasks) -> List[dict]:
+        """prepare_tasks plus each series' per-occurrence exceptions, for clients that expand series themselves."""
+        enriched = TaskService.prepare_tasks(tasks)
+        cancelled, _, statuses = TaskRepo.get_occurrence_state(task.id for task in tasks if task.occurrences)
+        for task in enriched:
+            task["cancelled"] = sorted(k for task_id, k in cancelled if task_id == task["id"])
+            task["occurrence_statuses"] = {
+                str(k): {str(user_id): status.upper() for user_id, status in by_user.items()}
+                for (task_id, k), by_user in sorted(statuses.items()) if task_id == task["id"]
+            }
         return enriched
 
+    @staticmethod
+    def expand_occurrences(pairs: Iterable[Tuple[object, dict]], start: Optional[datetime] = None,
+                           end: Optional[datetime] = None, visible_at: Optional[datetime] = None,
+                           with_deadlines: bool = False) -> List:
+        """One entry per occurrence of each ``(task row, prepare_tasks dict)`` pair.
+
+        Occurrences are limited to deadlines in ``[start, end)`` and, with
+        ``visible_at``, to those already scheduled; cancelled ones are
+        skipped. Each entry gets its own ``occurrence`` index, dates and
+        statuses, and the result is ordered by deadline.
+        """
+        pairs = list(pairs)
+        cancelled, _, overrides = TaskRepo.get_occurrence_state(row.id for row, _ in pairs if row.occurrences)
+        expanded = []
+        for row, base in pairs:
+            step, count = recurrence.series(row)
+            if visible_at is not None:
+                count = recurrence.visible_count(row.scheduled_date, step, count, visible_at)
+            for k in recurrence.occurrence_indexes(row.deadline, step, count, start, end):
+                if (row.id, k) in cancelled:
+                    continue
+                deadline = recurrence.shift(row.deadline, step, k)
+                item = TaskService._occurrence_dict(row, base, step, k, overrides)
+                expanded.append((deadline or datetime.min, row.id, k, item))
+        expanded.sort(key=lambda entry: entry[:3])
+        if with_deadlines:
+            return [(deadline, item) for deadline, _, _, item in expanded]
+        return [item for _, _, _, item in expanded]
+
+    @staticmethod
+    def _occurrence_dict(row, base: dict, step, k: int, overrides) -> dict:
+        """``base`` (a prepare_tasks dict) as occurrence ``k`` of its series."""
+        item = dict(base, occurrence=k)
+        if k:
+            deadline = recurrence.shift(row.deadline, step, k)
+            scheduled_date = recurrence.shift(row.scheduled_date, step, k)
+            item["deadline"] = deadline.isoformat() if deadline else None
+            item["scheduled_date"] = scheduled_date.isoformat() if scheduled_date else None
+            statuses = {user_id: "TODO" for user_id in base["statuses"]}
+            for user_id, status in overrides.get((row.id, k), {}).items():
+                if str(user_id) in statuses:
+                    statuses[str(user_id)] = status.upper()
+            item["statuses"] = statuses
+        return item
+
+    @staticmethod
+    def get_task_page(room_id: int, limit: int, after: Optional[Tuple[Optional[datetime], int, int]] = None):
+        """One page of get_enriched_tasks_for_room after the ``(deadline, id, occurrence)`` key ``after``.
+
+        Returns ``(items, next key or None)``. Single tasks are read with a
+        keyset query; series only when they have occurrences inside the
+        page, and those are expanded lazily and merged in, so a page costs
+        the same however old the room is.
+        """
+        now = datetime.utcnow()
+
+        def sort_key(deadline, task_id, k):
+            return deadline is not None, deadline or datetime.min, task_id, k
+
+        after_key = sort_key(*after) if after else None
+        after_deadline = after[0] if after else None
+        singles = TaskRepo.get_single_tasks_page(room_id, now, limit + 1, after[:2] if after else None)
+        if len(singles) > limit and singles[-1].deadline is None:
+            series = []
+        else:
+            ceiling = singles[-1].deadline if len(singles) > limit else None
+            series = TaskRepo.get_series_for_room(room_id, now, after_deadline, ceiling)
+        cancelled, _, overrides = TaskRepo.get_occurrence_state(task.id for task in series)
+
+        def occurrences(task):
+            step, count = recurrence.series(task)
+            count = recurrence.visible_count(task.scheduled_date, step, count, now)
+            first = recurrence.first_index_at_or_after(task.deadline, step, after_deadline) if after_deadline else 0
+            for k in range(first, count):
+                key = sort_key(recurrence.shift(task.deadline, step, k), task.id, k)
+                if (after_key is None or key > after_key) and (task.id, k) not in cancelled:
+                    yield key, task, k
+
+        streams = [((sort_key(task.deadline, task.id, 0), task, 0) for task in singles)]
+        streams += [occurrences(task) for task in series]
+        page = list(islice(heapq.merge(*streams, key=itemgetter(0)), limit + 1))
+
+        tasks = {task.id: task for _, task, _ in page[:limit]}
+        statuses = TaskRepo.get_assignee_statuses(tasks)
+        bases = dict(zip(tasks, TaskService.prepare_task_projection(list(tasks.values()), statuses)))
+        items = [
+            TaskService._occurrence_dict(task, bases[task.id], recurrence.series(task)[0], k, overrides)
+            for _, task, k in page[:limit]
+        ]
+        if len(page) <= limit:
+            return items, None
+        (has_deadline, deadline, task_id, k), _, _ = page[limit - 1]
+        return items, (deadline if has_deadline else None, task_id, k)
+
+    @staticmethod
+    def prepare_task_rows(rows) -> List[Tuple[object, dict]]:
+        """(first row, prepare_tasks dict) per task from TaskRepo.get_task_rows_* rows, ordered as given."""
+        enriched = {}
+        for row in rows:
+            (task_id, title, deadline, description, frequency, repeat, scheduled_date, occurrences, series_end,
+             user_id, status) = row
+            entry = enriched.get(task_id)
+            if entry is None:
+                entry = enriched[task_id] = (row, {
+                    "id": task_id,
+                    "title": title,
+                    "deadline": deadline.isoformat() if deadline else None,
+                    "description": description,
+                    "frequency": frequency,
+                    "repeat": repeat,
+                    "statuses": {},
+                    "scheduled_date": scheduled_date.isoformat() if scheduled_date else None,
+                    "occurrences": occurrences or 1,
+                    "series_end": series_end.isoformat() if series_end else None,
+                })
+            if user_id is not None:
+                entry[1]["statuses"][str(user_id)] = status.upper()
+        return list(enriched.values())
+
     @staticmethod
     def validate_input_create_task(title: Optional[str], frequency: Optional[str], repeat: Optional[int]):
         if not title:
@@ -69,13 +263,13 @@ class TaskService:
         return freq_value, unit
 
     @staticmethod
-    def parse_dates(deadline: str):
+    def parse_dates(deadline: str, tz=timezone.utc):
         try:
             deadline_obj = datetime.strptime(deadline, "%Y-%m-%dT%H:%M")
         except ValueError:
             abort(400, "Invalid date format, expected 'YYYY-MM-DDTHH:MM' for deadline.")
 
-        return deadline_obj
+        return to_utc(deadline_obj, tz)
 
 
     @staticmethod
@@ -83,8 +277,9 @@ class TaskService:
         if not user_ids:
             abort(400, "At least one user ID is required.")
 
-        if not RoomService.validate_room_users(user_ids, room_id):
-            abort(404, "Not all users belong to the specified room.")
+        missing = RoomService.find_users_not_in_room(user_ids, room_id)
+        if missing:
+            abort(404, f"Not all users belong to the specified room: {sorted(missing)}")
 
         return user_ids
 
@@ -100,6 +295,11 @@ class TaskService:
 
             if not user_id or not status:
                 abort(400, "Each assignee must include both 'user_id' and 'status'.")
+            try:
+                # Clients may echo the string keys of the task list's "statuses"
+                user_id = int(str(user_id))
+            except ValueError:
+                abort(400, f"Invalid user_id '{user_id}', must be an integer.")
 
             if status not in ['todo', 'in-progress', 'complete']:
                 abort(400, f"Invalid status '{status}', must be one of 'todo', 'in-progress', or 'complete'.")
@@ -110,7 +310,8 @@ class TaskService:
 
     @staticmethod
     def update_task(task_id: int, title: str, description: Optional[str] = None,
-                    deadline: Optional[str] = None, assignees: Optional[List[dict]] = None):
+                    deadline: Optional[str] = None, assignees: Optional[List[dict]] = None, occurrence: int = 0):
+        """Title, description and deadline apply to the whole series; assignee statuses to ``occurrence``."""
 
         task = TaskRepo.get_task_by_id(task_id)
         if not task:
@@ -119,32 +320,96 @@ class TaskService:
             abort(400, "Title is required.")
         if not deadline:
             abort(400, "Deadline is required.")
+        TaskService.update_tasks(task.room_id, [{
+            "task_id": task.id, "title": title, "description": description,
+            "deadline": deadline, "assignees": assignees, "occurrence": occurrence,
+        }])
 
-        if assignees is not None:
-            assignee_data = TaskService.validate_assignees(assignees)
-
-            for user_id, status in assignee_data:
-                TaskRepo.update_task_user(user_id, task.id, status)
-
-        TaskRepo.update_task(task_id, title, description, deadline)
+    @staticmethod
+    def update_tasks(room_id: int, edits: List[dict]) -> int:
+        """Apply many task edits in the room with one commit; returns the number of edits.
+
+        Each edit has ``task_id`` and any of ``title``, ``description``,
+        ``deadline`` (naive UTC), ``assignees`` and ``occurrence``, with the same
+        meaning as in update_task; fields left out or None are unchanged.
+        For an occurrence k >= 1 the deadline is that occurrence's own date:
+        the series moves by as much as it differs, so echoing the date back
+        changes nothing. Assignees must already be on the task.
+        """
+        if not edits:
+            abort(400, "At least one task edit is required.")
+        task_ids = {edit.get("task_id") for edit in edits}
+        tasks = {row.id: row for row in TaskRepo.get_task_rows(room_id, task_ids)}
+        if len(tasks) != len(task_ids):
+            abort(404, "Task not found.")
+        assigned = TaskRepo.get_assignee_statuses(tasks)
+
+        task_values, statuses, occurrence_statuses = {}, [], []
+        deadlines = {task_id: row.deadline for task_id, row in tasks.items()}
+        calendar_deltas, series_moved = [], False
+        for edit in edits:
+            task = tasks[edit["task_id"]]
+            step, count = recurrence.series(task)
+            occurrence = edit.get("occurrence") or 0
+            if not 0 <= occurrence < count:
+                abort(404, "Occurrence not found.")
+            if "title" in edit and edit["title"] is not None and not edit["title"]:
+                abort(400, "Title is required.")
+
+            values = task_values.setdefault(task.id, {"id": task.id})
+            for field in ("title", "description"):
+                if edit.get(field) is not None:
+                    values[field] = edit[field]
+            deadline = edit.get("deadline")
+            anchor = deadlines[task.id]
+            if deadline is not None and occurrence and anchor is not None:
+                deadline = anchor + (deadline - recurrence.shift(anchor, step, occurrence))
+            if deadline is not None and deadline != anchor:
+                values["deadline"] = deadline
+                if count > 1:
+                    values["series_end"] = recurrence.shift(deadline, step, count - 1)
+                    series_moved = True
+                else:
+                    calendar_deltas += [(anchor, -1), (deadline, 1)]
+                deadlines[task.id] = deadline
+
+            if edit.get("assignees") is not None:
+                for user_id, status in TaskService.validate_assignees(edit["assignees"]):
+                    if user_id not in assigned.get(task.id, {}):
+                        abort(400, f"User {user_id} is not assigned to task {task.id}.")
+                    if occurrence:
+                        occurrence_statuses.append((task.id, occurrence, user_id, status))
+                    else:
+                        statuses.append((task.id, user_id, status))
+
+        calendar_changed = series_moved or bool(calendar_deltas)
+        TaskRepo.update_tasks(
+            room_id, [values for values in task_values.values() if len(values) > 1],
+            statuses, occurrence_statuses, calendar_changed,
+        )
+        if series_moved:
+            calendar_density.invalidate(room_id)
+        elif calendar_changed:
+            calendar_density.apply(room_id, 1, tasks=calendar_deltas)
+        return len(edits)
 
     @staticmethod
     def create_task_service(room_id: int, title: Optional[str], description: Optional[str], frequency: Optional[str],
-                            repeat: Optional[int], deadline: Optional[str], assignees: List[dict]):
+                            repeat: Optional[int], deadline: Optional[str], assignees: List[dict], tz=timezone.utc):
 
         freq_value, unit = TaskService.validate_input_create_task(title, frequency, repeat)
         if not deadline:
             abort(400, "Deadline is required.")
-        deadline_date = TaskService.parse_dates(deadline)
+        deadline_date = TaskService.parse_dates(deadline, tz)
         assignee_data = TaskService.validate_assignees(assignees)
 
         user_ids = [assignee[0] for assignee in assignee_data]
         user_ids = TaskService.check_users(user_ids, room_id)
 
-        tasks = []
-        scheduled_date = datetime.now()
+        scheduled_date = datetime.utcnow()
+        occurrences = max(repeat, 0) + 1 if recurrence.parse_frequency(frequency) else 1
 
-        task = TaskRepo.create_task(
+        task = TaskRepo.create_task_series(
             room_id=room_id,
             title=title,
             description=description,
@@ -152,37 +417,75 @@ class TaskService:
             repeat=repeat,
             scheduled_date=scheduled_date,
             deadline=deadline_date,
+            occurrences=occurrences,
+            assignees=assignee_data,
         )
-        tasks.append(task)
-        for user_id, status in assignee_data:
-            TaskRepo.create_task_user(user_id, task.id, status)
-
-        if repeat > 0:
-            for i in range(1, repeat + 1):
-                scheduled_date = scheduled_date + timedelta(**{unit: freq_value})
-                deadline_date = deadline_date + timedelta(**{unit: freq_value})
-
-                task = TaskRepo.create_task(
-                    room_id=room_id,
-                    title=title,
-                    description=description,
-                    frequency=frequency,
-                    repeat=repeat,
-                    scheduled_date=scheduled_date,
-                    deadline=deadline_date,
-                )
-                tasks.append(task)
 
-                for user_id, status in assignee_data:
-                    TaskRepo.create_task_user(user_id, task.id, None)
-
-        return tasks
+        step, count = recurrence.series(task)
+        window_start, window_end = calendar_density.window()
+        calendar_density.apply(room_id, 1, tasks=[
+            (recurrence.shift(deadline_date, step, k), 1)
+            for k in recurrence.occurrence_indexes(deadline_date, step, count, window_start, window_end)
+        ])
+        return task
 
     @staticmethod
-    def delete_task(user_id: int, task_id: int) -> bool:
+    def delete_task(user_id: int, task_id: int, occurrence: Optional[int] = None) -> bool:
+        """Delete the task (every occurrence), or cancel just ``occurrence`` of a series."""
         if not TaskService.is_user_in_room_of_task(user_id, task_id):
             abort(403, "User does not have permission to delete this task.")
-        return TaskRepo.delete_task(task_id)
+        task = TaskRepo.get_task_by_id(task_id)
+        room_id, deadline = task.room_id, task.deadline
+        step, count = recurrence.series(task)
+
+        if occurrence is not None and count > 1:
+            if not 0 <= occurrence < count:
+                abort(404, "Occurrence not found.")
+            TaskRepo.cancel_occurrence(task_id, occurrence)
+            calendar_density.apply(room_id, 1, tasks=[(recurrence.shift(deadline, step, occurrence), -1)])
+            return True
+
+        deleted = TaskRepo.delete_task(task_id)
+        if deleted and count > 1:
+            calendar_density.invalidate(room_id)
+        elif deleted:
+            calendar_density.apply(room_id, 1, tasks=[(deadline, -1)])
+        return deleted
+
+    @staticmethod
+    def iter_due_notifications(now: datetime, until: datetime) -> Iterator[Tuple[object, int, datetime, list]]:
+        """(task row, occurrence, deadline, recipient rows) for un-notified occurrences due in [now, until].
+
+        Recipients are TaskRepo.iter_notification_candidates rows, one per
+        device token of each assignee who has not completed the occurrence.
+        Candidates are consumed a batch of tasks at a time, so memory and the
+        number of queries depend on the batch size, not on the tasks table.
+        """
+        candidates = TaskRepo.iter_notification_candidates(now, until)
+        tasks = (list(rows) for _, rows in groupby(candidates, key=attrgetter("id")))
+        while True:
+            batch = list(islice(tasks, STREAM_BATCH_SIZE))
+            if not batch:
+                return
+            due = []
+            for rows in batch:
+                task = rows[0]
+                step, count = recurrence.series(task)
+                for k in recurrence.occurrence_indexes(task.deadline, step, count, now, until + timedelta(microseconds=1)):
+                    due.append((task, step, k, rows))
+            cancelled, notified, overrides = TaskRepo.get_occurrence_state(
+                {task.id for task, step, k, _ in due if step is not None}
+            )
+            for task, step, k, rows in due:
+                if (task.id, k) in cancelled or (task.notified if k == 0 else (task.id, k) in notified):
+                    continue
+                statuses = overrides.get((task.id, k), {})
+                recipients = [
+                    row for row in rows
+                    if (row.status if k == 0 else statuses.get(row.user_id, "todo")) != "complete"
+                ]
+                if recipients:
+                    yield task, k, recurrence.shift(task.deadline, step, k), recipients
 
     @staticmethod
     def is_user_in_room_of_task(user_id: int, task_id: int) -> bool:
@@ -1,7 +1,15 @@
 from functools import wraps
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import base64
+import hashlib
+import json
 import jwt
-from flask import request, jsonify, current_app, g
+from flask import request, jsonify, current_app, g, make_response, abort, stream_with_context
+from entities import db
 from repository.user_repo import UserRepo
+from repository.room_repo import RoomRepo
+from cache.principal_cache import principal_cache
 
 def token_required(view_func):
     @wraps(view_func)
@@ -15,6 +23,16 @@ def token_required(view_func):
             token = parts[0]
         else:
             return jsonify(error="Invalid token format"), 401
+
+        digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        cached = principal_cache.get(digest)
+        if cached is not None:
+            payload, snapshot = cached
+            # Attach a copy of the snapshot to this request's session without a SELECT
+            g.current_user = db.session.merge(snapshot, load=False)
+            g.token_claims = payload
+            return view_func(*args, **kwargs)
+
         try:
             payload = jwt.decode(
                 token,
@@ -29,8 +47,155 @@ def token_required(view_func):
         user = UserRepo.find_by_username(payload.get("username"))
         if user is None:
             return jsonify(error="User not found"), 401
+        principal_cache.put(digest, payload, user)
         g.current_user = user
+        g.token_claims = payload
+
+        return view_func(*args, **kwargs)
+
+    return wrapped
+
 
+def debug_endpoint(view_func):
+    """Answers 404 unless DEBUG_ENDPOINTS is set, so internal stats are not served in production."""
+    @wraps(view_func)
+    def wrapped(*args, **kwargs):
+        if not current_app.config.get("DEBUG_ENDPOINTS", False):
+            abort(404)
         return view_func(*args, **kwargs)
 
     return wrapped
+
+
+def room_etag(scope, freshness=None, authorize=None):
+    """Conditional GET for per-room read endpoints.
+
+    The ETag is built from the room's version counter (bumped by every write
+    to the room) plus, for lists filtered on ``scheduled_date <= now``, the
+    value returned by ``freshness(room_id)`` so rows that become visible with
+    time also change the tag. A matching If-None-Match returns 304 before the
+    view runs its list queries or serializes anything.
+
+    ``authorize(room_id)`` runs before any of that and aborts when the caller
+    may not read the room; tags are guessable, so a 304 must not answer a
+    request the view itself would refuse.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(*args, **kwargs):
+            try:
+                room_id = int(kwargs["room_id"])
+            except (KeyError, TypeError, ValueError):
+                return view_func(*args, **kwargs)
+
+            if authorize is not None:
+                authorize(room_id)
+            tag = f"{scope}-{room_id}-{RoomRepo.get_room_version(room_id)}"
+            if freshness is not None:
+                marker = freshness(room_id)
+                tag += f"-{marker.timestamp() if marker else 0}"
+
+            if request.if_none_match.contains_weak(tag):
+                response = current_app.response_class(status=304)
+                response.set_etag(tag)
+                return response
+
+            response = make_response(view_func(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(tag)
+            return response
+
+        return wrapped
+    return decorator
+
+
+def request_timezone():
+    """Timezone the client's calendar dates are expressed in.
+
+    Read from the ``X-Timezone`` header (an IANA name such as
+    ``Europe/Berlin``); requests without one are treated as UTC, which is
+    the clock every stored datetime uses.
+    """
+    name = request.headers.get("X-Timezone")
+    if not name:
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        abort(400, description=f"Unknown timezone '{name}'.")
+
+
+def to_utc(value: datetime, tz=timezone.utc) -> datetime:
+    """Naive UTC datetime for storage; naive input is read as wall time in ``tz``."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz)
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def local_date(value: datetime, tz=timezone.utc) -> date:
+    """Calendar day in ``tz`` of a stored (naive UTC) datetime."""
+    return value.replace(tzinfo=timezone.utc).astimezone(tz).date()
+
+
+def utc_day_bounds(day: date, tz=timezone.utc):
+    """Half-open ``[start, end)`` UTC range covering ``day`` in ``tz``."""
+    start = datetime.combine(day, time.min, tzinfo=tz)
+    end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz)
+    return to_utc(start), to_utc(end)
+
+
+def request_page():
+    """``(limit, cursor)`` from the ``limit`` and ``cursor`` query parameters.
+
+    Both are None when the client asked for neither, so list endpoints keep
+    returning everything to clients that do not paginate.
+    """
+    limit, cursor = request.args.get("limit"), request.args.get("cursor")
+    if limit is None and cursor is None:
+        return None, None
+    try:
+        limit = int(limit) if limit is not None else current_app.config.get("PAGE_SIZE_DEFAULT", 50)
+    except ValueError:
+        abort(400, description="limit must be an integer.")
+    if limit < 1:
+        abort(400, description="limit must be positive.")
+    return min(limit, current_app.config.get("PAGE_SIZE_MAX", 200)), cursor
+
+
+def encode_cursor(*key) -> str:
+    """Opaque keyset cursor for a row's sort key; datetimes are kept as ISO strings."""
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in key])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    """Sort key of ``encode_cursor``, converted with ``types``; 400 for anything else."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return tuple(
+            None if value is None else datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for value, kind in zip(values, types)
+        )
+    except (ValueError, TypeError):
+        abort(400, description="Invalid cursor.")
+
+
+def paged(payload, next_cursor=None, status=200):
+    """JSON response for one page; the next page's cursor goes in ``X-Next-Cursor``."""
+    response = make_response(jsonify(payload), status)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+def streamed_list(items, status=200):
+    """JSON array response written item by item while ``items`` is consumed."""
+    def generate():
+        yield "["
+        for index, item in enumerate(items):
+            yield ("," if index else "") + current_app.json.dumps(item, separators=(",", ":"))
+        yield "]"
+
+    return current_app.response_class(stream_with_context(generate()), status=status, mimetype="application/json")